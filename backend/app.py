@@ -1,6 +1,11 @@
 from flask import Flask
+from flask.helpers import get_debug_flag
 from controllers.image_controller import image_controller
 from flask_cors import CORS
+from worker_pool import worker_pool
+import atexit
+import signal
+import sys
 import os
 
 app = Flask(__name__)
@@ -15,6 +20,16 @@ app.register_blueprint(image_controller)
 data_dir = os.path.join('data', 'imagen_con_letras')
 os.makedirs(data_dir, exist_ok=True)
 
+# Modo de depuración (servidor de depuración y reloader) solo si FLASK_DEBUG lo activa
+DEBUG = get_debug_flag()
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Con el reloader de Flask este bloque se ejecuta también en el proceso vigilante;
+    # el pool solo se crea en el proceso que atiende las solicitudes
+    if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        worker_pool.start(warm_up=os.environ.get('WORKER_POOL_WARMUP', '1') == '1')
+        # Cerrar el pool de forma ordenada al salir (incluido SIGTERM de Docker)
+        atexit.register(worker_pool.shutdown)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
+    app.run(host='0.0.0.0', port=5000, debug=DEBUG)
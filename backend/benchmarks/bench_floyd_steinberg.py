@@ -0,0 +1,48 @@
+"""
+Compara el motor de Floyd-Steinberg compilado con numba contra la versión en Python puro
+(el mismo código sin compilar) y verifica que ambas salidas sean idénticas bit a bit.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_floyd_steinberg [alto] [ancho]
+"""
+import sys
+import time
+import numpy as np
+from models.dithering.floyd_steinberg import floyd_steinberg_diffuse
+from utils.jit import NUMBA_AVAILABLE
+
+
+def timed(func, pixels):
+    """
+    Ejecuta func sobre una copia de pixels y devuelve (segundos, resultado).
+    """
+    pixels = pixels.copy()
+    start = time.perf_counter()
+    func(pixels)
+    return time.perf_counter() - start, pixels
+
+
+def main():
+    height = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else height
+    pixels = np.random.default_rng(0).integers(0, 256, (height, width)).astype(np.float32)
+
+    if not NUMBA_AVAILABLE:
+        print("numba no está instalado: solo está disponible la versión en Python puro.")
+        return
+
+    # Primera llamada: incluye la compilación (o la carga desde la caché de numba)
+    compile_time, _ = timed(floyd_steinberg_diffuse, pixels[:2, :2])
+    jit_time, jit_result = timed(floyd_steinberg_diffuse, pixels)
+    python_time, python_result = timed(floyd_steinberg_diffuse.py_func, pixels)
+
+    print(f"Imagen: {height}x{width}")
+    print(f"Compilación: {compile_time:.3f} s")
+    print(f"Python puro: {python_time:.3f} s")
+    print(f"numba:       {jit_time:.4f} s")
+    print(f"Aceleración: {python_time / jit_time:.0f}x")
+    print(f"Salidas idénticas: {np.array_equal(jit_result, python_result)}")
+
+
+if __name__ == '__main__':
+    main()
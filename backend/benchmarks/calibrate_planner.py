@@ -0,0 +1,74 @@
+"""
+Calibra los umbrales del planificador de ejecución (models/base_filter.py) en la máquina actual.
+
+Mide el costo por unidad de trabajo de una operación punto a punto en línea y el costo fijo
+de repartir franjas en el pool de hilos y en el pool de procesos. Con eso calcula el trabajo
+mínimo a partir del cual cada modo paralelo compensa su costo fijo y guarda los umbrales en
+data/execution_thresholds.json.
+
+Uso (desde backend/):
+    python -m benchmarks.calibrate_planner
+"""
+import time
+import numpy as np
+from worker_pool import worker_pool
+from models.base_filter import execution_planner
+from models.filters.grayscale_filter import GrayscaleFilter
+from utils.shared_image import map_shared_bands, map_local_bands
+
+
+def best_time(func, repeats=5):
+    """
+    Mejor tiempo (en segundos) de varias ejecuciones de func.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    worker_pool.start()
+    workers = worker_pool.size
+    process_block = GrayscaleFilter._process_block
+
+    # Costo por unidad de trabajo: operación punto a punto en línea sobre una imagen grande
+    large = np.random.randint(0, 256, (2000, 2000, 3), dtype=np.uint8)
+    inline_time = best_time(lambda: map_local_bands(map, process_block, large, large.shape, np.uint8, 1))
+    unit_cost = inline_time / execution_planner.estimate_work(2000, 2000)
+
+    # Costo fijo de cada modo paralelo: repartir una imagen mínima
+    tiny = np.zeros((workers, 8, 3), dtype=np.uint8)
+    inline_overhead = best_time(lambda: map_local_bands(map, process_block, tiny, tiny.shape, np.uint8, 1))
+    thread_overhead = best_time(
+        lambda: map_local_bands(worker_pool.thread_map, process_block, tiny, tiny.shape, np.uint8, workers)
+    ) - inline_overhead
+    process_overhead = best_time(
+        lambda: map_shared_bands(worker_pool, process_block, tiny, tiny.shape, np.uint8, workers)
+    ) - inline_overhead
+
+    # El modo paralelo compensa cuando: trabajo * costo > costo_fijo + trabajo * costo / workers
+    speedup = 1 - 1 / workers if workers > 1 else 0
+    if speedup == 0:
+        thresholds = {'threads': float('inf'), 'processes': float('inf')}
+    else:
+        thresholds = {
+            'threads': max(thread_overhead, 0) / (unit_cost * speedup),
+            'processes': max(process_overhead, 0) / (unit_cost * speedup),
+        }
+
+    print(f"Workers: {workers}")
+    print(f"Costo por unidad de trabajo: {unit_cost * 1e9:.3f} ns")
+    print(f"Costo fijo hilos: {thread_overhead * 1e3:.3f} ms, procesos: {process_overhead * 1e3:.3f} ms")
+    print(f"Umbrales: {thresholds}")
+
+    execution_planner.save_thresholds(thresholds)
+    print(f"Umbrales guardados en {execution_planner.thresholds_file}")
+
+    worker_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,14 @@ from services.image_service import ImageService
 from io import BytesIO
 from flask import Flask, jsonify, request, url_for
 from status import preprocessing_status
-from models.mosaico.mosaic_filter import MosaicFilter
+from models.mosaico.mosaic_filter import reset_library_index, library_index_summary
+from models.mosaico.descriptors import MATCH_MODES
+from models.dithering.error_diffusion import ERROR_DIFFUSION_KERNELS
+from models.erosion.morphology import MORPHOLOGY_OPERATIONS, STRUCTURING_ELEMENTS
+from models.oleo.oleo_filter import OleoFilter
+from models.oleo.palette import PALETTE_METHODS
 import os
+import tempfile
 from PIL import Image
 import time
 import uuid
@@ -24,8 +30,24 @@ image_controller = Blueprint('image_controller', __name__)
 
 @image_controller.route('/status', methods=['GET'])
 def get_status():
+    # 'job' incluye el progreso del último trabajo de indexación (procesadas, total,
+    # imágenes por segundo, tiempo restante estimado y corruptas); 'index' resume la
+    # versión vigente del índice, incluidos los duplicados agrupados
+    job = preprocessing_status.get_job()
+    try:
+        index_summary = library_index_summary()
+        index_state = 'available' if index_summary is not None else 'unavailable'
+    except Exception as e:
+        # El trabajo en segundo plano puede estar publicando una versión en este momento
+        print(f"No se pudo leer el índice de la biblioteca: {e}")
+        index_summary = None
+        index_state = 'updating' if job is not None and job['state'] == 'running' else 'unavailable'
     return jsonify({
-        'preprocessing': preprocessing_status.get_preprocessing()
+        'preprocessing': preprocessing_status.get_preprocessing(),
+        'index_available': index_summary is not None,
+        'index_state': index_state,
+        'index': index_summary,
+        'job': job
     })
 
 
@@ -670,12 +692,18 @@ def apply_floyd_steinberg_dithering():
     # Obtener la imagen del formulario
     image_file = request.files['image']
 
-    # Procesar la imagen aplicando el filtro de dithering Floyd-Steinberg
+    # Kernel de difusión de error (opcional) y recorrido serpentina (opcional)
+    kernel = request.form.get('kernel', 'floyd-steinberg').lower()
+    if kernel not in ERROR_DIFFUSION_KERNELS:
+        return jsonify({"error": f"Valor inválido para 'kernel'. Opciones: {', '.join(ERROR_DIFFUSION_KERNELS)}."}), 400
+    serpentine = request.form.get('serpentine', 'false').lower() == 'true'
+
+    # Procesar la imagen aplicando el filtro de dithering por difusión de error
     time_start = time.time()
 
     image_service = ImageService(image_file)
     try:
-        processed_image = image_service.apply_floyd_steinberg_dithering_filter()
+        processed_image = image_service.apply_floyd_steinberg_dithering_filter(kernel, serpentine)
     except Exception as e:
         return jsonify({"error": "Error al aplicar el filtro: " + str(e)}), 500
 
@@ -703,12 +731,36 @@ def apply_oleo_filter():
     blur = request.form['blur'].lower() == 'true'
     block_size = int(request.form['blockSize'])
 
+    # Moda exacta por color de 24 bits (opcional, lenta) o por histograma cuantizado
+    exact = request.form.get('exact', 'false').lower() == 'true'
+    try:
+        levels = int(request.form.get('levels', OleoFilter.DEFAULT_LEVELS))
+        if not 2 <= levels <= OleoFilter.MAX_LEVELS:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": f"Valor inválido para 'levels'. Debe ser un entero entre 2 y {OleoFilter.MAX_LEVELS}."}), 400
+
+    # Reducir la imagen a una paleta de N colores antes de buscar la moda (opcional)
+    try:
+        palette_size = int(request.form.get('paletteSize', 0)) or None
+        if palette_size is not None and not 2 <= palette_size <= 256:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "Valor inválido para 'paletteSize'. Debe ser un entero entre 2 y 256."}), 400
+    palette_method = request.form.get('paletteMethod', 'median-cut').lower()
+    if palette_method not in PALETTE_METHODS:
+        return jsonify({"error": f"Valor inválido para 'paletteMethod'. Opciones: {', '.join(PALETTE_METHODS)}."}), 400
+    if exact and palette_size:
+        return jsonify({"error": "'exact' no se puede combinar con 'paletteSize'."}), 400
+
     # Procesar la imagen aplicando el filtro de Oleo
     time_start = time.time()
 
     image_service = ImageService(image_file)
     try:
-        processed_image = image_service.apply_oleo_filter(color, blur, block_size)
+        processed_image = image_service.apply_oleo_filter(
+            color, blur, block_size, exact, levels, palette_size, palette_method
+        )
     except Exception as e:
         return jsonify({"error": "Error al aplicar el filtro: " + str(e)}), 500
 
@@ -785,6 +837,65 @@ def apply_max_filter():
     # Enviar la imagen procesada de vuelta al frontend
     return send_file(img_io, mimetype='image/jpeg')
 
+
+# Ruta para aplicar operaciones morfológicas compuestas (apertura, cierre, gradiente, top-hat)
+@image_controller.route('/apply-morphology-filter', methods=['POST'])
+def apply_morphology_filter():
+    if 'image' not in request.files:
+        return jsonify({"error": "No image file uploaded"}), 400
+
+    # Obtener la imagen del formulario
+    image_file = request.files['image']
+
+    # Obtener la operación
+    operation = request.form.get('operation', '').lower()
+    if operation not in MORPHOLOGY_OPERATIONS:
+        return jsonify({"error": f"Valor inválido o faltante para 'operation'. Opciones: {', '.join(MORPHOLOGY_OPERATIONS)}."}), 400
+
+    # Obtener el radio
+    try:
+        radius = int(request.form['radius'])
+        if radius < 1:
+            raise ValueError
+    except (ValueError, KeyError):
+        return jsonify({"error": "Valor inválido o faltante para 'radius'. Debe ser un entero mayor o igual a 1."}), 400
+
+    # Obtener el número de iteraciones (opcional)
+    try:
+        iterations = int(request.form.get('iterations', 1))
+        if iterations < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "Valor inválido para 'iterations'. Debe ser un entero mayor o igual a 1."}), 400
+
+    # Obtener la forma del elemento estructurante (opcional)
+    shape = request.form.get('shape', 'square').lower()
+    if shape not in STRUCTURING_ELEMENTS:
+        return jsonify({"error": f"Valor inválido para 'shape'. Opciones: {', '.join(STRUCTURING_ELEMENTS)}."}), 400
+
+    # Procesar cada canal por separado (opcional)
+    color = request.form.get('color', 'false').lower() == 'true'
+
+    # Procesar la imagen aplicando la operación morfológica
+    time_start = time.time()
+
+    image_service = ImageService(image_file)
+    try:
+        processed_image = image_service.apply_morphology_filter(operation, radius, iterations, shape, color)
+    except Exception as e:
+        return jsonify({"error": "Error al aplicar el filtro: " + str(e)}), 500
+
+    elapsed_time = time.time() - time_start
+    print(f"Tiempo de procesamiento del filtro morfológico ({operation}): {elapsed_time:.2f} segundos")
+
+    # Guardar la imagen procesada en un flujo de bytes
+    img_io = BytesIO()
+    processed_image.save(img_io, 'JPEG')
+    img_io.seek(0)
+
+    # Enviar la imagen procesada de vuelta al frontend
+    return send_file(img_io, mimetype='image/jpeg')
+
 # Ruta para aplicar el filtro mosaico
 @image_controller.route('/apply-mosaic-filter', methods=['POST'])
 def apply_mosaic_filter():
@@ -799,14 +910,43 @@ def apply_mosaic_filter():
         block_width = int(request.form.get('block_width', 10))
         block_height = int(request.form.get('block_height', 10))
         upscale_factor = int(request.form.get('upscale_factor', 1))
+        # Opcionales: comparación perceptual y penalización de tiles repetidos
+        candidates = int(request.form.get('candidates', 8))
+        repetition_penalty = float(request.form.get('repetition_penalty', 0))
     except ValueError:
         return jsonify({"error": "Los parámetros deben ser números enteros"}), 400
 
+    match = request.form.get('match', 'bgr')
+    if match not in MATCH_MODES:
+        return jsonify({"error": f"El modo de comparación debe ser uno de: {', '.join(MATCH_MODES)}"}), 400
+
+    # Opcional: output=tiff escribe el mosaico por bandas en un TIFF, sin tenerlo completo en memoria
+    output = request.form.get('output', 'jpeg').lower()
+    if output not in ('jpeg', 'tiff'):
+        return jsonify({"error": "El formato de salida debe ser 'jpeg' o 'tiff'"}), 400
+
     # Procesar la imagen aplicando el filtro mosaico
 
     image_service = ImageService(image_file)
+    if output == 'tiff':
+        fd, tiff_path = tempfile.mkstemp(suffix='.tif')
+        os.close(fd)
+        try:
+            image_service.write_mosaic_tiff(tiff_path, block_width, block_height, upscale_factor, match,
+                                            candidates, repetition_penalty)
+        except Exception as e:
+            os.remove(tiff_path)
+            print("Error al aplicar el filtro: " + str(e))
+            return jsonify({"error": "Error al aplicar el filtro: " + str(e)}), 500
+
+        # Se borra la entrada del archivo temporal; su contenido sigue disponible mientras se envía
+        tiff_file = open(tiff_path, 'rb')
+        os.remove(tiff_path)
+        return send_file(tiff_file, mimetype='image/tiff', as_attachment=True, download_name='mosaico.tif')
+
     try:
-        processed_image = image_service.apply_mosaic_filter(block_width, block_height, upscale_factor)
+        processed_image = image_service.apply_mosaic_filter(block_width, block_height, upscale_factor, match,
+                                                            candidates, repetition_penalty)
     except Exception as e:
         print("Error al aplicar el filtro: " + str(e))
         return jsonify({"error": "Error al aplicar el filtro: " + str(e)}), 500
@@ -822,12 +962,12 @@ def apply_mosaic_filter():
 # Ruta para reiniciar el preprocesamiento de la biblioteca de imágenes
 @image_controller.route('/reset-preprocessing', methods=['POST'])
 def reset_preprocessing():
-    mosaic_filter = MosaicFilter(Image.new('RGB', (1, 1), color='white'))
+    # Por defecto solo se procesan las imágenes nuevas o modificadas; full=true reconstruye todo
+    full = request.form.get('full', 'false').lower() == 'true'
     try:
-        if os.path.exists(mosaic_filter.csv_file):
-            os.remove(mosaic_filter.csv_file)  # Eliminar el archivo CSV
-        mosaic_filter = MosaicFilter(Image.new('RGB', (1, 1), color='white')) # Ejecutar el preprocesamiento nuevamente
-        return jsonify({"status": "Preprocesamiento reiniciado"}), 200
+        # La indexación corre en segundo plano; el progreso se consulta en /status
+        job_id = reset_library_index(full=full)
+        return jsonify({"status": "Preprocesamiento reiniciado", "job_id": job_id}), 202
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
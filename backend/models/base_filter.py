@@ -1,11 +1,109 @@
+import json
+import os
 from abc import ABC, abstractmethod
 from PIL import Image
+from worker_pool import worker_pool
+from utils.shared_image import map_shared_bands, map_local_bands
+
+
+class ExecutionPlanner:
+    # Costo relativo por píxel de cada tipo de filtro: (costo base, exponente del tamaño del kernel, libera el GIL).
+    # La unidad es el costo por píxel de una operación punto a punto vectorizada.
+    # - point: operaciones punto a punto vectorizadas (escala de grises, mica).
+    # - separable / convolution / fft: motores de ConvolutionFilterRGB.
+    # - window: mínimo/máximo deslizante vectorizado (van Herk/Gil-Werman), independiente del radio.
+    # - histogram: moda con histograma deslizante compilado (óleo), O(kernel) por píxel.
+    # - mode: moda exacta que recorre cada píxel en Python (óleo), no se beneficia de hilos.
+    FILTER_COSTS = {
+        'point': (1.0, 0, True),
+        'separable': (2.0, 1, True),
+        'convolution': (1.0, 2, True),
+        'fft': (25.0, 0, True),
+        'window': (12.0, 0, True),
+        'histogram': (4.0, 1, True),
+        'mode': (1000.0, 1, False),
+    }
+
+    # Umbrales de trabajo (en unidades de costo) a partir de los cuales conviene paralelizar
+    DEFAULT_THRESHOLDS = {
+        'threads': 5e4,
+        'processes': 5e5,
+    }
+
+    def __init__(self, thresholds_file=None):
+        """
+        Decide cómo ejecutar un filtro según el trabajo estimado: en el propio proceso,
+        en un pool de hilos o en el pool de procesos compartido.
+
+        :param thresholds_file: Archivo JSON con umbrales calibrados
+                                (ver benchmarks/calibrate_planner.py).
+        """
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.thresholds_file = thresholds_file or os.path.join(base_dir, 'data', 'execution_thresholds.json')
+        self._thresholds = None
+
+    @property
+    def thresholds(self):
+        """
+        Umbrales vigentes: los calibrados si existe el archivo, si no los predeterminados.
+        """
+        if self._thresholds is None:
+            thresholds = dict(self.DEFAULT_THRESHOLDS)
+            try:
+                with open(self.thresholds_file) as f:
+                    thresholds.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+            self._thresholds = thresholds
+        return self._thresholds
+
+    def save_thresholds(self, thresholds):
+        """
+        Guarda umbrales calibrados y los aplica de inmediato.
+        """
+        os.makedirs(os.path.dirname(self.thresholds_file), exist_ok=True)
+        with open(self.thresholds_file, 'w') as f:
+            json.dump(thresholds, f, indent=2)
+        self._thresholds = None
+
+    def estimate_work(self, height, width, kernel_size=1, filter_type='point'):
+        """
+        Estima el trabajo total del filtro en unidades de costo.
+
+        :param height: Alto de la imagen.
+        :param width: Ancho de la imagen.
+        :param kernel_size: Lado del kernel o ventana (1 para operaciones punto a punto).
+        :param filter_type: Clave de FILTER_COSTS.
+        """
+        base_cost, exponent, _ = self.FILTER_COSTS[filter_type]
+        return height * width * base_cost * kernel_size ** exponent
+
+    def plan(self, height, width, kernel_size=1, filter_type='point', workers=None):
+        """
+        :return: 'inline', 'threads' o 'processes'.
+        """
+        workers = workers or worker_pool.size
+        if workers <= 1:
+            return 'inline'
+
+        work = self.estimate_work(height, width, kernel_size, filter_type)
+        releases_gil = self.FILTER_COSTS[filter_type][2]
+        if work >= self.thresholds['processes']:
+            return 'processes'
+        if releases_gil and work >= self.thresholds['threads']:
+            return 'threads'
+        return 'inline'
+
+
+# Instancia global para ser utilizada en toda la aplicación
+execution_planner = ExecutionPlanner()
+
 
 class BaseFilter(ABC):
     def __init__(self, image):
         """
         Inicializa el filtro con una imagen.
-        
+
         :param image: Objeto de imagen (PIL Image).
         """
         if not isinstance(image, Image.Image):
@@ -19,3 +117,33 @@ class BaseFilter(ABC):
         Debe aplicar el filtro a la imagen y devolver la imagen procesada.
         """
         pass
+
+    def _map_bands(self, process_block, src_array, output_shape, output_dtype, halo=0, extra=None,
+                   kernel_size=1, filter_type='point', num_bands=None):
+        """
+        Aplica process_block por franjas de filas usando el modo de ejecución que
+        elija el planificador.
+
+        :param process_block: Función que procesa un bloque (ver utils.shared_image).
+        :param src_array: Arreglo de entrada, con `halo` filas de padding arriba y abajo.
+        :param output_shape: Forma del arreglo de salida.
+        :param output_dtype: Tipo de dato de la salida.
+        :param halo: Filas de padding de la entrada a cada lado.
+        :param extra: Argumentos adicionales para process_block.
+        :param kernel_size: Lado del kernel, para estimar el trabajo.
+        :param filter_type: Tipo de filtro, para estimar el trabajo.
+        :param num_bands: Número de franjas; por defecto una por worker (una sola si se ejecuta en línea).
+        :return: Arreglo NumPy con la salida.
+        """
+        height, width = output_shape[:2]
+        workers = getattr(self, 'num_processes', None) or worker_pool.size
+        mode = execution_planner.plan(height, width, kernel_size, filter_type, workers)
+
+        if mode == 'inline':
+            return map_local_bands(map, process_block, src_array, output_shape, output_dtype,
+                                   num_bands or 1, halo, extra)
+        if mode == 'threads':
+            return map_local_bands(worker_pool.thread_map, process_block, src_array, output_shape,
+                                   output_dtype, num_bands or workers, halo, extra)
+        return map_shared_bands(worker_pool, process_block, src_array, output_shape, output_dtype,
+                                num_bands or workers, halo, extra)
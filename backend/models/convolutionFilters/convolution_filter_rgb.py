@@ -1,13 +1,25 @@
 import numpy as np
+import scipy.fft
 from PIL import Image
 from models.base_filter import BaseFilter
-from multiprocessing import Pool, cpu_count
+from worker_pool import worker_pool
 
 class ConvolutionFilterRGB(BaseFilter):
+    # Tolerancia relativa para considerar que un valor singular es cero
+    SEPARABLE_TOLERANCE = 1e-6
+
+    # Modelo de costo (en unidades de "multiplicación-suma directa por píxel")
+    # Costo relativo de la FFT por píxel y por log2 del tamaño de la transformada
+    FFT_COST_FACTOR = 1.2
+    # Lado preferido de los mosaicos de salida del motor FFT (overlap-save)
+    FFT_TILE_SIZE = 512
+    # Resultado de _matches_direct por motor y kernel
+    _engine_checks = {}
+
     def __init__(self, image, kernel=None, num_processes=None):
         super().__init__(image)
         self.kernel = kernel
-        self.num_processes = num_processes or cpu_count()
+        self.num_processes = num_processes or worker_pool.size
 
     def apply_convolution(self, kernel=None):
         kernel = kernel if kernel is not None else self.kernel
@@ -27,34 +39,240 @@ class ConvolutionFilterRGB(BaseFilter):
         # Aplicar padding a la imagen
         padded_image = np.pad(pixels, ((pad, pad), (pad, pad), (0, 0)), mode='edge')
 
-        # Dividir la imagen en bloques para multiprocesamiento
-        blocks = self._split_into_blocks(padded_image, self.num_processes, pad, kernel_size)
+        height, width, _ = pixels.shape
 
-        # Procesar los bloques
-        if len(blocks) == 1:
-            # Si solo hay un bloque, procesar sin multiprocesamiento
-            processed_blocks = [self._process_block((blocks[0], kernel))]
-        else:
-            with Pool(self.num_processes) as pool:
-                processed_blocks = pool.map(self._process_block, [(block, kernel) for block in blocks])
+        # Elegir el motor más barato según el modelo de costo
+        band_shape = (height // self.num_processes + 2 * pad, width + 2 * pad, 3)
+        separable = self._separate_kernel(kernel)
+        engine = self._select_engine(kernel, separable, band_shape)
+        process_block, extra = self._engine_block(engine, kernel, separable)
+
+        # Procesar los bloques; el planificador decide si se ejecuta en línea,
+        # con hilos o en el pool de procesos según el trabajo estimado
+        filter_type = 'convolution' if engine == 'direct' else engine
+        output_image = self._map_bands(
+            process_block, padded_image, (height, width, 3), np.float32,
+            pad, extra, kernel_size, filter_type
+        )
 
-        # Combinar los bloques procesados
-        output_image = np.vstack(processed_blocks)
         output_image = np.clip(output_image, 0, 255).astype(np.uint8)
         return Image.fromarray(output_image, mode='RGB')
 
-    def _split_into_blocks(self, array, num_blocks, pad, kernel_size):
-        height = array.shape[0] - 2 * pad  # Altura original
-        block_size = height // num_blocks
-        blocks = []
-        for i in range(num_blocks):
-            start = i * block_size + pad
-            end = start + block_size
-            if i == num_blocks - 1:
-                end = height + pad
-            block = array[start - pad:end + pad, :, :]
-            blocks.append(block)
-        return blocks
+    @classmethod
+    def _separate_kernel(cls, kernel):
+        """
+        Detecta mediante SVD si el kernel es de rango 1 y, en ese caso, lo factoriza
+        en un vector columna y un vector fila tales que kernel = columna * fila.
+
+        :param kernel: Kernel 2D.
+        :return: Tupla (columna, fila) en float64, o None si el kernel no es separable.
+        """
+        kernel = np.asarray(kernel, dtype=np.float64)
+        if kernel.ndim != 2 or min(kernel.shape) < 2:
+            return None
+
+        u, s, vt = np.linalg.svd(kernel)
+        if s[0] == 0 or s[1] > cls.SEPARABLE_TOLERANCE * s[0]:
+            return None
+
+        # Repartir el valor singular entre ambos factores
+        scale = np.sqrt(s[0])
+        column = u[:, 0] * scale
+        row = vt[0, :] * scale
+        # Reescalar para que la suma de columna * fila sea exactamente la del kernel: así un
+        # kernel normalizado deja intactas las regiones planas
+        total = column.sum() * row.sum()
+        if total != 0 and np.sign(total) == np.sign(kernel.sum()):
+            factor = np.sqrt(kernel.sum() / total)
+            column = column * factor
+            row = row * factor
+        return column, row
+
+    @classmethod
+    def _engine_block(cls, engine, kernel, separable):
+        """
+        Función que procesa cada bloque con el motor indicado y sus argumentos extra.
+
+        :return: Tupla (process_block, extra).
+        """
+        if engine == 'separable':
+            return cls._process_block_separable, (separable,)
+        if engine == 'fft':
+            return cls._process_block_fft, (kernel, cls.FFT_TILE_SIZE)
+        return cls._process_block, (kernel,)
+
+    @staticmethod
+    def _probe_blocks(kernel_shape):
+        """
+        Bloques con padding para comparar un motor con la convolución directa: una tira con
+        una región plana de kh x kw por cada nivel de gris (la salida útil está cada kw columnas)
+        y un degradado distinto en cada canal.
+
+        :return: Lista de tuplas (bloque, paso entre columnas útiles de la salida).
+        """
+        kernel_height, kernel_width = kernel_shape
+        levels = np.arange(256, dtype=np.float32)
+        flat = np.repeat(np.repeat(levels, kernel_width)[np.newaxis, :, np.newaxis], kernel_height, axis=0)
+        flat = np.repeat(flat, 3, axis=2)
+
+        yy, xx = np.mgrid[0:64, 0:96]
+        gradient = np.dstack([xx * 255 / 95, yy * 255 / 63, (xx + yy) % 256]).astype(np.float32)
+        pad_h = kernel_height // 2
+        pad_w = kernel_width // 2
+        gradient = np.pad(gradient, ((pad_h, pad_h), (pad_w, pad_w), (0, 0)), mode='edge')
+        return [(flat, kernel_width), (gradient, 1)]
+
+    @classmethod
+    def _matches_direct(cls, engine, kernel, separable):
+        """
+        Indica si el motor produce, ya convertido a uint8, la misma imagen que la convolución
+        directa sobre los bloques de prueba. Los motores rápidos acumulan en otro orden y con
+        otra precisión; como la conversión a uint8 trunca, una diferencia mínima bajo un
+        entero cambia el nivel del píxel (por ejemplo, un kernel de promedio en float32 haría
+        que una imagen plana de 100 quede en 99).
+        """
+        key = (engine, kernel.dtype.str, kernel.shape, kernel.tobytes())
+        matches = cls._engine_checks.get(key)
+        if matches is None:
+            matches = cls._compare_with_direct(engine, kernel, separable)
+            cls._engine_checks[key] = matches
+        return matches
+
+    @classmethod
+    def _compare_with_direct(cls, engine, kernel, separable):
+        """
+        Compara el motor con la convolución directa sobre los bloques de prueba (ver _matches_direct).
+        """
+        process_block, extra = cls._engine_block(engine, kernel, separable)
+        for block, step in cls._probe_blocks(kernel.shape):
+            expected = cls._process_block((block, kernel))[:, ::step]
+            actual = process_block((block,) + extra)[:, ::step]
+            if not np.array_equal(np.clip(expected, 0, 255).astype(np.uint8),
+                                  np.clip(actual, 0, 255).astype(np.uint8)):
+                return False
+        return True
+
+    @classmethod
+    def _select_engine(cls, kernel, separable, block_shape):
+        """
+        Estima el costo por píxel de cada motor y devuelve el más barato entre los que dan
+        el mismo resultado que la convolución directa (ver _matches_direct).
+
+        - 'direct': kh * kw multiplicaciones por píxel.
+        - 'separable': kh + kw multiplicaciones por píxel (solo kernels de rango 1).
+        - 'fft': proporcional a log2 del tamaño de la transformada, más el
+          desperdicio del halo de cada mosaico.
+
+        :param kernel: Kernel 2D.
+        :param separable: Resultado de _separate_kernel (o None).
+        :param block_shape: Forma del bloque con padding que procesará cada worker.
+        :return: 'direct', 'separable' o 'fft'.
+        """
+        kernel_height, kernel_width = kernel.shape
+        costs = {'direct': kernel_height * kernel_width}
+        if separable is not None:
+            costs['separable'] = kernel_height + kernel_width
+
+        output_height = block_shape[0] - 2 * (kernel_height // 2)
+        output_width = block_shape[1] - 2 * (kernel_width // 2)
+        fft_shape, tile_shape = cls._fft_tile_shapes(
+            kernel.shape, (output_height, output_width), cls.FFT_TILE_SIZE
+        )
+        fft_area = fft_shape[0] * fft_shape[1]
+        # Fracción de cada transformada que produce píxeles útiles
+        halo_overhead = fft_area / (tile_shape[0] * tile_shape[1])
+        costs['fft'] = cls.FFT_COST_FACTOR * np.log2(fft_area) * halo_overhead
+
+        for engine in sorted(costs, key=costs.get):
+            if engine == 'direct' or cls._matches_direct(engine, kernel, separable):
+                return engine
+        return 'direct'
+
+    @staticmethod
+    def _fft_tile_shapes(kernel_shape, output_shape, tile_size):
+        """
+        Calcula el tamaño de la transformada y el tamaño de salida útil de cada mosaico
+        para el motor FFT.
+
+        :return: Tupla (fft_shape, tile_shape).
+        """
+        fft_shape = []
+        tile_shape = []
+        for k, n in zip(kernel_shape, output_shape):
+            length = scipy.fft.next_fast_len(min(tile_size, n) + k - 1, real=True)
+            fft_shape.append(length)
+            tile_shape.append(length - k + 1)
+        return tuple(fft_shape), tuple(tile_shape)
+
+    @classmethod
+    def _process_block_fft(cls, args):
+        """
+        Aplica el kernel a un bloque multiplicando en el dominio de la frecuencia.
+        El bloque se recorre en mosaicos (overlap-save) para acotar el tamaño de las
+        transformadas; cada mosaico lee su halo del propio bloque con padding, por lo
+        que los bordes se comportan igual que en la convolución directa.
+        """
+        block, kernel, tile_size = args
+        kernel_height, kernel_width = kernel.shape
+        pad_h = kernel_height // 2
+        pad_w = kernel_width // 2
+
+        block_height, block_width, _ = block.shape
+        output_height = block_height - 2 * pad_h
+        output_width = block_width - 2 * pad_w
+
+        fft_shape, (tile_height, tile_width) = cls._fft_tile_shapes(
+            kernel.shape, (output_height, output_width), tile_size
+        )
+
+        # La convolución directa es una correlación: invertir el kernel para la FFT
+        flipped = np.asarray(kernel, dtype=np.float64)[::-1, ::-1]
+        kernel_fft = scipy.fft.rfft2(flipped, fft_shape)[:, :, np.newaxis]
+
+        output_block = np.zeros((output_height, output_width, 3), dtype=np.float32)
+        for y in range(0, output_height, tile_height):
+            for x in range(0, output_width, tile_width):
+                out_h = min(tile_height, output_height - y)
+                out_w = min(tile_width, output_width - x)
+                tile = block[y:y + out_h + kernel_height - 1, x:x + out_w + kernel_width - 1, :]
+
+                tile_fft = scipy.fft.rfft2(tile.astype(np.float64), fft_shape, axes=(0, 1))
+                result = scipy.fft.irfft2(tile_fft * kernel_fft, fft_shape, axes=(0, 1))
+
+                # La parte válida de la convolución lineal empieza en (kh - 1, kw - 1)
+                output_block[y:y + out_h, x:x + out_w, :] = result[
+                    kernel_height - 1:kernel_height - 1 + out_h,
+                    kernel_width - 1:kernel_width - 1 + out_w,
+                    :
+                ]
+
+        return output_block
+
+    @staticmethod
+    def _process_block_separable(args):
+        """
+        Aplica un kernel separable a un bloque con dos pasadas 1D (horizontal y vertical).
+        El costo por píxel es 2k en lugar de k². Ambas pasadas acumulan en float64.
+        """
+        block, (column, row) = args
+        pad_h = column.shape[0] // 2
+        pad_w = row.shape[0] // 2
+
+        block_height, block_width, _ = block.shape
+        output_height = block_height - 2 * pad_h
+        output_width = block_width - 2 * pad_w
+
+        # Pasada horizontal: se conservan las filas de padding para la pasada vertical
+        horizontal = np.zeros((block_height, output_width, 3), dtype=np.float64)
+        for j, weight in enumerate(row):
+            horizontal += weight * block[:, j:j + output_width, :]
+
+        # Pasada vertical sobre el resultado horizontal
+        output_block = np.zeros((output_height, output_width, 3), dtype=np.float64)
+        for i, weight in enumerate(column):
+            output_block += weight * horizontal[i:i + output_height, :, :]
+
+        return output_block.astype(np.float32)
 
     @staticmethod
     def _process_block(args):
@@ -2,6 +2,7 @@ from PIL import Image
 import numpy as np
 from models.base_filter import BaseFilter
 from models.filters.grayscale_filter import GrayscaleFilter
+from models.filters.point_ops import TiledPointOp
 
 class ClusteredDitheringFilter(BaseFilter):
 
@@ -12,7 +13,7 @@ class ClusteredDitheringFilter(BaseFilter):
         """
         # Convert to grayscale using GrayscaleFilter
         im_gray = GrayscaleFilter(image)
-        super().__init__(im_gray.apply_filter())  # Initialize base class with grayscale image
+        super().__init__(im_gray.apply_filter(output_mode='L'))  # Initialize base class with a single-channel image
 
         self.width, self.height = self.image.size
 
@@ -32,19 +33,12 @@ class ClusteredDitheringFilter(BaseFilter):
         :return: Dithered PIL Image.
         """
         # Convert image to NumPy array
-        image_array = np.array(self.image.convert('L'), dtype=np.uint8)
+        image_array = np.array(self.image, dtype=np.uint8)
 
-        # Create a threshold map based on the position in the 3x3 matrix
-        Y, X = np.indices((self.height, self.width))
-        cluster_indices_x = X % 3
-        cluster_indices_y = Y % 3
-        threshold_map = self.threshold_matrix[cluster_indices_y, cluster_indices_x]
-
-        # Create mask where pixel value is less than the threshold
-        mask = image_array < threshold_map
-
-        # Create the result array: 0 where mask is True, 255 otherwise
-        result_array = np.where(mask, 0, 255).astype(np.uint8)
+        # Each position in the 3x3 matrix has its own lookup table:
+        # 0 where the pixel value is less than the threshold, 255 otherwise
+        dithering = TiledPointOp.ordered_threshold(self.threshold_matrix)
+        result_array = dithering.apply(image_array)
 
         # Convert result array to PIL Image
         result_image = Image.fromarray(result_array, mode='L')
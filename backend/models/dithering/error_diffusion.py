@@ -0,0 +1,175 @@
+from PIL import Image
+import numpy as np
+from models.base_filter import BaseFilter
+from models.filters.grayscale_filter import GrayscaleFilter
+from utils.jit import njit, prange, num_threads
+
+
+# Kernels de difusión de error: lista de (dy, dx, peso) relativa al píxel actual y divisor.
+# El error que recibe cada vecino es error * peso / divisor.
+ERROR_DIFFUSION_KERNELS = {
+    'floyd-steinberg': (
+        [(0, 1, 7),
+         (1, -1, 3), (1, 0, 5), (1, 1, 1)],
+        16,
+    ),
+    'jarvis-judice-ninke': (
+        [(0, 1, 7), (0, 2, 5),
+         (1, -2, 3), (1, -1, 5), (1, 0, 7), (1, 1, 5), (1, 2, 3),
+         (2, -2, 1), (2, -1, 3), (2, 0, 5), (2, 1, 3), (2, 2, 1)],
+        48,
+    ),
+    'stucki': (
+        [(0, 1, 8), (0, 2, 4),
+         (1, -2, 2), (1, -1, 4), (1, 0, 8), (1, 1, 4), (1, 2, 2),
+         (2, -2, 1), (2, -1, 2), (2, 0, 4), (2, 1, 2), (2, 2, 1)],
+        42,
+    ),
+    'atkinson': (
+        # Atkinson solo difunde 6/8 del error
+        [(0, 1, 1), (0, 2, 1),
+         (1, -1, 1), (1, 0, 1), (1, 1, 1),
+         (2, 0, 1)],
+        8,
+    ),
+    'burkes': (
+        [(0, 1, 8), (0, 2, 4),
+         (1, -2, 2), (1, -1, 4), (1, 0, 8), (1, 1, 4), (1, 2, 2)],
+        32,
+    ),
+    'sierra': (
+        [(0, 1, 5), (0, 2, 3),
+         (1, -2, 2), (1, -1, 4), (1, 0, 5), (1, 1, 4), (1, 2, 2),
+         (2, -1, 2), (2, 0, 3), (2, 1, 2)],
+        32,
+    ),
+}
+
+
+@njit(cache=True)
+def _diffuse_span(pixels, y, x_start, x_stop, step, dys, dxs, weights, divisor):
+    """
+    Binariza los píxeles de la fila y en [x_start, x_stop) recorridos con el paso dado
+    (1 de izquierda a derecha, -1 de derecha a izquierda) y difunde el error.
+    En el recorrido de derecha a izquierda el kernel se refleja horizontalmente.
+    """
+    height, width = pixels.shape
+    white = np.float32(255)
+    black = np.float32(0)
+    for x in range(x_start, x_stop, step):
+        old_pixel = pixels[y, x]
+        new_pixel = white if old_pixel > 128 else black
+        pixels[y, x] = new_pixel
+
+        quant_error = old_pixel - new_pixel
+        for i in range(dys.shape[0]):
+            ny = y + dys[i]
+            nx = x + dxs[i] * step
+            if ny < height and 0 <= nx < width:
+                pixels[ny, nx] += quant_error * weights[i] / divisor
+
+
+@njit(cache=True)
+def diffuse_sequential(pixels, dys, dxs, weights, divisor, serpentine):
+    """
+    Difusión de error fila por fila en su lugar. Con serpentine=True las filas impares
+    se recorren de derecha a izquierda.
+
+    :param pixels: Arreglo float32 de forma (alto, ancho) con valores en [0, 255].
+    """
+    height, width = pixels.shape
+    for y in range(height):
+        if serpentine and y % 2 == 1:
+            _diffuse_span(pixels, y, width - 1, -1, -1, dys, dxs, weights, divisor)
+        else:
+            _diffuse_span(pixels, y, 0, width, 1, dys, dxs, weights, divisor)
+
+
+@njit(cache=True, parallel=True)
+def diffuse_wavefront(pixels, dys, dxs, weights, divisor, chunk):
+    """
+    Difusión de error en su lugar con un frente de onda sesgado: las filas se dividen en
+    bloques de `chunk` columnas y la fila y procesa el bloque k en el paso k + 2y.
+    Con bloques más anchos que el doble del alcance horizontal del kernel, cada bloque
+    ya recibió todo el error de las filas anteriores y los bloques de un mismo paso
+    escriben en columnas disjuntas, así que se procesan en paralelo y el resultado es
+    idéntico al del recorrido secuencial.
+
+    :param chunk: Ancho de los bloques de columnas.
+    """
+    height, width = pixels.shape
+    num_chunks = (width + chunk - 1) // chunk
+    for step in range(num_chunks + 2 * (height - 1)):
+        # Filas activas en este paso: 0 <= step - 2y < num_chunks
+        first_row = max(0, (step - num_chunks + 2) // 2)
+        last_row = min(height - 1, step // 2)
+        for i in prange(last_row - first_row + 1):
+            y = first_row + i
+            x_start = (step - 2 * y) * chunk
+            _diffuse_span(pixels, y, x_start, min(x_start + chunk, width), 1, dys, dxs, weights, divisor)
+
+
+class ErrorDiffusionDitheringFilter(BaseFilter):
+    # Tamaño mínimo (en píxeles) para usar el frente de onda paralelo en modo 'auto'
+    WAVEFRONT_MIN_PIXELS = 1_000_000
+    # Ancho de los bloques de columnas del frente de onda
+    WAVEFRONT_CHUNK = 256
+
+    def __init__(self, image, kernel='floyd-steinberg', serpentine=False, schedule='auto'):
+        """
+        Inicializa el filtro de dithering por difusión de error con una imagen en escala de grises.
+
+        :param image: Objeto de imagen (PIL Image).
+        :param kernel: Nombre del kernel (ver ERROR_DIFFUSION_KERNELS).
+        :param serpentine: Si es True, las filas impares se recorren de derecha a izquierda.
+        :param schedule: 'sequential', 'wavefront' (paralelo) o 'auto' (wavefront para
+                         imágenes grandes). El recorrido serpentina siempre es secuencial.
+        """
+        if kernel not in ERROR_DIFFUSION_KERNELS:
+            raise ValueError(
+                f"Kernel de difusión desconocido: '{kernel}'. "
+                f"Opciones: {', '.join(ERROR_DIFFUSION_KERNELS)}."
+            )
+        if schedule not in ('auto', 'sequential', 'wavefront'):
+            raise ValueError("El recorrido debe ser 'auto', 'sequential' o 'wavefront'.")
+        if serpentine and schedule == 'wavefront':
+            raise ValueError("El recorrido serpentina no admite el frente de onda paralelo.")
+
+        # Pedir directamente la salida de un solo canal (modo 'L')
+        gray_image = GrayscaleFilter(image).apply_filter(output_mode='L')
+        super().__init__(gray_image)
+
+        self.width, self.height = self.image.size
+        self.kernel = kernel
+        self.serpentine = serpentine
+        self.schedule = schedule
+
+        # Kernel como arreglos para el motor compilado; pesos float32 como en Floyd-Steinberg
+        offsets, divisor = ERROR_DIFFUSION_KERNELS[kernel]
+        self.dys = np.array([dy for dy, _, _ in offsets], dtype=np.int64)
+        self.dxs = np.array([dx for _, dx, _ in offsets], dtype=np.int64)
+        self.weights = np.array([weight for _, _, weight in offsets], dtype=np.float32)
+        self.divisor = np.float32(divisor)
+
+    def _use_wavefront(self):
+        if self.serpentine or self.schedule == 'sequential':
+            return False
+        if self.schedule == 'wavefront':
+            return True
+        return num_threads() > 1 and self.width * self.height >= self.WAVEFRONT_MIN_PIXELS
+
+    def apply_filter(self):
+        """
+        Aplica el dithering por difusión de error a la imagen.
+        :return: Imagen procesada con dithering (modo 'L').
+        """
+        pixels = np.array(self.image, dtype=np.float32)
+
+        if self._use_wavefront():
+            # Los bloques deben ser más anchos que el doble del alcance horizontal del kernel
+            chunk = max(self.WAVEFRONT_CHUNK, 2 * int(np.abs(self.dxs).max()) + 1)
+            diffuse_wavefront(pixels, self.dys, self.dxs, self.weights, self.divisor, chunk)
+        else:
+            diffuse_sequential(pixels, self.dys, self.dxs, self.weights, self.divisor, self.serpentine)
+
+        return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), mode='L')
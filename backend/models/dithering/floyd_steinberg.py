@@ -2,6 +2,48 @@ from PIL import Image
 import numpy as np
 from models.base_filter import BaseFilter
 from models.filters.grayscale_filter import GrayscaleFilter
+from utils.jit import njit
+
+
+# Pesos de Floyd-Steinberg como float32 para que la versión compilada y la de Python
+# hagan exactamente las mismas operaciones (mismo redondeo, salida idéntica bit a bit)
+_WHITE = np.float32(255)
+_BLACK = np.float32(0)
+_SIXTEEN = np.float32(16)
+_RIGHT = np.float32(7)
+_DOWN_LEFT = np.float32(3)
+_DOWN = np.float32(5)
+_DOWN_RIGHT = np.float32(1)
+
+
+@njit(cache=True)
+def floyd_steinberg_diffuse(pixels):
+    """
+    Binariza `pixels` en su lugar difundiendo el error de cuantización de Floyd-Steinberg.
+    Se compila con numba cuando está disponible; `floyd_steinberg_diffuse.py_func` es la
+    versión en Python puro.
+
+    :param pixels: Arreglo float32 de forma (alto, ancho) con valores en [0, 255].
+    """
+    height, width = pixels.shape
+    for y in range(height):
+        for x in range(width):
+            # Redondear al color más cercano (0 o 255)
+            old_pixel = pixels[y, x]
+            new_pixel = _WHITE if old_pixel > 128 else _BLACK
+            pixels[y, x] = new_pixel
+
+            # Calcular el error de cuantización y distribuirlo a los píxeles vecinos
+            quant_error = old_pixel - new_pixel
+            if x + 1 < width:
+                pixels[y, x + 1] += quant_error * _RIGHT / _SIXTEEN
+            if y + 1 < height:
+                if x - 1 >= 0:
+                    pixels[y + 1, x - 1] += quant_error * _DOWN_LEFT / _SIXTEEN
+                pixels[y + 1, x] += quant_error * _DOWN / _SIXTEEN
+                if x + 1 < width:
+                    pixels[y + 1, x + 1] += quant_error * _DOWN_RIGHT / _SIXTEEN
+
 
 class FloydSteinbergDitheringFilter(BaseFilter):
 
@@ -12,8 +54,8 @@ class FloydSteinbergDitheringFilter(BaseFilter):
         """
         # Convertir la imagen a escala de grises usando el filtro correspondiente
         im_gray = GrayscaleFilter(image)
-        # Convertir la imagen devuelta de RGB a escala de grises (modo 'L')
-        gray_image = im_gray.apply_filter().convert('L')
+        # Pedir directamente la salida de un solo canal (modo 'L'), sin intermedio RGB
+        gray_image = im_gray.apply_filter(output_mode='L')
         super().__init__(gray_image)  # Llamar al constructor de la clase base con la imagen en escala de grises
 
         self.width, self.height = self.image.size
@@ -25,29 +67,9 @@ class FloydSteinbergDitheringFilter(BaseFilter):
         """
         # Convertir la imagen a un arreglo numpy para manipular los píxeles
         pixels = np.array(self.image, dtype=np.float32)
-        
-        # Iterar sobre cada píxel de la imagen
-        for y in range(self.height):
-            for x in range(self.width):
-                # Obtener el valor del píxel original
-                old_pixel = pixels[y, x]
-                
-                # Redondear al color más cercano (0 o 255)
-                new_pixel = 255 if old_pixel > 128 else 0
-                pixels[y, x] = new_pixel
-                
-                # Calcular el error de cuantización
-                quant_error = old_pixel - new_pixel
-                
-                # Distribuir el error a los píxeles vecinos
-                if x + 1 < self.width:
-                    pixels[y, x + 1] += quant_error * 7 / 16
-                if x - 1 >= 0 and y + 1 < self.height:
-                    pixels[y + 1, x - 1] += quant_error * 3 / 16
-                if y + 1 < self.height:
-                    pixels[y + 1, x] += quant_error * 5 / 16
-                if x + 1 < self.width and y + 1 < self.height:
-                    pixels[y + 1, x + 1] += quant_error * 1 / 16
+
+        # Difundir el error con el motor compilado (o en Python puro si numba no está disponible)
+        floyd_steinberg_diffuse(pixels)
 
         # Convertir el arreglo de píxeles de vuelta a una imagen en escala de grises
         result_image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), mode='L')
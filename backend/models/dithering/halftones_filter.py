@@ -16,7 +16,7 @@ class HalftoneFilter(BaseFilter):
         :param num_variations: Número de versiones en escala de grises.
         """
         im_gray = GrayscaleFilter(image)
-        super().__init__(im_gray.apply_filter())
+        super().__init__(im_gray.apply_filter(output_mode='L'))
         
         # Obtener dimensiones originales de la imagen
         width, height = self.image.size
@@ -82,10 +82,9 @@ class HalftoneFilter(BaseFilter):
         
         # Imagen escalada al tamaño de la cuadrícula
         image_upscaled = self.image.resize((self.width, self.height))
-        image_upscaled_data = np.array(image_upscaled)
         
-        # Extraer el canal de escala de grises (suponiendo que R=G=B)
-        gray_data = image_upscaled_data[:, :, 0]
+        # La imagen ya es de un solo canal (modo 'L')
+        gray_data = np.array(image_upscaled)
         
         # Calcular las dimensiones de los bloques
         height_blocks = self.height // self.grid_dim
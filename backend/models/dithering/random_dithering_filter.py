@@ -11,7 +11,7 @@ class RandomDitheringFilter(BaseFilter):
         :param image: Objeto de imagen (PIL Image).
         """
         im_gray = GrayscaleFilter(image)
-        super().__init__(im_gray.apply_filter())
+        super().__init__(im_gray.apply_filter(output_mode='L'))
 
         # Obtener dimensiones originales de la imagen
         self.width, self.height = self.image.size
@@ -21,25 +21,16 @@ class RandomDitheringFilter(BaseFilter):
         Método que aplica el dithering aleatorio a la imagen en escala de grises.
         :return: Imagen procesada con dithering aleatorio.
         """
-        # Convertir la imagen a un arreglo NumPy
-        image_array = np.array(self.image)
+        # Convertir la imagen (un solo canal de brillo) a un arreglo NumPy
+        brightness = np.array(self.image, dtype=np.uint8)
 
         # Generar una matriz aleatoria del mismo tamaño que la imagen
         random_matrix = np.random.randint(0, 256, (self.height, self.width), dtype=np.uint8)
 
-        # Obtener el canal de brillo (asumiendo escala de grises, R=G=B)
-        brightness = image_array[:, :, 0]
+        # Negro donde el brillo es MENOR o IGUAL al valor aleatorio, blanco en otro caso
+        result_array = np.where(brightness <= random_matrix, 0, 255).astype(np.uint8)
 
-        # Crear una máscara donde el brillo es MENOR o IGUAL al valor aleatorio
-        mask = brightness <= random_matrix
-
-        # Inicializar el arreglo de resultado con blanco
-        result_array = np.ones_like(image_array) * 255
-
-        # Asignar negro donde la máscara es verdadera
-        result_array[mask] = [0, 0, 0]
-
-        # Convertir el arreglo de resultado a una imagen PIL
-        result_image = Image.fromarray(result_array.astype('uint8'), 'RGB')
+        # Convertir el arreglo de resultado a una imagen PIL (se mantiene la salida RGB)
+        result_image = Image.fromarray(result_array, 'L').convert('RGB')
 
         return result_image
\ No newline at end of file
@@ -1,29 +1,56 @@
 import numpy as np
 from PIL import Image
-from multiprocessing import Pool, cpu_count
 from models.base_filter import BaseFilter
 from models.filters.grayscale_filter import GrayscaleFilter
 
+def running_extreme(padded, window, axis, operation):
+    """
+    Running max/min over a sliding window along one axis (van Herk/Gil-Werman).
+    The axis is split into blocks of `window` elements; for each block we take the
+    prefix extreme (left to right) and the suffix extreme (right to left). Every window
+    spans at most two consecutive blocks, so its extreme is
+    max(suffix[i], prefix[i + window - 1]): about three comparisons per element,
+    regardless of the window size.
+
+    :param padded: Array padded with window // 2 elements on each side of `axis`.
+    :param window: Window length (2 * radius + 1).
+    :param axis: Axis along which the window slides.
+    :param operation: 'max' or 'min'.
+    :return: Array whose length along `axis` is shrunk by window - 1.
+    """
+    ufunc = np.maximum if operation == 'max' else np.minimum
+    identity = np.iinfo(padded.dtype).min if operation == 'max' else np.iinfo(padded.dtype).max
+
+    # Work with the sliding axis first so accumulate runs over contiguous rows
+    data = np.moveaxis(padded, axis, 0)
+    length = data.shape[0]
+    out_length = length - window + 1
+
+    # Pad to a whole number of blocks with the identity of the operation
+    num_blocks = -(-length // window)
+    blocks = np.full((num_blocks * window,) + data.shape[1:], identity, dtype=padded.dtype)
+    blocks[:length] = data
+    blocks = blocks.reshape((num_blocks, window) + data.shape[1:])
+
+    prefix = ufunc.accumulate(blocks, axis=1).reshape((-1,) + data.shape[1:])
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape((-1,) + data.shape[1:])
+
+    result = ufunc(suffix[:out_length], prefix[window - 1:window - 1 + out_length])
+    return np.moveaxis(result, 0, axis)
+
+
 def process_chunk(args):
     """
     Process a chunk of rows in the image.
 
-    :param args: Tuple containing padded_array, y_start, y_end, width, radius, operation
-    :return: Tuple of y_start and the processed chunk array
+    :param args: Tuple containing the padded chunk (radius extra rows/columns on each side), radius, operation
+    :return: The processed chunk array
     """
-    padded_array, y_start, y_end, width, radius, operation = args
-    chunk_height = y_end - y_start
-    chunk_result = np.zeros((chunk_height, width), dtype=np.uint8)
-    for idx, y in enumerate(range(y_start, y_end)):
-        for x in range(width):
-            # Extract the kernel
-            kernel = padded_array[y : y + 2*radius + 1, x : x + 2*radius + 1]
-            if operation == 'max':
-                value = np.max(kernel)
-            else:
-                value = np.min(kernel)
-            chunk_result[idx, x] = value
-    return y_start, chunk_result
+    padded_chunk, radius, operation = args
+    window = 2 * radius + 1
+    # A square window is separable: running extreme along the rows, then along the columns
+    rows_result = running_extreme(padded_chunk, window, 1, operation)
+    return running_extreme(rows_result, window, 0, operation)
 
 class MinMaxKernelFilter(BaseFilter):
     def apply_filter(self, radius, operation='max'):
@@ -41,7 +68,7 @@ class MinMaxKernelFilter(BaseFilter):
 
         # Convert the image to grayscale if not already
         gray_convert = GrayscaleFilter(self.image)
-        gray_image = gray_convert.apply_filter().convert('L')
+        gray_image = gray_convert.apply_filter(output_mode='L')
 
         # Convert the image to a NumPy array
         image_array = np.array(gray_image, dtype=np.uint8)
@@ -53,29 +80,13 @@ class MinMaxKernelFilter(BaseFilter):
         pad_width = radius
         padded_array = np.pad(image_array, pad_width, mode='edge')
 
-        # Prepare arguments for multiprocessing
-        num_workers = cpu_count()
-        print(f"Using {num_workers} CPU cores for multiprocessing.")
-
-        # Determine chunk size
-        chunk_size = max(1, height // (num_workers * 4))  # Adjust factor as needed
-        args_list = []
-        for y_start in range(0, height, chunk_size):
-            y_end = min(y_start + chunk_size, height)
-            args = (padded_array, y_start, y_end, width, radius, operation)
-            args_list.append(args)
-
-        # Initialize the processed array
-        processed_array = np.zeros_like(image_array)
-
-        # Process chunks in parallel
-        with Pool(processes=num_workers) as pool:
-            results = pool.map(process_chunk, args_list)
-
-        # Collect results
-        for y_start, chunk_result in results:
-            y_end = y_start + chunk_result.shape[0]
-            processed_array[y_start:y_end, :] = chunk_result
+        # Process bands of rows; the execution planner decides whether they run
+        # inline, on threads or on the shared worker pool (reading and writing shared memory).
+        # The cost per pixel no longer depends on the radius, so one band per worker is enough
+        processed_array = self._map_bands(
+            process_chunk, padded_array, (height, width), np.uint8,
+            radius, (radius, operation), 2 * radius + 1, 'window'
+        )
 
         # Convert the processed array back to a PIL image
         processed_image = Image.fromarray(processed_array, mode='L')
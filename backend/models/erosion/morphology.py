@@ -0,0 +1,124 @@
+import math
+import numpy as np
+from PIL import Image
+from models.base_filter import BaseFilter
+from models.filters.grayscale_filter import GrayscaleFilter
+from models.erosion.min_max import running_extreme
+
+STRUCTURING_ELEMENTS = ('square', 'diamond', 'disk')
+MORPHOLOGY_OPERATIONS = ('erode', 'dilate', 'open', 'close', 'gradient', 'tophat', 'blackhat')
+
+
+def disk_half_widths(radius):
+    """
+    Half width of each row of a discrete disk of the given radius (rows -radius..radius).
+    """
+    return [math.isqrt(radius * radius - dy * dy) for dy in range(-radius, radius + 1)]
+
+
+def process_morph_block(args):
+    """
+    Erode ('min') or dilate ('max') a band with a flat structuring element.
+
+    :param args: Tuple containing the padded band (radius extra rows/columns on each side,
+                 optionally with a trailing channel axis), radius, shape and operation ('min' or 'max').
+    :return: The processed band, without the padding.
+    """
+    padded, radius, shape, operation = args
+    ufunc = np.maximum if operation == 'max' else np.minimum
+
+    if shape == 'square':
+        # Separable: running extreme along the rows, then along the columns
+        rows_result = running_extreme(padded, 2 * radius + 1, 1, operation)
+        return running_extreme(rows_result, 2 * radius + 1, 0, operation)
+
+    if shape == 'diamond':
+        # A diamond of radius r is r successive 3x3 crosses; each cross is the
+        # extreme of a horizontal and a vertical 3-element window
+        result = padded
+        for _ in range(radius):
+            horizontal = running_extreme(result[1:-1], 3, 1, operation)
+            vertical = running_extreme(result[:, 1:-1], 3, 0, operation)
+            result = ufunc(horizontal, vertical)
+        return result
+
+    # Disk: union of horizontal runs, one per row offset. Each run is a running
+    # extreme along the rows, computed once per distinct half width
+    height = padded.shape[0] - 2 * radius
+    width = padded.shape[1] - 2 * radius
+    runs = {}
+    result = None
+    for dy, half_width in zip(range(-radius, radius + 1), disk_half_widths(radius)):
+        if half_width not in runs:
+            runs[half_width] = running_extreme(padded, 2 * half_width + 1, 1, operation)
+        start = radius - half_width
+        row = runs[half_width][radius + dy:radius + dy + height, start:start + width]
+        result = row.copy() if result is None else ufunc(result, row, out=result)
+    return result
+
+
+class MorphologyFilter(BaseFilter):
+    def apply_filter(self, operation, radius, iterations=1, shape='square', color=False):
+        """
+        Applies a morphological operation in a single call, keeping the intermediate
+        results in memory.
+
+        :param operation: 'erode', 'dilate', 'open' (erode then dilate), 'close' (dilate then erode),
+                          'gradient' (dilate - erode), 'tophat' (image - open) or 'blackhat' (close - image).
+        :param radius: Radius of the structuring element (positive integer).
+        :param iterations: Number of erosions/dilations in each step (positive integer).
+        :param shape: Structuring element: 'square', 'diamond' or 'disk'.
+        :param color: If True, each RGB channel is processed independently; otherwise the grayscale image.
+        :return: Processed image (PIL Image).
+        """
+        if operation not in MORPHOLOGY_OPERATIONS:
+            raise ValueError(f"La operación debe ser una de: {', '.join(MORPHOLOGY_OPERATIONS)}.")
+        if radius <= 0:
+            raise ValueError("El radio debe ser un entero positivo.")
+        if iterations <= 0:
+            raise ValueError("El número de iteraciones debe ser un entero positivo.")
+        if shape not in STRUCTURING_ELEMENTS:
+            raise ValueError(f"La forma debe ser una de: {', '.join(STRUCTURING_ELEMENTS)}.")
+
+        self.radius = radius
+        self.shape = shape
+
+        if color:
+            image_array = np.array(self.image.convert('RGB'), dtype=np.uint8)
+        else:
+            image_array = np.array(GrayscaleFilter(self.image).apply_filter(output_mode='L'), dtype=np.uint8)
+
+        if operation == 'erode':
+            result = self._repeat(image_array, 'min', iterations)
+        elif operation == 'dilate':
+            result = self._repeat(image_array, 'max', iterations)
+        elif operation in ('open', 'tophat'):
+            result = self._repeat(self._repeat(image_array, 'min', iterations), 'max', iterations)
+            if operation == 'tophat':
+                # The opening never exceeds the image, so the difference fits in uint8
+                result = image_array - result
+        elif operation in ('close', 'blackhat'):
+            result = self._repeat(self._repeat(image_array, 'max', iterations), 'min', iterations)
+            if operation == 'blackhat':
+                result = result - image_array
+        else:
+            result = self._repeat(image_array, 'max', iterations) - self._repeat(image_array, 'min', iterations)
+
+        return Image.fromarray(result, mode='RGB' if color else 'L')
+
+    def _repeat(self, image_array, operation, iterations):
+        for _ in range(iterations):
+            image_array = self._apply_once(image_array, operation)
+        return image_array
+
+    def _apply_once(self, image_array, operation):
+        """
+        One erosion ('min') or dilation ('max') with edge padding, like MinMaxKernelFilter.
+        """
+        radius = self.radius
+        pad_width = ((radius, radius), (radius, radius)) + ((0, 0),) * (image_array.ndim - 2)
+        padded_array = np.pad(image_array, pad_width, mode='edge')
+        return self._map_bands(
+            process_morph_block, padded_array, image_array.shape, np.uint8,
+            radius, (radius, self.shape, operation), 2 * radius + 1, 'window'
+        )
@@ -1,14 +1,22 @@
 import numpy as np
 from PIL import Image
 from models.base_filter import BaseFilter
-from multiprocessing import Pool, cpu_count
+from functools import lru_cache
+from worker_pool import worker_pool
+from models.filters.point_ops import ChannelMix
 
 class GrayFilterWeighted(BaseFilter):
     def __init__(self, image, num_processes=None):
         super().__init__(image)
-        self.num_processes = num_processes or cpu_count()
+        self.num_processes = num_processes or worker_pool.size
+
+    def apply_filter(self, output_mode='RGB'):
+        """
+        :param output_mode: 'RGB' (predeterminado) o 'L' para una imagen de un solo canal.
+        """
+        if output_mode not in ('RGB', 'L'):
+            raise ValueError("El modo de salida debe ser 'RGB' o 'L'.")
 
-    def apply_filter(self):
         # Convertir la imagen a formato RGB si no lo está
         img = self.image.convert('RGB')
 
@@ -16,46 +24,45 @@ class GrayFilterWeighted(BaseFilter):
         image_array = np.array(img, dtype=np.uint8)
 
         # Definir los pesos para los canales RGB según la percepción humana
-        weights = np.array([0.299, 0.587, 0.114])
+        weights = (0.299, 0.587, 0.114)
 
-        # Dividir el arreglo en bloques para multiprocessing
-        blocks = self._split_into_blocks(image_array, self.num_processes)
-
-        # Crear un pool de procesos
-        with Pool(self.num_processes) as pool:
-            # Aplicar la conversión a escala de grises ponderado en paralelo
-            gray_blocks = pool.map(self._process_block, [(block, weights) for block in blocks])
-
-        # Combinar los bloques procesados
-        gray_array = np.vstack(gray_blocks)  # Forma: (altura_total, ancho, 3)
+        # Aplicar la conversión a escala de grises ponderado por franjas; el planificador
+        # decide si se ejecuta en línea, con hilos o en el pool de procesos
+        if output_mode == 'L':
+            gray_array = self._map_bands(
+                self._process_block_gray, image_array, image_array.shape[:2], np.uint8, extra=(weights,)
+            )  # Forma: (altura_total, ancho)
+        else:
+            gray_array = self._map_bands(
+                self._process_block, image_array, image_array.shape, np.uint8, extra=(weights,)
+            )  # Forma: (altura_total, ancho, 3)
 
         # Crear la imagen PIL directamente desde gray_array
-        gray_image_rgb = Image.fromarray(gray_array, mode='RGB')
+        return Image.fromarray(gray_array, mode=output_mode)
 
-        return gray_image_rgb
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _channel_mix(weights):
+        """
+        Tablas de búsqueda para los pesos dados; se construyen una vez por proceso.
+        """
+        return ChannelMix(weights)
 
-    def _split_into_blocks(self, array, num_blocks):
+    @staticmethod
+    def _process_block_gray(args):
         """
-        Divide el arreglo en bloques a lo largo del eje vertical.
+        Convierte un bloque de la imagen a un solo canal de gris ponderado.
         """
-        height = array.shape[0]
-        block_size = height // num_blocks
-        blocks = []
-        for i in range(num_blocks):
-            start = i * block_size
-            # Asegurarse de que el último bloque incluya cualquier fila restante
-            end = (i + 1) * block_size if i != num_blocks - 1 else height
-            blocks.append(array[start:end, :, :])
-        return blocks
+        block, weights = args
+        return GrayFilterWeighted._channel_mix(weights).apply(block[..., :3])  # Forma: (bloque_altura, ancho)
 
     @staticmethod
     def _process_block(args):
         """
         Convierte un bloque de la imagen a escala de grises ponderado usando los pesos especificados.
         """
-        block, weights = args
-        # Calcular el promedio ponderado de los canales R, G y B
-        gray = np.dot(block[..., :3], weights).astype(np.uint8)  # Forma: (bloque_altura, ancho)
+        # Calcular el promedio ponderado de los canales R, G y B con aritmética entera exacta
+        gray = GrayFilterWeighted._process_block_gray(args)  # Forma: (bloque_altura, ancho)
         # Expandir las dimensiones para tener tres canales
         gray = np.expand_dims(gray, axis=2)                   # Forma: (bloque_altura, ancho, 1)
         # Replicar el arreglo en los tres canales
@@ -1,57 +1,56 @@
 import numpy as np
 from PIL import Image
 from models.base_filter import BaseFilter
-from multiprocessing import Pool, cpu_count
+from worker_pool import worker_pool
+from models.filters.point_ops import ChannelMix
 
 class GrayscaleFilter(BaseFilter):
+    # Promedio de los canales con aritmética entera (tablas de búsqueda)
+    GRAY_MIX = ChannelMix.mean()
+
     def __init__(self, image, num_processes=None):
         super().__init__(image)
-        self.num_processes = num_processes or cpu_count()
+        self.num_processes = num_processes or worker_pool.size
     
-    def apply_filter(self):
+    def apply_filter(self, output_mode='RGB'):
+        """
+        :param output_mode: 'RGB' (predeterminado) replica el gris en los tres canales;
+                            'L' devuelve una imagen de un solo canal, para los filtros que
+                            encadenan la escala de grises y solo necesitan un plano.
+        """
+        if output_mode not in ('RGB', 'L'):
+            raise ValueError("El modo de salida debe ser 'RGB' o 'L'.")
+
         # Convertir la imagen a formato RGB si no lo está
         img = self.image.convert('RGB')
         
         # Convertir la imagen a un arreglo NumPy
         image_array = np.array(img, dtype=np.uint8)
         
-        # Dividir el arreglo en bloques para multiprocessing
-        blocks = self._split_into_blocks(image_array, self.num_processes)
-        
-        # Crear un pool de procesos
-        with Pool(self.num_processes) as pool:
-            # Aplicar la conversión a escala de grises en paralelo
-            gray_blocks = pool.map(self._process_block, blocks)
-        
-        # Combinar los bloques procesados
-        gray_array = np.vstack(gray_blocks) 
+        # Aplicar la conversión a escala de grises por franjas; el planificador decide
+        # si se ejecuta en línea, con hilos o en el pool de procesos
+        if output_mode == 'L':
+            gray_array = self._map_bands(self._process_block_gray, image_array, image_array.shape[:2], np.uint8)
+        else:
+            gray_array = self._map_bands(self._process_block, image_array, image_array.shape, np.uint8)
         
         # Usar directamente gray_array para crear la imagen PIL
-        gray_image_rgb = Image.fromarray(gray_array, mode='RGB')
-        
-        return gray_image_rgb
-    
-    def _split_into_blocks(self, array, num_blocks):
+        return Image.fromarray(gray_array, mode=output_mode)
+
+    @staticmethod
+    def _process_block_gray(block):
         """
-        Divide el arreglo en bloques a lo largo del eje vertical.
+        Convierte un bloque de la imagen a un solo canal de gris usando el promedio simple.
         """
-        height = array.shape[0]
-        block_size = height // num_blocks
-        blocks = []
-        for i in range(num_blocks):
-            start = i * block_size
-            # Asegurarse de que el último bloque incluya cualquier fila restante
-            end = (i + 1) * block_size if i != num_blocks - 1 else height
-            blocks.append(array[start:end, :, :])
-        return blocks
+        return GrayscaleFilter.GRAY_MIX.apply(block)  # Forma: (bloque_altura, ancho)
     
     @staticmethod
     def _process_block(block):
         """
         Convierte un bloque de la imagen a escala de grises usando el promedio simple.
         """
-        # Calcular el promedio de los canales R, G y B
-        gray = block.mean(axis=2).astype(np.uint8)  # Forma: (bloque_altura, ancho)
+        # Calcular el promedio de los canales R, G y B en una sola pasada entera
+        gray = GrayscaleFilter._process_block_gray(block)  # Forma: (bloque_altura, ancho)
         # Expandir las dimensiones para tener tres canales
         gray = np.expand_dims(gray, axis=2)        # Forma: (bloque_altura, ancho, 1)
         # Replicar el arreglo en los tres canales
@@ -0,0 +1,155 @@
+import math
+import numpy as np
+from fractions import Fraction
+from functools import reduce
+
+
+class PointOp:
+    def __init__(self, table):
+        """
+        Operación punto a punto sobre imágenes de 8 bits representada como tabla de búsqueda (LUT).
+
+        :param table: Arreglo uint8 de forma (256,) para aplicar la misma tabla a todos los canales,
+                      o (canales, 256) para una tabla por canal.
+        """
+        table = np.asarray(table)
+        if table.shape[-1] != 256 or table.ndim not in (1, 2):
+            raise ValueError("La tabla debe tener forma (256,) o (canales, 256).")
+        self.table = np.clip(table, 0, 255).astype(np.uint8)
+
+    @classmethod
+    def identity(cls):
+        return cls(np.arange(256))
+
+    @classmethod
+    def from_function(cls, func):
+        """
+        Construye la tabla evaluando func una sola vez sobre los 256 niveles.
+        El resultado se recorta a [0, 255] y se trunca a entero.
+
+        :param func: Función vectorizada que recibe un arreglo con los valores 0..255.
+        """
+        return cls(np.clip(func(np.arange(256, dtype=np.float64)), 0, 255).astype(np.uint8))
+
+    @classmethod
+    def bitwise_and(cls, values):
+        """
+        AND lógico de cada canal con el valor correspondiente de `values`.
+        """
+        levels = np.arange(256)
+        return cls(np.stack([levels & value for value in values]))
+
+    @classmethod
+    def threshold(cls, threshold, low=0, high=255):
+        """
+        Binarización: `low` si el valor es menor que el umbral, `high` en otro caso.
+        """
+        return cls(np.where(np.arange(256) < threshold, low, high))
+
+    @classmethod
+    def chain(cls, *ops):
+        """
+        Compone varias operaciones (aplicadas en el orden dado) en una sola tabla.
+        """
+        return reduce(lambda first, second: first.then(second), ops)
+
+    def then(self, other):
+        """
+        Devuelve la operación equivalente a aplicar self y después other, en una sola tabla.
+        """
+        if self.table.ndim == 2 and other.table.ndim == 2:
+            # Tablas por canal: componer cada canal con su tabla correspondiente
+            table = np.take_along_axis(other.table, self.table.astype(np.intp), axis=1)
+        else:
+            table = other.table[self.table] if other.table.ndim == 1 else other.table[:, self.table]
+        return PointOp(table)
+
+    def apply(self, array):
+        """
+        Aplica la tabla en una sola pasada de indexación, sin intermedios de punto flotante.
+
+        :param array: Arreglo uint8 de forma (alto, ancho) o (alto, ancho, canales).
+        :return: Arreglo uint8 de la misma forma.
+        """
+        if self.table.ndim == 1:
+            return self.table[array]
+        if array.ndim != 3 or array.shape[2] != self.table.shape[0]:
+            raise ValueError("El número de canales no coincide con el de la tabla.")
+        channels = np.arange(self.table.shape[0])
+        return self.table[channels, array]
+
+
+class ChannelMix:
+    def __init__(self, weights, then=None, max_denominator=10000):
+        """
+        Combina los canales de una imagen de 8 bits en un solo canal con pesos racionales:
+        gray = floor(sum(peso_c * canal_c)). Se calcula con aritmética entera exacta:
+        cada canal se multiplica por un numerador entero mediante una LUT y la suma
+        indexa una tabla final que hace la división (y, opcionalmente, una PointOp posterior).
+
+        :param weights: Pesos de cada canal.
+        :param then: PointOp de un canal que se compone con la tabla final.
+        :param max_denominator: Denominador máximo para aproximar los pesos como fracciones.
+        """
+        fractions = [Fraction(w).limit_denominator(max_denominator) for w in weights]
+        denominator = math.lcm(*[f.denominator for f in fractions])
+        numerators = [int(f * denominator) for f in fractions]
+
+        # LUT por canal con la contribución entera de cada nivel
+        levels = np.arange(256, dtype=np.uint32)
+        self.channel_tables = np.stack([levels * n for n in numerators])
+
+        # Tabla final: suma entera -> nivel de gris
+        sums = np.arange(255 * sum(numerators) + 1)
+        self.table = np.clip(sums // denominator, 0, 255).astype(np.uint8)
+        if then is not None:
+            self.table = then.table[self.table]
+
+    @classmethod
+    def mean(cls, channels=3, then=None):
+        """
+        Promedio simple de los canales.
+        """
+        return cls([Fraction(1, channels)] * channels, then)
+
+    def apply(self, array):
+        """
+        :param array: Arreglo uint8 de forma (alto, ancho, canales).
+        :return: Arreglo uint8 de forma (alto, ancho).
+        """
+        total = self.channel_tables[0][array[..., 0]]
+        for channel in range(1, self.channel_tables.shape[0]):
+            total += self.channel_tables[channel][array[..., channel]]
+        return self.table[total]
+
+
+class TiledPointOp:
+    def __init__(self, tables):
+        """
+        Operación punto a punto que depende de la posición del píxel: la tabla usada se elige
+        según (y mod filas, x mod columnas). Sirve, por ejemplo, para el dithering ordenado,
+        donde cada posición de la matriz tiene su propio umbral.
+
+        :param tables: Arreglo uint8 de forma (filas, columnas, 256).
+        """
+        self.tables = np.asarray(tables, dtype=np.uint8)
+
+    @classmethod
+    def ordered_threshold(cls, threshold_matrix, low=0, high=255):
+        """
+        Dithering ordenado: en cada posición, `low` si el valor es menor que el umbral, `high` si no.
+        """
+        threshold_matrix = np.asarray(threshold_matrix, dtype=np.float64)
+        levels = np.arange(256)
+        return cls(np.where(levels < threshold_matrix[..., np.newaxis], low, high))
+
+    def apply(self, array):
+        """
+        :param array: Arreglo uint8 de forma (alto, ancho).
+        :return: Arreglo uint8 de forma (alto, ancho).
+        """
+        rows, cols, _ = self.tables.shape
+        height, width = array.shape
+        y = (np.arange(height) % rows)[:, np.newaxis]
+        x = (np.arange(width) % cols)[np.newaxis, :]
+        return self.tables[y, x, array]
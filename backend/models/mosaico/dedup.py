@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+
+from utils.jit import njit
+
+# Distancia de Hamming máxima (en bits, de 64) entre dos imágenes casi idénticas
+DEDUP_THRESHOLD = 4
+HASH_SIZE = 8
+# El dHash solo describe los cambios de luminosidad: además, dos duplicados deben tener
+# descriptores de color (ver descriptors.DESCRIPTOR_GRIDS) a distancia <= DEDUP_COLOR_DISTANCE (ΔE)
+DEDUP_DESCRIPTOR = 'grid2'
+DEDUP_COLOR_DISTANCE = 6.0
+# Representantes que se comparan, como máximo, por cada grupo de hashes con la misma banda.
+# Las imágenes de poco detalle comparten bandas; el límite acota el tiempo de la búsqueda
+# a costa de, en ese caso, dejar de detectar algunos duplicados
+MAX_BUCKET_LEADERS = 256
+
+
+def dhash(image: np.ndarray) -> int:
+    """
+    Hash perceptual por diferencias (dHash) de 64 bits: la imagen en escala de grises se
+    reduce a 9x8 y cada bit indica si un píxel es más claro que su vecino derecho.
+    Imágenes casi idénticas (recomprimidas, reescaladas, con pequeños retoques) tienen
+    hashes a muy poca distancia de Hamming.
+
+    :param image: Imagen BGR (uint8).
+    :return: Hash como entero sin signo de 64 bits.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).reshape(-1)
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+@njit(cache=True)
+def _popcount(x):
+    """
+    Número de bits encendidos de un uint64 (suma por bloques de bits, sin multiplicaciones).
+    """
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    x = x + (x >> np.uint64(8))
+    x = x + (x >> np.uint64(16))
+    x = x + (x >> np.uint64(32))
+    return int(x & np.uint64(0x7F))
+
+
+@njit(cache=True)
+def _leader_groups(hashes, buckets, num_buckets, descriptors, threshold, max_distance_sq, max_leaders):
+    """
+    Asigna cada fila, en orden, a la representante de menor fila que comparte con ella el grupo
+    de alguna banda y está a distancia de Hamming <= threshold y de color <= la máxima; si no
+    hay ninguna, la fila se vuelve representante y se agrega a los grupos de sus bandas.
+
+    :param buckets: Arreglo int64 (filas, bandas) con el grupo de cada fila en cada banda.
+    :return: Arreglo int64 con la representante de cada fila.
+    """
+    num_rows, num_bands = buckets.shape
+    dims = descriptors.shape[1]
+    # Listas enlazadas de representantes por grupo, en orden de fila
+    head = np.full(num_buckets, -1, dtype=np.int64)
+    tail = np.full(num_buckets, -1, dtype=np.int64)
+    count = np.zeros(num_buckets, dtype=np.int64)
+    following = np.full((num_rows, num_bands), -1, dtype=np.int64)
+    representatives = np.empty(num_rows, dtype=np.int64)
+
+    for row in range(num_rows):
+        best = row
+        for band in range(num_bands):
+            leader = head[buckets[row, band]]
+            # Las representantes están en orden de fila: solo interesan las menores que best
+            while leader != -1 and leader < best:
+                if _popcount(hashes[row] ^ hashes[leader]) <= threshold:
+                    distance_sq = 0.0
+                    for d in range(dims):
+                        diff = descriptors[row, d] - descriptors[leader, d]
+                        distance_sq += diff * diff
+                    if distance_sq <= max_distance_sq:
+                        best = leader
+                        break
+                leader = following[leader, band]
+        representatives[row] = best
+        if best != row:
+            continue
+        for band in range(num_bands):
+            bucket = buckets[row, band]
+            if count[bucket] >= max_leaders:
+                continue
+            if tail[bucket] == -1:
+                head[bucket] = row
+            else:
+                following[tail[bucket], band] = row
+            tail[bucket] = row
+            count[bucket] += 1
+    return representatives
+
+
+def find_duplicates(hashes: np.ndarray, descriptors: np.ndarray, threshold: int = DEDUP_THRESHOLD,
+                    color_distance: float = DEDUP_COLOR_DISTANCE) -> np.ndarray:
+    """
+    Agrupa las imágenes casi idénticas: hashes a distancia de Hamming <= threshold y
+    descriptores de color a distancia euclidiana <= color_distance. Las filas se recorren en
+    orden y cada una se une a la primera representante (la de menor fila) que cumple ambas
+    condiciones con ella, o se vuelve representante. Como todo el grupo está cerca de su
+    representante, las cadenas de imágenes parecidas no unen imágenes muy distintas.
+
+    Las representantes candidatas se buscan por bandas: los 64 bits se dividen en
+    threshold + 1 bandas y, por el principio del casillero, dos hashes a distancia <= threshold
+    coinciden en al menos una banda completa; solo se comparan los hashes que comparten alguna
+    banda (hasta MAX_BUCKET_LEADERS representantes por grupo).
+
+    :param hashes: Arreglo uint64 con el hash de cada fila.
+    :param descriptors: Arreglo float32 (filas, d) con el descriptor de color de cada fila.
+    :param threshold: Distancia máxima; con un valor negativo no se agrupa nada.
+    :param color_distance: Distancia máxima entre descriptores de color.
+    :return: Arreglo int64 con la fila representante de cada fila (ella misma si es única).
+    """
+    num_rows = len(hashes)
+    if threshold < 0 or num_rows < 2:
+        return np.arange(num_rows, dtype=np.int64)
+
+    hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+    descriptors = np.ascontiguousarray(descriptors, dtype=np.float32).reshape(num_rows, -1)
+    bands = np.array_split(np.arange(64), min(threshold + 1, 64))
+    buckets = np.empty((num_rows, len(bands)), dtype=np.int64)
+    num_buckets = 0
+    for b, band in enumerate(bands):
+        mask = np.uint64((1 << len(band)) - 1)
+        keys = (hashes >> np.uint64(band[0])) & mask
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        buckets[:, b] = inverse.reshape(-1) + num_buckets
+        num_buckets += len(unique_keys)
+
+    return _leader_groups(hashes, buckets, num_buckets, descriptors, threshold,
+                          float(color_distance) ** 2, MAX_BUCKET_LEADERS)
@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+from typing import Dict
+
+from utils.jit import njit
+
+# Descriptores guardados en el índice: nombre -> celdas por lado de la cuadrícula en CIELAB
+DESCRIPTOR_GRIDS: Dict[str, int] = {'lab': 1, 'grid2': 2, 'grid3': 3}
+# Modos de comparación del mosaico: color promedio BGR (el original) o un descriptor
+MATCH_MODES = ('bgr',) + tuple(DESCRIPTOR_GRIDS)
+
+
+def bgr_to_lab(colors: np.ndarray) -> np.ndarray:
+    """
+    Convierte colores BGR (0-255, cualquier forma (..., 3)) a CIELAB (L en 0-100, a y b en ±127).
+    """
+    colors = np.asarray(colors, dtype=np.float32)
+    lab = cv2.cvtColor((colors / 255.0).reshape(-1, 1, 3), cv2.COLOR_BGR2Lab)
+    return lab.reshape(colors.shape)
+
+
+def region_descriptors(region: np.ndarray, name: str) -> np.ndarray:
+    """
+    Descriptor de cada bloque de una región de bloques del mismo tamaño.
+
+    El bloque se divide en una cuadrícula de grid x grid celdas (las celdas de los extremos
+    absorben el residuo); el descriptor es el color promedio de cada celda en CIELAB,
+    dividido entre grid para que la distancia entre descriptores quede en la escala de ΔE
+    sin importar el número de celdas.
+
+    :param region: Arreglo uint8 BGR (filas, alto, columnas, ancho, 3).
+    :param name: Nombre del descriptor (ver DESCRIPTOR_GRIDS).
+    :return: Arreglo float32 (filas, columnas, grid * grid * 3).
+    """
+    grid = DESCRIPTOR_GRIDS[name]
+    rows, height, cols, width, channels = region.shape
+
+    # Inicio de cada celda; si el bloque es más pequeño que la cuadrícula, las celdas
+    # vacías repiten el píxel del inicio (reduceat devuelve ese elemento con conteo 1)
+    y_starts = (np.arange(grid) * height) // grid
+    x_starts = (np.arange(grid) * width) // grid
+    y_counts = np.maximum(np.diff(np.append(y_starts, height)), 1)
+    x_counts = np.maximum(np.diff(np.append(x_starts, width)), 1)
+
+    sums = np.add.reduceat(region, y_starts, axis=1, dtype=np.int64)
+    sums = np.add.reduceat(sums, x_starts, axis=3, dtype=np.int64)
+    means = sums / (y_counts.reshape(1, grid, 1, 1, 1) * x_counts.reshape(1, 1, 1, grid, 1))
+
+    cells = bgr_to_lab(means.transpose(0, 2, 1, 3, 4))  # (filas, columnas, grid, grid, 3)
+    return (cells.reshape(rows, cols, grid * grid * channels) / grid).astype(np.float32)
+
+
+def image_descriptors(image: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Todos los descriptores de una imagen de la biblioteca (BGR), tratada como un solo bloque.
+
+    :return: Diccionario nombre del descriptor -> vector float32.
+    """
+    region = image[np.newaxis, :, np.newaxis]
+    return {name: region_descriptors(region, name)[0, 0] for name in DESCRIPTOR_GRIDS}
+
+
+@njit(cache=True)
+def assign_tiles(candidates, distances, num_tiles, repetition_penalty, radius, previous):
+    """
+    Elige un tile por bloque entre sus k candidatos más cercanos, en orden de recorrido.
+    Cada candidato cuesta su distancia más repetition_penalty por cada vez que ya aparece
+    en los bloques vecinos asignados (las filas anteriores dentro de `radius` bloques y
+    los bloques a la izquierda en la misma fila).
+
+    :param candidates: Arreglo (filas, columnas, k) con las filas del índice de los candidatos,
+                       ordenados por distancia; num_tiles marca un candidato inexistente.
+    :param distances: Arreglo (filas, columnas, k) con la distancia a cada candidato.
+    :param previous: Arreglo int64 (filas, columnas) con los tiles ya elegidos en las filas
+                     inmediatamente anteriores (puede tener 0 filas). Permite asignar la
+                     cuadrícula por bandas con el mismo resultado que de una sola vez.
+    :return: Arreglo int64 (filas, columnas) con el tile elegido para cada bloque.
+    """
+    rows, cols, k = candidates.shape
+    offset = previous.shape[0]
+    chosen = np.empty((offset + rows, cols), dtype=np.int64)
+    chosen[:offset] = previous
+    for r in range(offset, offset + rows):
+        for c in range(cols):
+            best = candidates[r - offset, c, 0]
+            best_cost = np.inf
+            for j in range(k):
+                candidate = candidates[r - offset, c, j]
+                if candidate >= num_tiles:
+                    break
+                repeats = 0
+                for rr in range(max(0, r - radius), r + 1):
+                    c_end = min(cols, c + radius + 1) if rr < r else c
+                    for cc in range(max(0, c - radius), c_end):
+                        if chosen[rr, cc] == candidate:
+                            repeats += 1
+                cost = distances[r - offset, c, j] + repetition_penalty * repeats
+                if cost < best_cost:
+                    best_cost = cost
+                    best = candidate
+            chosen[r, c] = best
+    return chosen[offset:]
@@ -0,0 +1,426 @@
+import io
+import os
+import cv2
+import time
+import hashlib
+import contextlib
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+from typing import Optional, Dict, Tuple, List, Callable
+
+from worker_pool import worker_pool
+from models.mosaico.tile_index import TileIndex, load_tile_index
+from models.mosaico.tile_atlas import ATLAS_SIZES, atlas_array_name, scale_tiles
+from models.mosaico.descriptors import DESCRIPTOR_GRIDS, image_descriptors
+from models.mosaico.dedup import DEDUP_THRESHOLD, DEDUP_COLOR_DISTANCE, DEDUP_DESCRIPTOR, dhash, find_duplicates
+from models.mosaico.quarantine import QuarantineManifest
+from models.mosaico.row_store import RowStore
+
+# Lado mínimo (en píxeles) al que se decodifican las imágenes durante la indexación: el doble
+# del mayor tile del atlas, suficiente para los tiles, los descriptores y el hash perceptual
+DECODE_SIZE = 2 * max(ATLAS_SIZES)
+
+
+def _decode_image(data: bytes, draft_size: Optional[int] = None) -> np.ndarray:
+    """
+    Decodifica los bytes de una imagen a BGR (ver decode_library_image). Lanza una excepción
+    si la imagen está corrupta o en un formato desconocido.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img_pil:
+            if draft_size is not None:
+                img_pil.draft('RGB', (draft_size, draft_size))
+            # Aplicar la orientación EXIF, igual que cv2.imread
+            img_pil = ImageOps.exif_transpose(img_pil)
+            rgb = np.asarray(img_pil.convert('RGB'))
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    except UnidentifiedImageError:
+        # Formato que PIL no reconoce: intentar con OpenCV desde los mismos bytes
+        with open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stderr(devnull):
+                img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise
+        return img
+
+
+def decode_library_image(data: bytes, draft_size: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    Decodifica una imagen de la biblioteca desde sus bytes a BGR. Decodificar todos los
+    píxeles sirve también como verificación de integridad: un archivo truncado o corrupto falla.
+
+    :param data: Contenido del archivo.
+    :param draft_size: Si se indica, los JPEG se decodifican reducidos en el dominio DCT
+                       (1/2, 1/4 u 1/8) al menor tamaño que siga cubriendo draft_size x draft_size,
+                       sin pasar por la resolución completa. Otros formatos se decodifican completos.
+    :return: Arreglo uint8 (alto, ancho, 3), o None si la imagen está corrupta o no se puede leer.
+    """
+    try:
+        return _decode_image(data, draft_size)
+    except (IOError, SyntaxError, ValueError) as e:
+        return None
+    except Exception as e:
+        print(f"Error al decodificar la imagen: {e}")
+        return None
+
+
+def load_library_image(image_path: str) -> Optional[np.ndarray]:
+    """
+    Carga una imagen de la biblioteca en BGR a resolución completa, verificando su integridad.
+
+    :param image_path: Ruta completa a la imagen.
+    :return: Arreglo uint8 (alto, ancho, 3), o None si la imagen está corrupta o no se puede leer.
+    """
+    try:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    return decode_library_image(data)
+
+
+def average_color(img: np.ndarray) -> Dict[str, int]:
+    """
+    Color promedio de una imagen BGR, truncado a enteros.
+    """
+    avg_color = np.mean(img, axis=(0, 1)).astype(int)  # Promedio en 3 canales (B, G, R)
+    return {
+        'B': int(avg_color[0]),  # OpenCV usa BGR
+        'G': int(avg_color[1]),
+        'R': int(avg_color[2])
+    }
+
+
+def calculate_average_color(image_path: str) -> Optional[Dict[str, int]]:
+    """
+    Calcula el color promedio de una imagen después de verificar su integridad con PIL.
+
+    :param image_path: Ruta completa a la imagen.
+    :return: Diccionario con la ruta de la imagen y sus valores promedio de B, G, R.
+             Retorna None si hay un error al procesar la imagen.
+    """
+    img = load_library_image(image_path)
+    if img is None:
+        return None
+    return {'image_path': image_path, **average_color(img)}
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Hash del contenido de un archivo (BLAKE2b de 128 bits, en hexadecimal).
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_hash(image_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash del contenido del archivo, leyéndolo por partes (ver content_hash).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def index_image_file(image_path: str) -> Tuple[str, Optional[str], Optional[Dict], Optional[str]]:
+    """
+    Tarea del pool: hash del contenido, color promedio, tiles del atlas, descriptores de
+    color y hash perceptual de una imagen nueva o modificada. El archivo se lee una sola
+    vez y se decodifica una sola vez, reducido a DECODE_SIZE (ver decode_library_image).
+
+    :return: Tupla (ruta, hash o None si no se pudo leer, datos o None si la imagen está corrupta,
+             motivo del fallo o None). Los datos contienen B, G, R, 'tiles' (ver scale_tiles),
+             'descriptors' (ver image_descriptors) y 'dhash'.
+    """
+    try:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return image_path, None, None, f"No se pudo leer el archivo: {e}"
+    try:
+        img = _decode_image(data, DECODE_SIZE)
+    except Exception as e:
+        return image_path, content_hash(data), None, f"{type(e).__name__}: {e}"
+    return image_path, content_hash(data), {**average_color(img), 'tiles': scale_tiles(img),
+                                      'descriptors': image_descriptors(img), 'dhash': dhash(img)}, None
+
+
+class LibraryIndexer:
+    # Extensiones de archivos de imagen soportadas
+    VALID_EXTENSIONS: Tuple[str, ...] = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff')
+    # Arreglos por imagen que guarda el índice (además de colores y rutas) en el almacén compartido
+    # entre versiones (ver RowStore): tipo y forma de cada fila
+    ROW_ARRAYS: Dict[str, Tuple[object, Tuple[int, ...]]] = {
+        'mtimes': (np.int64, ()),
+        'sizes': (np.int64, ()),
+        'hashes': ('<U32', ()),
+        **{atlas_array_name(size): (np.uint8, (size, size, 3)) for size in ATLAS_SIZES},
+        **{name: (np.float32, (grid * grid * 3,)) for name, grid in DESCRIPTOR_GRIDS.items()},
+        'dhashes': (np.uint64, ()),
+    }
+    # Imágenes por tarea del pool; el progreso se reporta al terminar cada una
+    CHUNK_SIZE = 8
+    # Filas por escritura al agregar o copiar filas del almacén
+    APPEND_BATCH = 1024
+    # Fracción de filas sin referenciar a partir de la cual el almacén se compacta
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, library_dir: str, index_dir: str, dedup_threshold: int = DEDUP_THRESHOLD,
+                 dedup_color_distance: float = DEDUP_COLOR_DISTANCE) -> None:
+        """
+        Mantiene el índice de la biblioteca al día de forma incremental. Para cada archivo se
+        guarda en el índice su fecha de modificación, tamaño y hash de contenido; en cada
+        actualización solo se procesan los archivos nuevos o modificados, se conservan las
+        filas de los que no cambiaron y se eliminan las de los archivos borrados.
+
+        Las imágenes casi idénticas (según su dHash y su descriptor de color) se agrupan y solo la representante de
+        cada grupo entra en los KD-Trees (ver find_duplicates y TileIndex.tree_rows).
+
+        Las imágenes que no se pueden procesar quedan en cuarentena (ver QuarantineManifest):
+        se omiten sin volver a decodificarlas hasta que el archivo cambie.
+
+        :param library_dir: Ruta absoluta a la biblioteca de imágenes.
+        :param index_dir: Ruta absoluta a la carpeta del índice.
+        :param dedup_threshold: Distancia de Hamming máxima entre duplicados (negativa para no agrupar).
+        :param dedup_color_distance: Distancia máxima (ΔE) entre los descriptores de color de duplicados.
+        """
+        self.library_dir = library_dir
+        self.index_dir = index_dir
+        self.dedup_threshold = dedup_threshold
+        self.dedup_color_distance = dedup_color_distance
+        self.stats: Dict[str, int] = {}
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Recorre la biblioteca (incluyendo subcarpetas).
+
+        :return: Diccionario ruta -> (mtime en nanosegundos, tamaño en bytes).
+        """
+        files: Dict[str, Tuple[int, int]] = {}
+        for root, dirs, names in os.walk(self.library_dir):
+            for name in names:
+                if name.lower().endswith(self.VALID_EXTENSIONS):
+                    image_path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(image_path)
+                    except OSError:
+                        continue
+                    files[image_path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def update(self, full: bool = False,
+               progress: Optional[Callable[[int, int, int], None]] = None) -> Optional[TileIndex]:
+        """
+        Actualiza el índice con los cambios de la biblioteca y publica una versión nueva
+        si hubo cambios.
+
+        Las filas de los archivos sin cambios se reutilizan tal cual en el almacén compartido;
+        solo se agregan las de los archivos nuevos o modificados, y las de los archivos
+        eliminados o modificados dejan de referenciarse. Cuando la mayor parte del almacén
+        ya no se usa, las filas vigentes se copian a una generación nueva (compactación).
+
+        :param full: Si es True, ignora el índice anterior y la cuarentena y procesa todos los archivos.
+        :param progress: Función opcional progress(procesadas, total, corruptas), llamada
+                         a medida que el pool termina las imágenes por procesar.
+        :return: Índice vigente.
+        """
+        start_time = time.perf_counter()
+
+        previous: Optional[TileIndex] = None if full else load_tile_index(self.index_dir)
+        previous_rows: Dict[str, int] = {}
+        # Un índice sin alguno de los arreglos (de una versión anterior) se reconstruye completo
+        if previous is not None and all(name in previous.arrays for name in self.ROW_ARRAYS):
+            previous_rows = {path: row for row, path in enumerate(previous.paths.tolist())}
+
+        quarantine = QuarantineManifest(self.index_dir)
+        if full:
+            quarantine.clear()
+
+        files = self.scan()
+        print(f"Total de imágenes en la biblioteca: {len(files)}")
+        quarantine.prune(files)
+
+        # Clasificar cada archivo: sin cambios (se conserva su fila), con otra fecha pero el mismo
+        # contenido (se conservan sus datos con la fecha nueva), en cuarentena sin cambios
+        # (se omite) o por procesar
+        kept: Dict[str, int] = {}
+        touched: Dict[str, int] = {}
+        quarantined: List[str] = []
+        to_process: List[str] = []
+        for image_path, (mtime, size) in files.items():
+            if self._still_quarantined(quarantine, image_path, mtime, size):
+                quarantined.append(image_path)
+                continue
+            row = previous_rows.get(image_path)
+            if row is not None and int(previous.arrays['sizes'][row]) == size:
+                if int(previous.arrays['mtimes'][row]) == mtime:
+                    kept[image_path] = row
+                    continue
+                # Misma longitud pero otra fecha: comparar el contenido antes de volver a decodificar
+                with contextlib.suppress(OSError):
+                    if file_hash(image_path) == str(previous.arrays['hashes'][row]):
+                        touched[image_path] = row
+                        continue
+            to_process.append(image_path)
+
+        removed = len(set(previous_rows) - set(files))
+        print(f"Sin cambios: {len(kept) + len(touched)}, por procesar: {len(to_process)}, eliminadas: {removed}, "
+              f"en cuarentena: {len(quarantined)}")
+        if progress is not None:
+            progress(0, len(to_process), 0)
+
+        previous_dedup = previous.meta.get('dedup', {}) if previous is not None else {}
+        if (previous is not None and not to_process and not touched and removed == 0
+                and len(kept) == len(previous) and previous_dedup.get('threshold') == self.dedup_threshold
+                and previous_dedup.get('color_distance') == self.dedup_color_distance):
+            quarantine.save()
+            self.stats = {'total': len(files), 'unchanged': len(kept), 'processed': 0,
+                          'removed': 0, 'corrupted': 0, 'quarantined': len(quarantine),
+                          'duplicates': previous_dedup.get('duplicates', 0)}
+            print("El índice de la biblioteca está al día.")
+            return previous
+
+        # Filas físicas en el almacén de cada imagen del índice nuevo
+        store = self._open_store(previous if previous_rows else None, len(kept))
+        physical: Dict[str, int] = {}
+        kept_rows = np.array(list(kept.values()), dtype=np.int64)
+        if previous is not None and previous.store is not None and previous.store.generation == store.generation:
+            kept_physical = np.asarray(previous.store_rows)[kept_rows]
+        else:
+            kept_physical = self._copy_rows(store, previous, kept_rows)
+        physical.update(zip(kept, kept_physical.tolist()))
+        touched_rows = np.array(list(touched.values()), dtype=np.int64)
+        touched_mtimes = np.array([files[path][0] for path in touched], dtype=np.int64)
+        physical.update(zip(touched, self._copy_rows(store, previous, touched_rows, touched_mtimes).tolist()))
+
+        # Procesar los archivos nuevos o modificados en el pool compartido; sus filas se agregan
+        # al almacén por lotes a medida que llegan
+        print(f"Usando {worker_pool.size} procesos para el preprocesamiento.")
+        new_colors: Dict[str, List[int]] = {}
+        pending: List[Tuple[str, Dict]] = []
+        corrupted_images: List[str] = []
+        results = worker_pool.imap(index_image_file, to_process, self.CHUNK_SIZE) if to_process else []
+        for processed, (image_path, file_content_hash, data, error) in enumerate(results, start=1):
+            mtime, size = files[image_path]
+            if data is None:
+                corrupted_images.append(image_path)
+                quarantine.add(image_path, file_content_hash, mtime, size, error)
+            else:
+                quarantine.discard(image_path)
+                entry = {'mtimes': mtime, 'sizes': size, 'hashes': file_content_hash,
+                         **data['tiles'], **data['descriptors'], 'dhashes': data['dhash']}
+                new_colors[image_path] = [data['B'], data['G'], data['R']]
+                pending.append((image_path, entry))
+                if len(pending) >= self.APPEND_BATCH:
+                    self._append_entries(store, pending, physical)
+            if progress is not None:
+                progress(processed, len(to_process), len(corrupted_images))
+        self._append_entries(store, pending, physical)
+
+        quarantine.save()
+        if corrupted_images:
+            print(f"Se encontraron {len(corrupted_images)} imágenes corruptas (registradas en {quarantine.path}):")
+            for img in corrupted_images:
+                print(f" - {img}: {quarantine.get(img)['error']}")
+        else:
+            print("No se encontraron imágenes corruptas.")
+
+        # Construir el índice (colores float32, tabla de rutas, filas del almacén, KD-Tree y
+        # grupos de duplicados). Se conserva el orden del recorrido de la biblioteca
+        image_paths = [path for path in files if path in physical]
+        store_rows = np.array([physical[path] for path in image_paths], dtype=np.int64)
+        source_rows = np.array([kept.get(path, touched.get(path, -1)) for path in image_paths], dtype=np.int64)
+        from_previous = source_rows >= 0
+        new_paths = [path for path in image_paths if path in new_colors]
+
+        colors = np.empty((len(image_paths), 3), dtype=np.float32)
+        if from_previous.any():
+            colors[from_previous] = previous.colors[source_rows[from_previous]]
+        colors[~from_previous] = np.array([new_colors[path] for path in new_paths], dtype=np.float32).reshape(-1, 3)
+        arrays: Dict[str, np.ndarray] = {}
+        dhashes = np.asarray(store.array('dhashes')[store_rows])
+        descriptors = np.asarray(store.array(DEDUP_DESCRIPTOR)[store_rows])
+        arrays['duplicate_of'] = find_duplicates(dhashes, descriptors, self.dedup_threshold, self.dedup_color_distance)
+        representatives = int(np.count_nonzero(arrays['duplicate_of'] == np.arange(len(image_paths))))
+        dedup = {'threshold': self.dedup_threshold, 'color_distance': self.dedup_color_distance,
+                 'images': len(image_paths), 'representatives': representatives,
+                 'duplicates': len(image_paths) - representatives}
+        print(f"Duplicados: {dedup['duplicates']} de {len(image_paths)} imágenes "
+              f"({representatives} representantes en el KD-Tree).")
+
+        index = TileIndex.build(image_paths, colors, meta={'dedup': dedup}, arrays=arrays,
+                                store=store, store_rows=store_rows)
+        index.save(self.index_dir)
+
+        self.stats = {'total': len(files), 'unchanged': len(kept) + len(touched), 'processed': len(to_process),
+                      'removed': removed, 'corrupted': len(corrupted_images), 'quarantined': len(quarantine),
+                      'duplicates': dedup['duplicates']}
+        elapsed_time = time.perf_counter() - start_time
+        print(f"Índice actualizado en {elapsed_time:.4f} segundos: {self.stats}")
+        print(f"Preprocesamiento completado. Índice guardado en {self.index_dir}")
+        return index
+
+    def _open_store(self, previous: Optional[TileIndex], live_rows: int) -> RowStore:
+        """
+        Almacén en el que se escribe la versión nueva: el de la versión anterior, para agregarle
+        filas, o una generación nueva y vacía si no hay uno compatible o si más de COMPACT_RATIO
+        de sus filas ya no se usarían (en ese caso las filas vigentes se copian a la nueva).
+
+        :param live_rows: Filas de la versión anterior que se reutilizan sin cambios.
+        """
+        layout = self.ROW_ARRAYS
+        if previous is not None and previous.store is not None and previous.store.same_layout(layout):
+            store = RowStore(self.index_dir, previous.store.generation, layout, previous.store.rows)
+            unused = store.rows - live_rows
+            if unused <= self.COMPACT_RATIO * store.rows:
+                return store
+            print(f"Compactando el almacén del índice ({unused} de {store.rows} filas sin usar).")
+        return RowStore.create(self.index_dir, layout)
+
+    def _copy_rows(self, store: RowStore, previous: Optional[TileIndex], rows: np.ndarray,
+                   mtimes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Copia al final del almacén, por lotes, los datos de filas de la versión anterior.
+
+        :param rows: Filas de la versión anterior.
+        :param mtimes: Fechas de modificación que reemplazan a las guardadas (opcional).
+        :return: Filas físicas de las copias.
+        """
+        physical = [np.array([], dtype=np.int64)]
+        for start in range(0, len(rows), self.APPEND_BATCH):
+            batch = rows[start:start + self.APPEND_BATCH]
+            data = {name: previous.arrays[name][batch] for name in store.layout}
+            if mtimes is not None:
+                data['mtimes'] = mtimes[start:start + self.APPEND_BATCH]
+            physical.append(store.append(data))
+        return np.concatenate(physical)
+
+    @staticmethod
+    def _append_entries(store: RowStore, pending: List[Tuple[str, Dict]], physical: Dict[str, int]) -> None:
+        """
+        Agrega al almacén las filas de las imágenes procesadas pendientes y vacía la lista.
+        """
+        if not pending:
+            return
+        rows = store.append({name: np.array([entry[name] for _, entry in pending], dtype=dtype)
+                             for name, (dtype, _) in store.layout.items()})
+        physical.update(zip((path for path, _ in pending), rows.tolist()))
+        pending.clear()
+
+    @staticmethod
+    def _still_quarantined(quarantine: QuarantineManifest, image_path: str, mtime: int, size: int) -> bool:
+        """
+        Indica si un archivo en cuarentena sigue igual que cuando falló (misma fecha y tamaño,
+        o mismo tamaño y mismo contenido); en ese caso no vale la pena volver a decodificarlo.
+        """
+        entry = quarantine.get(image_path)
+        if entry is None or entry['size'] != size:
+            return False
+        if entry['mtime'] == mtime:
+            return True
+        with contextlib.suppress(OSError):
+            if entry['hash'] is not None and file_hash(image_path) == entry['hash']:
+                quarantine.touch(image_path, mtime)
+                return True
+        return False
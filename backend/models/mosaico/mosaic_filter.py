@@ -1,90 +1,109 @@
 import os
 import cv2  
 import numpy as np
-from PIL import Image, UnidentifiedImageError
+from PIL import Image
 from models.base_filter import BaseFilter
 import time
-import pandas as pd
-from multiprocessing import Pool, cpu_count
 import contextlib
-import sys
 from scipy.spatial import cKDTree  # Importar cKDTree para KD-Tree eficiente
 from typing import Optional, Dict, Tuple, List
-from functools import lru_cache
+from collections import OrderedDict
 import gc
 import math
+import threading
 
 from status import preprocessing_status
-
-
-# Variables globales para el KD-Tree y las rutas de imágenes
-global_kdtree: Optional[cKDTree] = None
-global_image_paths: List[str] = []
-
-
-def init_worker(kdtree: cKDTree, image_paths: List[str]) -> None:
+from worker_pool import worker_pool
+from models.mosaico.tile_index import TileIndex, load_tile_index
+from models.mosaico.library_indexer import LibraryIndexer
+from models.mosaico.tile_atlas import TileAtlas
+from models.mosaico.descriptors import DESCRIPTOR_GRIDS, MATCH_MODES, region_descriptors, assign_tiles
+from utils.tiff_writer import StripTiffWriter
+
+# Obtener la ruta absoluta al directorio base (backend/)
+# __file__ está en /backend/models/mosaico/mosaic_filter.py
+# Necesitamos subir tres niveles para llegar a /backend/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_LIBRARY_DIR = 'data/image_library/'
+DEFAULT_INDEX_DIR = 'data/mosaic_index/'
+# CSV de versiones anteriores; si existe se convierte al índice binario una sola vez
+LEGACY_CSV_FILE = 'data/average_colors.csv'
+
+
+def resolve_data_path(path: str) -> str:
     """
-    Inicializador para cada proceso del Pool de multiprocessing.
-    Establece el KD-Tree y las rutas de imágenes como variables globales en cada proceso.
-    
-    :param kdtree: Objeto cKDTree construido a partir de library_colors.
-    :param image_paths: Lista de rutas de imágenes de la biblioteca.
+    Ruta absoluta a partir de una ruta relativa a backend/.
     """
-    global global_kdtree
-    global global_image_paths
-    global_kdtree = kdtree
-    global_image_paths = image_paths
+    return os.path.join(BASE_DIR, path)
 
 
-def calculate_average_color(image_path: str) -> Optional[Dict[str, int]]:
-    """
-    Calcula el color promedio de una imagen después de verificar su integridad con PIL.
-    
-    :param image_path: Ruta completa a la imagen.
-    :return: Diccionario con la ruta de la imagen y sus valores promedio de B, G, R.
-             Retorna None si hay un error al procesar la imagen.
-    """
-    try:
-        # Verificar la integridad de la imagen con PIL
-        with Image.open(image_path) as img_pil:
-            img_pil.verify()  # Esto no carga la imagen pero verifica su integridad
-        
-        # Si la verificación pasó, cargar la imagen con OpenCV
-        with open(os.devnull, 'w') as devnull:
-            with contextlib.redirect_stderr(devnull):
-                img = cv2.imread(image_path)
+# Bytes máximos de tiles redimensionados en la caché de cada proceso
+TILE_CACHE_BYTES = 256 * 1024 * 1024
 
-        if img is None:
-            print(f"Error al cargar la imagen {image_path} con OpenCV.")
-            return None
 
-        # Calcular el color promedio en BGR
-        avg_color = np.mean(img, axis=(0, 1)).astype(int)  # Promedio en 3 canales (B, G, R)
+class TileCache:
+    """
+    Caché LRU de tiles redimensionados, limitada por el total de bytes de los tiles. Los
+    workers del pool son persistentes, así que la caché dura entre solicitudes y entre
+    versiones del índice: la clave incluye la fecha de modificación y el tamaño del archivo,
+    de modo que un archivo reemplazado no devuelve el tile anterior, y las entradas que ya
+    no se usan (archivos eliminados o reemplazados) salen por antigüedad.
+    """
 
-        return {
-            'image_path': image_path,
-            'B': int(avg_color[0]),  # OpenCV usa BGR
-            'G': int(avg_color[1]),
-            'R': int(avg_color[2])
-        }
-    except (UnidentifiedImageError, IOError) as e:
-        return None
-    except Exception as e:
-        print(f"Error al procesar {image_path}: {e}")
-        return None
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._tiles: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key: Tuple, tile: np.ndarray) -> None:
+        if tile.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._tiles.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+            self._tiles[key] = tile
+            self.bytes += tile.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self.bytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tiles.clear()
+            self.bytes = 0
+
+
+_tile_cache = TileCache(TILE_CACHE_BYTES)
 
 
-@lru_cache(maxsize=10000)
 def get_resized_tile(closest_image_path: str, expected_size: Tuple[int, int]) -> Optional[np.ndarray]:
     """
     Obtiene y redimensiona la imagen de la biblioteca al tamaño esperado.
-    Utiliza caché para evitar redimensionamientos repetidos.
+    Utiliza caché (ver TileCache) para evitar redimensionamientos repetidos.
     
     :param closest_image_path: Ruta a la imagen más cercana.
     :param expected_size: Tupla (width, height) del tamaño esperado.
     :return: Imagen redimensionada o None si falla.
     """
     try:
+        try:
+            stat = os.stat(closest_image_path)
+        except OSError:
+            print(f"Error al cargar la imagen de la biblioteca: {closest_image_path}")
+            return None
+        key = (closest_image_path, stat.st_mtime_ns, stat.st_size, expected_size)
+        resized_tile = _tile_cache.get(key)
+        if resized_tile is not None:
+            return resized_tile
         with open(os.devnull, 'w') as devnull:
             with contextlib.redirect_stderr(devnull):
                 tile_img = cv2.imread(closest_image_path)
@@ -92,43 +111,29 @@ def get_resized_tile(closest_image_path: str, expected_size: Tuple[int, int]) ->
             print(f"Error al cargar la imagen de la biblioteca: {closest_image_path}")
             return None
         resized_tile = cv2.resize(tile_img, expected_size, interpolation=cv2.INTER_AREA)
+        _tile_cache.put(key, resized_tile)
         return resized_tile
     except Exception as e:
         print(f"Error al redimensionar la imagen {closest_image_path}: {e}")
         return None
 
 
-def process_block(args: Tuple[Tuple[int, int, int, int], np.ndarray]) -> Tuple[int, int, Optional[np.ndarray]]:
+def process_block(args: Tuple[int, int, int, int, str]) -> Tuple[int, int, Optional[np.ndarray]]:
     """
     Procesa un bloque de la imagen para aplicar el filtro mosaico.
+    La búsqueda en el KD-Tree se hace en el proceso principal; el worker solo
+    carga y redimensiona el tile, que queda en la caché del worker persistente.
     
     :param args: Tuple que contiene:
-                 - block_coords: (x, y, block_width, block_height)
-                 - resized_image: Arreglo NumPy de la imagen redimensionada.
+                 - x, y: Coordenadas del bloque.
+                 - block_width, block_height: Dimensiones del bloque.
+                 - closest_image_path: Ruta de la imagen de la biblioteca más cercana.
     :return: Tuple que contiene:
              - x: Coordenada x del bloque.
              - y: Coordenada y del bloque.
              - resized_tile: Arreglo NumPy de la imagen de la biblioteca redimensionada.
     """
-    block_coords, resized_image = args
-    x, y, block_width, block_height = block_coords
-
-    # Extraer el bloque de la imagen
-    block = resized_image[y:y+block_height, x:x+block_width]
-    if block.size == 0:
-        return (x, y, None)  # Bloque vacío
-
-    # Calcular el color promedio del bloque en BGR
-    avg_color = tuple(block.mean(axis=(0, 1)).astype(int))  # Convertir a tupla para caché
-
-    # Usar el KD-Tree global para encontrar la imagen más cercana
-    if global_kdtree is not None:
-        distance, min_index = global_kdtree.query(avg_color)
-        closest_image_path = global_image_paths[min_index]
-    else:
-        # Si el KD-Tree no está disponible, retornar None
-        print("KD-Tree no está disponible.")
-        return (x, y, None)
+    x, y, block_width, block_height, closest_image_path = args
 
     # Obtener el tile redimensionado desde el caché
     resized_tile = get_resized_tile(closest_image_path, (block_width, block_height))
@@ -136,48 +141,287 @@ def process_block(args: Tuple[Tuple[int, int, int, int], np.ndarray]) -> Tuple[i
     return (x, y, resized_tile)
 
 
+def grid_spans(length: int, block: int) -> List[Tuple[int, int, int]]:
+    """
+    Divide una dimensión de la imagen en tramos de bloques del mismo tamaño: los bloques
+    completos y, si la dimensión no es múltiplo del bloque, el bloque final más pequeño.
+
+    :return: Lista de (primer bloque, último bloque + 1, tamaño de los bloques).
+    """
+    full_blocks = length // block
+    spans: List[Tuple[int, int, int]] = []
+    if full_blocks:
+        spans.append((0, full_blocks, block))
+    if length % block:
+        spans.append((full_blocks, full_blocks + 1, length % block))
+    return spans
+
+
+def grid_regions(height: int, width: int, block_width: int,
+                 block_height: int) -> List[Tuple[int, int, int, int, int, int]]:
+    """
+    Regiones de la cuadrícula de bloques en las que todos los bloques tienen el mismo tamaño
+    (interior, columna derecha, fila inferior y esquina).
+
+    :return: Lista de (fila inicial, fila final, alto, columna inicial, columna final, ancho),
+             con filas y columnas en unidades de bloque.
+    """
+    return [
+        (r0, r1, span_height, c0, c1, span_width)
+        for r0, r1, span_height in grid_spans(height, block_height)
+        for c0, c1, span_width in grid_spans(width, block_width)
+    ]
+
+
+def block_means(image: np.ndarray, block_width: int, block_height: int) -> np.ndarray:
+    """
+    Color promedio de cada bloque de la imagen, con un reshape y una reducción por región
+    en lugar de un recorrido bloque por bloque. Los bloques del borde pueden ser más pequeños.
+
+    :param image: Arreglo uint8 (alto, ancho, canales).
+    :return: Arreglo float64 (filas de bloques, columnas de bloques, canales).
+    """
+    height, width, channels = image.shape
+    grid_rows = -(-height // block_height)
+    grid_cols = -(-width // block_width)
+    sums = np.empty((grid_rows, grid_cols, channels), dtype=np.int64)
+    counts = np.empty((grid_rows, grid_cols, 1), dtype=np.int64)
+
+    for r0, r1, span_height, c0, c1, span_width in grid_regions(height, width, block_width, block_height):
+        y0, x0 = r0 * block_height, c0 * block_width
+        region = image[y0:y0 + (r1 - r0) * span_height, x0:x0 + (c1 - c0) * span_width]
+        # Sumas enteras exactas: el promedio coincide con block.mean() bloque por bloque
+        sums[r0:r1, c0:c1] = region.reshape(r1 - r0, span_height, c1 - c0, span_width, channels).sum(
+            axis=(1, 3), dtype=np.int64)
+        counts[r0:r1, c0:c1] = span_height * span_width
+
+    return sums / counts
+
+
+def block_descriptors(image: np.ndarray, block_width: int, block_height: int, name: str) -> np.ndarray:
+    """
+    Descriptor de color de cada bloque de la imagen (ver region_descriptors), calculado por
+    regiones de bloques del mismo tamaño.
+
+    :param image: Arreglo uint8 BGR (alto, ancho, 3).
+    :return: Arreglo float32 (filas de bloques, columnas de bloques, dimensión del descriptor).
+    """
+    height, width, channels = image.shape
+    grid = DESCRIPTOR_GRIDS[name]
+    descriptors = np.empty((-(-height // block_height), -(-width // block_width), grid * grid * channels),
+                           dtype=np.float32)
+
+    for r0, r1, span_height, c0, c1, span_width in grid_regions(height, width, block_width, block_height):
+        y0, x0 = r0 * block_height, c0 * block_width
+        region = image[y0:y0 + (r1 - r0) * span_height, x0:x0 + (c1 - c0) * span_width]
+        descriptors[r0:r1, c0:c1] = region_descriptors(
+            region.reshape(r1 - r0, span_height, c1 - c0, span_width, channels), name)
+
+    return descriptors
+
+
+def nearest_indices(source_length: int, target_length: int) -> np.ndarray:
+    """
+    Índice del píxel de origen de cada posición al ampliar una dimensión de source_length a
+    target_length con vecino más cercano, con el mismo redondeo que cv2.INTER_NEAREST. Permite
+    ampliar la imagen por bandas con el mismo resultado que cv2.resize.
+    """
+    scale = 1.0 / (target_length / source_length)
+    return np.minimum(np.floor(np.arange(target_length) * scale).astype(np.intp), source_length - 1)
+
+
+def place_tiles(final_image: np.ndarray, tiles: np.ndarray, tile_indices: np.ndarray, y: int, x: int) -> None:
+    """
+    Copia a final_image una región de bloques del mismo tamaño a partir de (x, y).
+
+    :param tiles: Tiles disponibles, arreglo (n, alto, ancho, 3).
+    :param tile_indices: Índice en tiles del tile de cada bloque, arreglo (filas, columnas).
+    """
+    rows, cols = tile_indices.shape
+    tile_height, tile_width = tiles.shape[1:3]
+    target = final_image[y:y + rows * tile_height, x:x + cols * tile_width]
+    # Separar los ejes de la región en (fila, alto, columna, ancho) es una vista de final_image
+    target = target.reshape(rows, tile_height, cols, tile_width, -1)
+    target[...] = tiles[tile_indices].transpose(0, 2, 1, 3, 4)
+
+
+def preprocess_image_library(library_dir: str, index_dir: str, full: bool = False) -> TileIndex:
+    """
+    Preprocesa las imágenes de la biblioteca y guarda sus colores promedio en el índice binario
+    (ver TileIndex). La actualización es incremental: solo se decodifican las imágenes nuevas o
+    modificadas (ver LibraryIndexer). También registra imágenes corruptas que no pudieron ser procesadas.
+
+    :param library_dir: Ruta absoluta a la biblioteca de imágenes.
+    :param index_dir: Ruta absoluta a la carpeta del índice.
+    :param full: Si es True, vuelve a procesar todas las imágenes.
+    :return: Índice vigente.
+    """
+    return LibraryIndexer(library_dir, index_dir).update(full=full)
+
+
+# Trabajo de indexación en segundo plano (uno a la vez por proceso, y a lo más uno en espera)
+_indexing_thread: Optional[threading.Thread] = None
+_indexing_target: Optional[Tuple[str, str, bool]] = None
+_pending_target: Optional[Tuple[str, str, bool]] = None
+_pending_job_id: Optional[str] = None
+_indexing_lock = threading.Lock()
+
+
+def _run_library_indexing(library_dir: str, index_dir: str, full: bool) -> None:
+    """
+    Actualiza el índice reportando el progreso en preprocessing_status.
+    """
+    try:
+        indexer = LibraryIndexer(library_dir, index_dir)
+        indexer.update(full=full, progress=preprocessing_status.set_progress)
+        preprocessing_status.finish_job(indexer.stats)
+    except Exception as e:
+        print(f"Error al indexar la biblioteca: {e}")
+        preprocessing_status.finish_job(error=str(e))
+
+
+def _indexing_worker(target: Tuple[str, str, bool]) -> None:
+    """
+    Cuerpo del hilo de indexación: ejecuta el trabajo y, al terminar, el que haya quedado en espera.
+    """
+    global _indexing_target, _pending_target, _pending_job_id
+    while target is not None:
+        _run_library_indexing(*target)
+        with _indexing_lock:
+            target, job_id = _pending_target, _pending_job_id
+            _pending_target, _pending_job_id = None, None
+            _indexing_target = target
+            if target is not None:
+                preprocessing_status.start_job(job_id)
+
+
+def _covers(current: Optional[Tuple[str, str, bool]], target: Tuple[str, str, bool]) -> bool:
+    """
+    Indica si el trabajo current ya incluye lo que pide target (misma biblioteca e índice, y
+    completo si target lo es).
+    """
+    return current is not None and current[:2] == target[:2] and (current[2] or not target[2])
+
+
+def start_library_indexing(library_dir: str = DEFAULT_LIBRARY_DIR, index_dir: str = DEFAULT_INDEX_DIR,
+                           full: bool = False) -> str:
+    """
+    Inicia la indexación de la biblioteca en un hilo en segundo plano. Mientras tanto el índice
+    anterior sigue publicado, así que las solicitudes del mosaico no se bloquean; la versión nueva
+    se publica de forma atómica al terminar.
+
+    Si ya hay un trabajo en curso que no cubre esta solicitud (por ejemplo, una reconstrucción
+    completa mientras corre una actualización incremental), la solicitud queda en espera y el
+    mismo hilo la ejecuta al terminar; nunca se espera al trabajo en curso.
+
+    :return: Identificador del trabajo: el del trabajo en curso o en espera que ya la cubre, el del
+             trabajo puesto en espera o el del trabajo iniciado.
+    """
+    global _indexing_thread, _indexing_target, _pending_target, _pending_job_id
+    library_dir = resolve_data_path(library_dir)
+    index_dir = resolve_data_path(index_dir)
+    target = (library_dir, index_dir, full)
+
+    with _indexing_lock:
+        if _indexing_target is not None:
+            if _covers(_indexing_target, target):
+                return preprocessing_status.get_job()['job_id']
+            if not _covers(_pending_target, target):
+                # Una solicitud para la misma biblioteca amplía la que espera; otra la reemplaza
+                if _pending_target is not None and _pending_target[:2] == target[:2]:
+                    target = (library_dir, index_dir, True)
+                _pending_target = target
+                _pending_job_id = _pending_job_id or preprocessing_status.queue_job()
+            return _pending_job_id
+
+        job_id = preprocessing_status.start_job()
+        _indexing_thread = threading.Thread(
+            target=_indexing_worker, args=(target,), name=f'library-indexing-{job_id}', daemon=True
+        )
+        _indexing_target = target
+        _indexing_thread.start()
+        return job_id
+
+
+def wait_for_library_indexing(timeout: Optional[float] = None) -> None:
+    """
+    Espera a que termine el trabajo de indexación en curso (si lo hay).
+    """
+    thread = _indexing_thread
+    if thread is not None:
+        thread.join(timeout)
+
+
+def library_index_summary(index_dir: str = DEFAULT_INDEX_DIR) -> Optional[Dict]:
+    """
+    Resumen de la versión vigente del índice: imágenes, representantes y duplicados agrupados.
+
+    :return: Diccionario con el resumen, o None si no hay índice.
+    """
+    index = load_tile_index(resolve_data_path(index_dir))
+    if index is None:
+        return None
+    return {
+        'version': index.version,
+        'images': len(index),
+        'representatives': len(index.tree_rows),
+        'duplicates': len(index) - len(index.tree_rows),
+    }
+
+
+def reset_library_index(library_dir: str = DEFAULT_LIBRARY_DIR, index_dir: str = DEFAULT_INDEX_DIR,
+                        full: bool = False) -> str:
+    """
+    Descarta el CSV de versiones anteriores e inicia en segundo plano la actualización del índice
+    con los cambios en disco. Con full=True se vuelven a procesar todas las imágenes.
+
+    :return: Identificador del trabajo de indexación.
+    """
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(resolve_data_path(LEGACY_CSV_FILE))
+    return start_library_indexing(library_dir, index_dir, full=full)
+
+
 class MosaicFilter(BaseFilter):
-    def __init__(self, image: Image.Image, library_dir: str = 'data/image_library/', csv_file: str = 'data/average_colors.csv') -> None:
+    # Bloques vecinos (en cada dirección) en los que se cuentan las repeticiones de un tile
+    REPETITION_RADIUS = 2
+    # Tamaño aproximado (en bytes) de cada banda de la imagen final en write_tiff
+    STREAM_BAND_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, image: Image.Image, library_dir: str = DEFAULT_LIBRARY_DIR, index_dir: str = DEFAULT_INDEX_DIR) -> None:
         """
         Inicializa el filtro mosaico con la imagen objetivo, la ruta de la biblioteca de imágenes
-        y el archivo CSV donde se almacenarán los colores promedio.
+        y la carpeta del índice binario con los colores promedio.
 
         :param image: Imagen objetivo (PIL Image).
         :param library_dir: Ruta a la carpeta que contiene las imágenes de la biblioteca.
-        :param csv_file: Nombre del archivo CSV para almacenar los colores promedio.
+        :param index_dir: Ruta a la carpeta del índice de la biblioteca (ver TileIndex).
         """
         start_time = time.perf_counter()  # Inicio del tiempo total del método
 
         super().__init__(image)
 
-        # Obtener la ruta absoluta al directorio base (backend/)
-        # __file__ está en /backend/models/mosaico/mosaic_filter.py
-        # Necesitamos subir tres niveles para llegar a /backend/
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-        # Construir rutas absolutas para la biblioteca de imágenes y el CSV
-        self.library_dir: str = os.path.join(base_dir, library_dir)
-        self.csv_file: str = os.path.join(base_dir, csv_file)
-
-        # Imprimir las rutas para verificar
-        print(f"Library Directory: {self.library_dir}")
-        print(f"CSV File Path: {self.csv_file}")
+        # Construir rutas absolutas para la biblioteca de imágenes y el índice
+        self.library_dir: str = resolve_data_path(library_dir)
+        self.index_dir: str = resolve_data_path(index_dir)
 
-        self.image_paths: List[str] = []
+        self.index: Optional[TileIndex] = None
+        self.image_paths: np.ndarray = np.array([], dtype=str)
         self.library_colors: np.ndarray = np.array([])
-        self.corrupted_images: List[str] = []  # Lista para almacenar imágenes corruptas
-
-        # Asegurar que el directorio para el CSV existe
-        os.makedirs(os.path.dirname(self.csv_file), exist_ok=True)
-
-        # Verificar si el archivo CSV ya existe para evitar recalcular
-        if not os.path.exists(self.csv_file):
-            preprocessing_status.set_preprocessing(True)  # Indicar que comienza el preprocesamiento
-            try:
-                self.preprocess_image_library()
-            finally:
-                preprocessing_status.set_preprocessing(False)  # Indicar que finaliza el preprocesamiento
-
+        self.kdtree: Optional[cKDTree] = None
+        self.tree_rows: np.ndarray = np.array([], dtype=np.intp)
+
+        # Construir el índice solo si no existe (convirtiendo el CSV anterior si lo hay).
+        # Si hay una reindexación en curso se usa la última versión completada
+        if not TileIndex.exists(self.index_dir):
+            legacy_csv: str = resolve_data_path(LEGACY_CSV_FILE)
+            if os.path.exists(legacy_csv):
+                print(f"Convirtiendo {legacy_csv} al índice binario.")
+                TileIndex.from_csv(legacy_csv).save(self.index_dir)
+            else:
+                # No hay un índice anterior con el cual servir la solicitud: esperar a la indexación
+                start_library_indexing(self.library_dir, self.index_dir)
+                wait_for_library_indexing()
 
         self.load_library_data()
 
@@ -187,136 +431,57 @@ class MosaicFilter(BaseFilter):
 
     def preprocess_image_library(self) -> None:
         """
-        Preprocesa las imágenes en la carpeta especificada, calcula el color promedio de cada imagen
-        y guarda los resultados en un archivo CSV utilizando OpenCV y pandas de manera más eficiente.
-        Esta versión utiliza multiprocessing para procesar imágenes en paralelo.
-        También registra imágenes corruptas que no pudieron ser procesadas.
+        Preprocesa la biblioteca de imágenes y guarda el índice binario (ver preprocess_image_library).
         """
-        start_time = time.perf_counter()  # Inicio del tiempo
-
-        # Extensiones de archivos de imagen soportadas
-        valid_extensions: Tuple[str, ...] = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff')
-
-        # Lista para almacenar las rutas de imágenes válidas
-        image_paths: List[str] = []
-
-        # Recorrer todos los archivos en la carpeta y subcarpetas
-        for root, dirs, files in os.walk(self.library_dir):
-            for file in files:
-                if file.lower().endswith(valid_extensions):
-                    image_path = os.path.join(root, file)
-                    image_paths.append(image_path)
-
-        print(f"Total de imágenes a procesar: {len(image_paths)}")
-
-        # Utilizar Pool de multiprocessing para procesar imágenes en paralelo
-        num_processes: int = cpu_count()
-        print(f"Usando {num_processes} procesos para el preprocesamiento.")
-
-        with Pool(processes=num_processes) as pool:
-            # Mapear la función calculate_average_color a todas las rutas de imágenes
-            results: List[Optional[Dict[str, int]]] = pool.map(calculate_average_color, image_paths)
-
-        # Filtrar resultados exitosos (no None) y recopilar imágenes corruptas
-        image_data: List[Dict[str, int]] = []
-        corrupted_images: List[str] = []
-        for img_path, res in zip(image_paths, results):
-            if res is not None:
-                image_data.append(res)
-            else:
-                corrupted_images.append(img_path)
-
-        # Registrar imágenes corruptas
-        if corrupted_images:
-            print(f"Se encontraron {len(corrupted_images)} imágenes corruptas:")
-            for img in corrupted_images:
-                print(f" - {img}")
-
-            # Guardar las imágenes corruptas en un archivo log (opcional)
-            log_path: str = os.path.join(os.path.dirname(self.csv_file), 'corrupted_images.log')
-            with open(log_path, 'w') as log_file:
-                for img in corrupted_images:
-                    log_file.write(f"{img}\n")
-            print(f"Lista de imágenes corruptas guardadas en {log_path}")
-        else:
-            print("No se encontraron imágenes corruptas.")
-
-        # Crear un DataFrame y guardar en CSV usando pandas
-        df: pd.DataFrame = pd.DataFrame(image_data)
-        df.to_csv(self.csv_file, index=False, columns=['image_path', 'B', 'G', 'R'])  # Asegurar orden y nombres de columnas
-
-        end_time_data: float = time.perf_counter()  # Fin del tiempo de escritura
-        elapsed_time_data: float = end_time_data - start_time
-        print(f"Guardado en DataFrame y escritura en CSV completados en {elapsed_time_data:.4f} segundos.")
-
-        print(f"Preprocesamiento completado. Datos guardados en {self.csv_file}")
-        print(f"Tiempo total de preprocesamiento: {elapsed_time_data:.4f} segundos.")
-
-        # Guardar las imágenes corruptas en una carpeta específica (opcional)
-        if corrupted_images:
-            corrupted_dir: str = os.path.join(os.path.dirname(self.csv_file), 'corrupted_images')
-            os.makedirs(corrupted_dir, exist_ok=True)
-            for img in corrupted_images:
-                try:
-                    basename: str = os.path.basename(img)
-                    destination: str = os.path.join(corrupted_dir, basename)
-                    os.rename(img, destination)
-                    print(f"Moviendo {img} a {destination}")
-                except Exception as e:
-                    print(f"Error al mover {img} a {corrupted_dir}: {e}")
+        preprocess_image_library(self.library_dir, self.index_dir)
 
     def load_library_data(self) -> None:
         """
-        Carga los datos de colores promedio y rutas de imágenes desde el archivo CSV utilizando pandas.
-        Además, construye un KD-Tree para búsquedas rápidas.
+        Obtiene el índice de la biblioteca: colores promedio (memoria mapeada), rutas y KD-Tree
+        (solo con las imágenes representantes; tree_rows traduce sus posiciones a filas del índice).
+        El índice se carga una sola vez por proceso y se comparte entre solicitudes.
         """
         start_time = time.perf_counter()  # Inicio del tiempo
 
         try:
-            # Leer el CSV con pandas, especificando los tipos de datos para optimizar la lectura
-            df: pd.DataFrame = pd.read_csv(
-                self.csv_file,
-                dtype={'image_path': str, 'B': np.float32, 'G': np.float32, 'R': np.float32}
-            )
-
-            # Verificar que las columnas necesarias existen
-            required_columns = {'image_path', 'B', 'G', 'R'}
-            if not required_columns.issubset(df.columns):
-                raise ValueError(f"El CSV debe contener las columnas: {required_columns}")
+            self.index = load_tile_index(self.index_dir)
+            if self.index is None or len(self.index) == 0:
+                raise ValueError(f"No hay un índice con imágenes en {self.index_dir}")
 
             # Asignar los datos a los atributos de la clase
-            self.library_colors: np.ndarray = df[['B', 'G', 'R']].to_numpy(dtype=np.float32)
-            self.image_paths: List[str] = df['image_path'].tolist()
-
-            # Construir el KD-Tree usando cKDTree para mayor eficiencia
-            self.kdtree: Optional[cKDTree] = cKDTree(self.library_colors)
+            self.library_colors = self.index.colors
+            self.image_paths = self.index.paths
+            self.kdtree = self.index.kdtree
+            self.tree_rows = self.index.tree_rows
 
-            print("Datos de la biblioteca cargados exitosamente y KD-Tree construido.")
+            print(f"Índice de la biblioteca cargado ({len(self.index)} imágenes, "
+                  f"{len(self.tree_rows)} sin duplicados, versión {self.index.version}).")
         except Exception as e:
             print(f"Error al cargar los datos de la biblioteca: {e}")
             self.library_colors = np.array([])
-            self.image_paths = []
+            self.image_paths = np.array([], dtype=str)
             self.kdtree = None
+            self.tree_rows = np.array([], dtype=np.intp)
 
         end_time = time.perf_counter()  # Fin del tiempo
         elapsed_time: float = end_time - start_time
         print(f"Carga de datos de la biblioteca completada en {elapsed_time:.4f} segundos.")
 
-    def find_closest_image(self, avg_color: np.ndarray) -> str:
+    def find_closest_index(self, avg_color: np.ndarray) -> int:
         """
-        Encuentra la imagen en la biblioteca cuyo color promedio es el más cercano al color dado,
+        Encuentra la fila del índice cuya imagen tiene el color promedio más cercano al color dado,
         utilizando un KD-Tree para mejorar la eficiencia.
 
         :param avg_color: Color promedio del bloque (arreglo de tres enteros B, G, R).
-        :return: Ruta a la imagen más cercana.
+        :return: Fila de la imagen más cercana en el índice.
         """
         if self.kdtree is not None:
             distance, index = self.kdtree.query(avg_color)
-            return self.image_paths[index]
+            return int(self.tree_rows[index])
         else:
             # Fallback a la implementación original si el KD-Tree no está disponible
             min_distance: float = float('inf')
-            closest_image_path: Optional[str] = None
+            closest_index: int = -1
 
             # Convertir avg_color a un arreglo NumPy
             avg_color_np: np.ndarray = np.array(avg_color)
@@ -327,71 +492,125 @@ class MosaicFilter(BaseFilter):
                 distance = np.linalg.norm(avg_color_np - lib_color)
                 if distance < min_distance:
                     min_distance = distance
-                    closest_image_path = self.image_paths[idx]
+                    closest_index = idx
 
-            return closest_image_path  # type: ignore
+            return closest_index
 
-    def apply_filter(self, block_width: int, block_height: int, upscale_factor: int) -> Image.Image:
+    def find_closest_image(self, avg_color: np.ndarray) -> str:
         """
-        Aplica el filtro mosaico a la imagen objetivo utilizando OpenCV y multiprocessing.
+        Encuentra la imagen en la biblioteca cuyo color promedio es el más cercano al color dado.
 
-        :param block_width: Ancho de cada bloque en píxeles.
-        :param block_height: Alto de cada bloque en píxeles.
-        :param upscale_factor: Factor de ampliación de la imagen final.
-        :return: Imagen procesada (PIL Image).
+        :param avg_color: Color promedio del bloque (arreglo de tres enteros B, G, R).
+        :return: Ruta a la imagen más cercana.
         """
-        start_time = time.perf_counter()  # Inicio del tiempo total del método
+        return str(self.image_paths[self.find_closest_index(avg_color)])
 
-        # Validación de entradas
+    def _check_parameters(self, block_width: int, block_height: int, upscale_factor: int, match: str,
+                          candidates: int, repetition_penalty: float) -> None:
+        """
+        Valida los parámetros del filtro (ver apply_filter).
+        """
         if block_width <= 0 or block_height <= 0:
             raise ValueError("Las dimensiones del bloque deben ser enteros positivos.")
         if upscale_factor <= 0:
             raise ValueError("El factor de ampliación debe ser un entero positivo.")
+        if match not in MATCH_MODES:
+            raise ValueError(f"El modo de comparación debe ser uno de: {', '.join(MATCH_MODES)}.")
+        if candidates <= 0:
+            raise ValueError("El número de candidatos debe ser un entero positivo.")
+        if repetition_penalty < 0:
+            raise ValueError("La penalización por repetición no puede ser negativa.")
+        if match != 'bgr' and self.index is not None and match not in self.index.arrays:
+            raise ValueError(f"El índice de la biblioteca no tiene el descriptor '{match}'. "
+                             "Reinicia el preprocesamiento.")
+
+    def _source_array(self, upscale_factor: int) -> Tuple[np.ndarray, int, int]:
+        """
+        Imagen objetivo en BGR y tamaño de la imagen ampliada según upscale_factor.
 
-        # Convertir la imagen a un arreglo NumPy utilizando OpenCV (BGR)
+        :return: (arreglo BGR, ancho ampliado, alto ampliado).
+        """
         img: Image.Image = self.image.convert('RGB')
-        image_array: np.ndarray = np.array(img)
-        image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)  # Convertir a BGR
-
-        # Ampliar la imagen según el upscale_factor utilizando OpenCV
+        image_array: np.ndarray = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
         new_width: int = round(image_array.shape[1] * math.sqrt(upscale_factor))
         new_height: int = round(image_array.shape[0] * math.sqrt(upscale_factor))
-        resized_image: np.ndarray = cv2.resize(
-            image_array,
-            (new_width, new_height),
-            interpolation=cv2.INTER_NEAREST
-        )
-
-        height, width, _ = resized_image.shape
+        return image_array, new_width, new_height
 
-        # Crear una lista de todas las coordenadas de los bloques
-        blocks: List[Tuple[Tuple[int, int, int, int], np.ndarray]] = []
-        for y in range(0, height, block_height):
-            for x in range(0, width, block_width):
-                current_block_width: int = min(block_width, width - x)
-                current_block_height: int = min(block_height, height - y)
-                blocks.append(((x, y, current_block_width, current_block_height), resized_image))
-
-        print(f"Total de bloques a procesar: {len(blocks)}")
-
-        # Crear el KD-Tree y las rutas de imágenes para los procesos
-        kdtree = self.kdtree
-        image_paths = self.image_paths
+    def _match_blocks(self, image: np.ndarray, block_width: int, block_height: int, match: str,
+                      candidates: int, repetition_penalty: float,
+                      previous: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Descriptores de todos los bloques de la imagen en una sola pasada y una sola consulta
+        al KD-Tree.
 
-        if kdtree is None:
-            print("KD-Tree no está disponible. No se puede aplicar el filtro.")
-            return self.image
+        :param previous: Posiciones en el árbol elegidas en las filas de bloques inmediatamente
+                         anteriores (ensamblado por bandas); solo se usan con penalización.
+        :return: Arreglo (filas de bloques, columnas de bloques) con la posición en el árbol del
+                 tile de cada bloque (ver tree_rows).
+        """
+        if match == 'bgr':
+            features: np.ndarray = block_means(image, block_width, block_height).astype(int)
+            tree: cKDTree = self.kdtree
+        else:
+            features = block_descriptors(image, block_width, block_height, match)
+            tree = self.index.tree(match)
+        grid_rows, grid_cols = features.shape[:2]
+
+        # Sin penalización basta con el más cercano; con ella se eligen entre los k más cercanos
+        k: int = min(candidates, tree.n) if repetition_penalty > 0 else 1
+        distances, closest_indices = tree.query(features.reshape(grid_rows * grid_cols, -1), k=k)
+        if k == 1:
+            return np.asarray(closest_indices, dtype=np.intp).reshape(grid_rows, grid_cols)
+
+        if previous is None:
+            previous = np.empty((0, grid_cols), dtype=np.int64)
+        return assign_tiles(
+            closest_indices.reshape(grid_rows, grid_cols, k), distances.reshape(grid_rows, grid_cols, k),
+            tree.n, float(repetition_penalty), self.REPETITION_RADIUS, previous.astype(np.int64)
+        ).astype(np.intp)
+
+    def _place_blocks(self, final_image: np.ndarray, closest_indices: np.ndarray, block_width: int,
+                      block_height: int, atlas: Optional[TileAtlas]) -> int:
+        """
+        Coloca en final_image (en su lugar) el tile de cada bloque.
 
-        # Inicializar el Pool de multiprocessing con el KD-Tree
-        num_processes: int = cpu_count()
-        print(f"Usando {num_processes} procesos para el procesamiento de bloques.")
+        Los tiles que caben en el atlas se copian desde él por regiones de bloques del mismo
+        tamaño; solo los bloques más grandes que el mayor tamaño del atlas requieren
+        decodificar la imagen de la biblioteca. Los bloques cuyo tile no se pudo cargar
+        conservan los píxeles de final_image.
 
-        with Pool(processes=num_processes, initializer=init_worker, initargs=(kdtree, image_paths)) as pool:
-            # Mapear la función process_block a todas las coordenadas de bloques
-            results: List[Tuple[int, int, Optional[np.ndarray]]] = pool.map(process_block, blocks)
+        :param closest_indices: Fila del índice del tile de cada bloque (filas, columnas).
+        :return: Número de bloques que se decodificaron desde la biblioteca.
+        """
+        height, width = final_image.shape[:2]
+        pending_blocks: List[Tuple[int, int, int, int, str]] = []
+        for r0, r1, current_block_height, c0, c1, current_block_width in grid_regions(
+                height, width, block_width, block_height):
+            region_indices = closest_indices[r0:r1, c0:c1]
+            unique_indices, inverse = np.unique(region_indices, return_inverse=True)
+            tiles = atlas.tiles(unique_indices, current_block_width, current_block_height) if atlas is not None else None
+            if tiles is None:
+                for r in range(r0, r1):
+                    for c in range(c0, c1):
+                        pending_blocks.append((c * block_width, r * block_height, current_block_width,
+                                               current_block_height, str(self.image_paths[closest_indices[r, c]])))
+                continue
+
+            # Colocar la región por bandas de filas de bloques en el pool de hilos
+            inverse = inverse.reshape(region_indices.shape)
+            num_bands = min(worker_pool.size, r1 - r0)
+            bands = np.array_split(np.arange(r0, r1), num_bands)
+            worker_pool.thread_map(
+                lambda band: place_tiles(final_image, tiles, inverse[band[0] - r0:band[-1] + 1 - r0],
+                                         band[0] * block_height, c0 * block_width),
+                [band for band in bands if len(band)]
+            )
 
-        # Crear una copia de la imagen redimensionada para colocar los tiles
-        final_image: np.ndarray = resized_image.copy()
+        # Cargar y redimensionar los tiles restantes en el pool compartido
+        results: List[Tuple[int, int, Optional[np.ndarray]]] = []
+        if pending_blocks:
+            print(f"Usando {worker_pool.size} procesos para el procesamiento de bloques.")
+            results = worker_pool.map(process_block, pending_blocks)
 
         # Iterar sobre los resultados y pegar los tiles en la posición correspondiente
         for result in results:
@@ -412,16 +631,116 @@ class MosaicFilter(BaseFilter):
                 # Pegar el tile en la imagen final
                 final_image[y:y+expected_height, x:x+expected_width] = resized_tile
 
+        return len(pending_blocks)
+
+    def apply_filter(self, block_width: int, block_height: int, upscale_factor: int, match: str = 'bgr',
+                     candidates: int = 8, repetition_penalty: float = 0.0) -> Image.Image:
+        """
+        Aplica el filtro mosaico a la imagen objetivo utilizando OpenCV y multiprocessing.
+
+        :param block_width: Ancho de cada bloque en píxeles.
+        :param block_height: Alto de cada bloque en píxeles.
+        :param upscale_factor: Factor de ampliación de la imagen final.
+        :param match: Cómo se comparan bloques y tiles: 'bgr' (color promedio, distancia euclidiana),
+                      'lab' (color promedio en CIELAB) o 'grid2' / 'grid3' (cuadrícula de 2x2 o 3x3
+                      colores promedio en CIELAB).
+        :param candidates: Tiles más cercanos que se consideran por bloque cuando hay penalización.
+        :param repetition_penalty: Costo que se suma a un candidato por cada vez que ya aparece en
+                                   los bloques vecinos (0 desactiva la penalización).
+        :return: Imagen procesada (PIL Image).
+        """
+        start_time = time.perf_counter()  # Inicio del tiempo total del método
+
+        # Validación de entradas
+        self._check_parameters(block_width, block_height, upscale_factor, match, candidates, repetition_penalty)
+
+        # Convertir la imagen a un arreglo NumPy (BGR) y ampliarla según el upscale_factor
+        image_array, new_width, new_height = self._source_array(upscale_factor)
+        resized_image: np.ndarray = cv2.resize(
+            image_array,
+            (new_width, new_height),
+            interpolation=cv2.INTER_NEAREST
+        )
+
+        if self.kdtree is None:
+            print("KD-Tree no está disponible. No se puede aplicar el filtro.")
+            return self.image
+
+        # Posiciones en el árbol -> filas del índice
+        closest_indices = self.tree_rows[self._match_blocks(
+            resized_image, block_width, block_height, match, candidates, repetition_penalty)]
+        total_blocks = closest_indices.size
+        print(f"Total de bloques a procesar: {total_blocks}")
+
+        # Los tiles se colocan directamente sobre la imagen ampliada: los descriptores ya se
+        # calcularon y los bloques sin tile conservan sus píxeles, como con una copia
+        atlas = TileAtlas(self.index) if self.index is not None else None
+        decoded_blocks = self._place_blocks(resized_image, closest_indices, block_width, block_height, atlas)
+        print(f"Bloques colocados desde el atlas: {total_blocks - decoded_blocks}, "
+              f"por decodificar: {decoded_blocks}")
+
+        # Convertir la imagen final de BGR a RGB para PIL (en su lugar)
+        cv2.cvtColor(resized_image, cv2.COLOR_BGR2RGB, dst=resized_image)
+        processed_image: Image.Image = Image.fromarray(resized_image)
+
         # Liberar memoria innecesaria
         del resized_image
         gc.collect()
 
-        # Convertir la imagen final de BGR a RGB para PIL
-        final_image = cv2.cvtColor(final_image, cv2.COLOR_BGR2RGB)
-        processed_image: Image.Image = Image.fromarray(final_image)
-
         end_time = time.perf_counter()  # Fin del tiempo total del método
         elapsed_time: float = end_time - start_time
         print(f"apply_filter completado en {elapsed_time:.4f} segundos.")
 
         return processed_image
+
+    def write_tiff(self, path: str, block_width: int, block_height: int, upscale_factor: int,
+                   match: str = 'bgr', candidates: int = 8, repetition_penalty: float = 0.0) -> Tuple[int, int]:
+        """
+        Aplica el filtro mosaico escribiendo el resultado en un TIFF por bandas de filas de
+        bloques, sin tener la imagen ampliada completa en memoria: cada banda se amplía desde la
+        imagen objetivo, se buscan sus tiles, se colocan y se escribe. La memoria usada depende
+        del ancho de la imagen final y no de su alto. El resultado es idéntico al de apply_filter.
+
+        Los parámetros son los de apply_filter.
+
+        :param path: Ruta del archivo TIFF de salida.
+        :return: (ancho, alto) de la imagen escrita.
+        """
+        start_time = time.perf_counter()  # Inicio del tiempo total del método
+
+        self._check_parameters(block_width, block_height, upscale_factor, match, candidates, repetition_penalty)
+        if self.kdtree is None:
+            raise ValueError("KD-Tree no está disponible. No se puede aplicar el filtro.")
+
+        image_array, new_width, new_height = self._source_array(upscale_factor)
+        # Píxel de origen de cada fila y columna de la imagen ampliada (como cv2.INTER_NEAREST)
+        x_map = nearest_indices(image_array.shape[1], new_width)
+        y_map = nearest_indices(image_array.shape[0], new_height)
+
+        # Filas de bloques por banda, según el tamaño de banda deseado
+        band_blocks = max(1, self.STREAM_BAND_BYTES // (block_height * new_width * 3))
+        band_height = band_blocks * block_height
+        print(f"Escribiendo TIFF de {new_width}x{new_height} en bandas de {band_height} filas.")
+
+        atlas = TileAtlas(self.index) if self.index is not None else None
+        previous = np.empty((0, -(-new_width // block_width)), dtype=np.intp)
+        decoded_blocks = 0
+        with StripTiffWriter(path, new_width, new_height, rows_per_strip=block_height,
+                             map_func=worker_pool.thread_map) as writer:
+            for y0 in range(0, new_height, band_height):
+                band = image_array[y_map[y0:y0 + band_height, np.newaxis], x_map]
+                positions = self._match_blocks(band, block_width, block_height, match, candidates,
+                                               repetition_penalty, previous)
+                # Las últimas filas elegidas son el contexto de la penalización en la banda siguiente
+                previous = np.concatenate([previous, positions])[-self.REPETITION_RADIUS:]
+                decoded_blocks += self._place_blocks(band, self.tree_rows[positions], block_width,
+                                                     block_height, atlas)
+                cv2.cvtColor(band, cv2.COLOR_BGR2RGB, dst=band)
+                writer.write(band)
+
+        print(f"Bloques decodificados desde la biblioteca: {decoded_blocks}")
+        end_time = time.perf_counter()  # Fin del tiempo total del método
+        elapsed_time: float = end_time - start_time
+        print(f"write_tiff completado en {elapsed_time:.4f} segundos.")
+
+        return new_width, new_height
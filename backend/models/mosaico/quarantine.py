@@ -0,0 +1,94 @@
+import os
+import json
+import time
+from typing import Optional, Dict, Iterable
+
+
+class QuarantineManifest:
+    """
+    Registro persistente de las imágenes de la biblioteca que no se pudieron procesar.
+
+    Se guarda en `index_dir/quarantine.json`, con una entrada por ruta:
+        hash       -> hash del contenido (BLAKE2b) cuando falló
+        size       -> tamaño en bytes
+        mtime      -> fecha de modificación en nanosegundos
+        error      -> motivo del fallo
+        first_seen -> fecha del primer fallo (segundos desde epoch)
+        last_seen  -> fecha del último fallo
+    Los archivos no se mueven ni se modifican: una imagen en cuarentena simplemente se omite
+    en las actualizaciones incrementales mientras su contenido no cambie.
+    """
+
+    FILE_NAME = 'quarantine.json'
+
+    def __init__(self, index_dir: str) -> None:
+        """
+        :param index_dir: Ruta absoluta a la carpeta del índice.
+        """
+        self.path = os.path.join(index_dir, self.FILE_NAME)
+        self.entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f).get('entries', {})
+        except (OSError, ValueError):
+            return {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, image_path: str) -> bool:
+        return image_path in self.entries
+
+    def get(self, image_path: str) -> Optional[Dict]:
+        return self.entries.get(image_path)
+
+    def add(self, image_path: str, content_hash: Optional[str], mtime: int, size: int, error: str) -> None:
+        """
+        Registra (o actualiza) el fallo de una imagen.
+        """
+        now = time.time()
+        previous = self.entries.get(image_path, {})
+        self.entries[image_path] = {
+            'hash': content_hash,
+            'size': size,
+            'mtime': mtime,
+            'error': error,
+            'first_seen': previous.get('first_seen', now),
+            'last_seen': now,
+        }
+
+    def touch(self, image_path: str, mtime: int) -> None:
+        """
+        Actualiza la fecha de modificación de una entrada cuyo contenido no cambió.
+        """
+        self.entries[image_path]['mtime'] = mtime
+
+    def discard(self, image_path: str) -> None:
+        self.entries.pop(image_path, None)
+
+    def prune(self, existing_paths: Iterable[str]) -> int:
+        """
+        Elimina las entradas de archivos que ya no existen en la biblioteca.
+
+        :return: Número de entradas eliminadas.
+        """
+        existing = set(existing_paths)
+        missing = [path for path in self.entries if path not in existing]
+        for path in missing:
+            del self.entries[path]
+        return len(missing)
+
+    def clear(self) -> None:
+        self.entries = {}
+
+    def save(self) -> None:
+        """
+        Escribe el registro de forma atómica (archivo temporal y reemplazo).
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'entries': self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,141 @@
+import os
+import time
+import uuid
+import shutil
+import numpy as np
+from typing import Optional, Dict, Tuple, Iterable
+
+
+class RowView:
+    """
+    Vista de solo lectura de algunas filas de un arreglo: la fila i de la vista es
+    data[rows[i]]. Indexar la vista solo lee las filas pedidas.
+    """
+
+    def __init__(self, data: np.ndarray, rows: np.ndarray) -> None:
+        self.data = data
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (len(self.rows),) + self.data.shape[1:]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.data.dtype
+
+    def __getitem__(self, key):
+        return self.data[self.rows[key]]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = self.data[np.asarray(self.rows)]
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+
+class RowStore:
+    """
+    Almacén de los arreglos por imagen del índice, compartido entre versiones.
+
+    Cada generación vive en `index_dir/store/<generación>/` con un archivo binario por
+    arreglo (<nombre>.bin, filas de tamaño fijo una tras otra). Las filas solo se agregan
+    al final: una versión del índice guarda cuántas filas había al publicarse y qué fila
+    física corresponde a cada una de sus imágenes, de modo que agregar filas no altera las
+    versiones ya publicadas. Las filas de imágenes eliminadas o modificadas simplemente dejan
+    de referenciarse; cuando dominan, el índice se compacta en una generación nueva.
+    """
+
+    DIR_NAME = 'store'
+
+    def __init__(self, index_dir: str, generation: str, layout: Dict[str, Tuple[str, Tuple[int, ...]]],
+                 rows: int = 0) -> None:
+        """
+        :param index_dir: Ruta absoluta a la carpeta del índice.
+        :param generation: Nombre de la generación.
+        :param layout: Arreglo -> (dtype, forma de cada fila).
+        :param rows: Filas válidas (las que había al publicar la versión que lo abre).
+        """
+        self.index_dir = index_dir
+        self.generation = generation
+        self.layout = {name: (np.dtype(dtype).str, tuple(shape)) for name, (dtype, shape) in layout.items()}
+        self.rows = rows
+        self.path = os.path.join(index_dir, self.DIR_NAME, generation)
+
+    @classmethod
+    def create(cls, index_dir: str, layout: Dict[str, Tuple[object, Tuple[int, ...]]]) -> 'RowStore':
+        """
+        Crea una generación nueva y vacía.
+        """
+        generation = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        store = cls(index_dir, generation, layout)
+        os.makedirs(store.path)
+        return store
+
+    @classmethod
+    def from_meta(cls, index_dir: str, meta: Dict) -> 'RowStore':
+        """
+        Abre el almacén descrito en los metadatos de una versión (ver to_meta).
+        """
+        layout = {name: (spec['dtype'], tuple(spec['shape'])) for name, spec in meta['layout'].items()}
+        return cls(index_dir, meta['generation'], layout, meta['rows'])
+
+    def to_meta(self) -> Dict:
+        return {
+            'generation': self.generation,
+            'rows': self.rows,
+            'layout': {name: {'dtype': dtype, 'shape': list(shape)} for name, (dtype, shape) in self.layout.items()},
+        }
+
+    def same_layout(self, layout: Dict[str, Tuple[object, Tuple[int, ...]]]) -> bool:
+        return self.layout == {name: (np.dtype(dtype).str, tuple(shape)) for name, (dtype, shape) in layout.items()}
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f'{name}.bin')
+
+    def _row_bytes(self, name: str) -> int:
+        dtype, shape = self.layout[name]
+        return np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Arreglo `name` con las filas válidas, en memoria mapeada de solo lectura.
+        """
+        dtype, shape = self.layout[name]
+        if self.rows == 0:
+            return np.empty((0,) + shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode='r', shape=(self.rows,) + shape)
+
+    def append(self, arrays: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Agrega filas al final de cada arreglo. Lo que hubiera en los archivos después de las
+        filas válidas (de una escritura interrumpida) se descarta antes.
+
+        :param arrays: Arreglo -> valores de las filas nuevas (todas con el mismo número de filas).
+        :return: Filas físicas asignadas.
+        """
+        count = len(next(iter(arrays.values()))) if arrays else 0
+        for name, (dtype, shape) in self.layout.items():
+            data = np.ascontiguousarray(arrays[name], dtype=dtype).reshape((count,) + shape)
+            file_path = self._file(name)
+            with open(file_path, 'r+b' if os.path.exists(file_path) else 'w+b') as f:
+                f.truncate(self.rows * self._row_bytes(name))
+                f.seek(0, os.SEEK_END)
+                f.write(data.tobytes())
+        rows = np.arange(self.rows, self.rows + count, dtype=np.int64)
+        self.rows += count
+        return rows
+
+    @classmethod
+    def remove_unused(cls, index_dir: str, keep: Iterable[Optional[str]]) -> None:
+        """
+        Elimina las generaciones que no están en keep.
+        """
+        store_dir = os.path.join(index_dir, cls.DIR_NAME)
+        if not os.path.isdir(store_dir):
+            return
+        keep = set(keep)
+        for entry in os.scandir(store_dir):
+            if entry.is_dir() and entry.name not in keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,100 @@
+import cv2
+import numpy as np
+from typing import Optional, Dict, Tuple
+
+from models.mosaico.tile_index import TileIndex
+
+# Lados (en píxeles) a los que se preescala cada imagen de la biblioteca
+ATLAS_SIZES: Tuple[int, ...] = (8, 16, 32, 64)
+
+
+def atlas_array_name(size: int) -> str:
+    """
+    Nombre del arreglo del índice que guarda el atlas de lado `size`.
+    """
+    return f'atlas_{size}'
+
+
+def scale_tiles(image: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Preescala una imagen de la biblioteca (BGR) a cada tamaño estándar del atlas.
+    Durante la indexación la imagen llega ya decodificada a DECODE_SIZE (los JPEG, reducidos
+    en el dominio DCT; ver decode_library_image), así que los tiles no son idénticos a
+    redimensionar la imagen original como en get_resized_tile, aunque la diferencia es mínima.
+
+    :return: Diccionario nombre del arreglo -> tile uint8 (size, size, 3).
+    """
+    return {
+        atlas_array_name(size): cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)
+        for size in ATLAS_SIZES
+    }
+
+
+class TileAtlas:
+    def __init__(self, index: TileIndex) -> None:
+        """
+        Acceso a los tiles preescalados guardados en el índice: un arreglo uint8
+        (N, size, size, 3) en memoria mapeada por cada tamaño de ATLAS_SIZES, alineado
+        con las filas del índice. Colocar un tile de tamaño estándar es una copia
+        desde el atlas en lugar de decodificar la imagen de la biblioteca.
+
+        :param index: Índice de la biblioteca.
+        """
+        self.atlases: Dict[int, np.ndarray] = {
+            size: index.arrays[atlas_array_name(size)]
+            for size in ATLAS_SIZES
+            if atlas_array_name(size) in index.arrays
+        }
+        # Tiles de tamaño no estándar ya reescalados en esta instancia: (fila, ancho, alto) -> tile
+        self._resized: Dict[Tuple[int, int, int], np.ndarray] = {}
+
+    @property
+    def available(self) -> bool:
+        return bool(self.atlases)
+
+    def source_size(self, width: int, height: int) -> Optional[int]:
+        """
+        Menor tamaño del atlas que cubre un bloque de width x height, o None si el bloque
+        es mayor que el tamaño más grande (en ese caso hay que decodificar la imagen).
+        """
+        for size in sorted(self.atlases):
+            if size >= width and size >= height:
+                return size
+        return None
+
+    def tile(self, row: int, width: int, height: int) -> Optional[np.ndarray]:
+        """
+        Tile de la fila `row` del índice con tamaño width x height (BGR).
+
+        Si el bloque tiene un tamaño estándar se devuelve la vista del atlas (reducida desde
+        la imagen decodificada a DECODE_SIZE, ver scale_tiles, no desde la original); si no,
+        se reduce desde el menor tamaño estándar que lo cubre.
+
+        :return: Arreglo uint8 (height, width, 3), o None si no hay un tamaño que lo cubra.
+        """
+        size = self.source_size(width, height)
+        if size is None:
+            return None
+        if width == size and height == size:
+            return self.atlases[size][row]
+
+        key = (row, width, height)
+        tile = self._resized.get(key)
+        if tile is None:
+            tile = cv2.resize(np.asarray(self.atlases[size][row]), (width, height), interpolation=cv2.INTER_AREA)
+            self._resized[key] = tile
+        return tile
+
+    def tiles(self, rows: np.ndarray, width: int, height: int) -> Optional[np.ndarray]:
+        """
+        Tiles de varias filas del índice con tamaño width x height (ver tile).
+
+        :param rows: Filas del índice.
+        :return: Arreglo uint8 (len(rows), height, width, 3), o None si no hay un tamaño que lo cubra.
+        """
+        size = self.source_size(width, height)
+        if size is None:
+            return None
+        if width == size and height == size:
+            return self.atlases[size][rows]
+        return np.stack([self.tile(int(row), width, height) for row in rows])
@@ -0,0 +1,249 @@
+import os
+import csv
+import json
+import time
+import uuid
+import pickle
+import shutil
+import numpy as np
+from threading import Lock
+from typing import Optional, Dict, List, Sequence, Set
+from scipy.spatial import cKDTree
+
+from models.mosaico.row_store import RowStore, RowView
+
+
+class TileIndex:
+    """
+    Índice binario de la biblioteca de imágenes del mosaico.
+
+    Cada versión del índice vive en su propia carpeta dentro de `index_dir`:
+        colors.npy  -> matriz float32 (N, 3) con el color promedio B, G, R de cada imagen
+        paths.npy   -> tabla de rutas (arreglo de cadenas de ancho fijo)
+        tree.pkl    -> KD-Tree serializado sobre colors (sin los duplicados, ver tree_rows)
+        meta.json   -> metadatos (formato, número de imágenes, fecha de creación, ...)
+        <nombre>.npy -> arreglos adicionales alineados con las filas (ver `arrays`)
+        store_rows.npy -> fila física en el almacén compartido de cada imagen (ver RowStore)
+    y el archivo `index_dir/CURRENT` apunta a la versión vigente. Los arreglos por imagen que
+    no dependen del resto de la biblioteca (atlas, descriptores, hashes) viven en un almacén
+    compartido entre versiones (`index_dir/store/`), al que una actualización solo agrega filas. Los arreglos se abren con memoria mapeada, así que
+    cargar el índice no depende del tamaño de la biblioteca, y una versión nueva se publica
+    reemplazando CURRENT de forma atómica.
+    """
+
+    FORMAT_VERSION = 2
+    # Formatos que se pueden abrir (el 1 no tiene almacén compartido)
+    SUPPORTED_FORMATS = (1, 2)
+    CURRENT_FILE = 'CURRENT'
+
+    def __init__(self, paths: np.ndarray, colors: np.ndarray, kdtree: Optional[cKDTree] = None,
+                 meta: Optional[Dict] = None, version: Optional[str] = None,
+                 arrays: Optional[Dict[str, np.ndarray]] = None, store: Optional[RowStore] = None,
+                 store_rows: Optional[np.ndarray] = None) -> None:
+        """
+        :param paths: Tabla de rutas, alineada con las filas de colors.
+        :param colors: Matriz float32 (N, 3) de colores promedio en BGR.
+        :param kdtree: KD-Tree sobre colors (filas tree_rows); si es None se construye.
+        :param meta: Metadatos adicionales.
+        :param version: Nombre de la versión en disco (None si aún no se ha guardado).
+        :param arrays: Arreglos adicionales por imagen (una fila por ruta), por nombre.
+        :param store: Almacén compartido con más arreglos por imagen (se agregan a `arrays`).
+        :param store_rows: Fila física en store de cada imagen.
+        """
+        self.paths = paths
+        self.colors = colors
+        self.meta = dict(meta or {})
+        self.version = version
+        self.arrays = dict(arrays or {})
+        self.store = store
+        self.store_rows = store_rows
+        if store is not None:
+            for name in store.layout:
+                self.arrays[name] = RowView(store.array(name), store_rows)
+        # Filas incluidas en los KD-Trees: si el índice marca duplicados ('duplicate_of'),
+        # solo las representantes; la posición i de un árbol corresponde a tree_rows[i]
+        if 'duplicate_of' in self.arrays:
+            duplicate_of = np.asarray(self.arrays['duplicate_of'])
+            self.tree_rows = np.flatnonzero(duplicate_of == np.arange(len(duplicate_of)))
+        else:
+            self.tree_rows = np.arange(len(paths))
+        self.kdtree = kdtree if kdtree is not None or len(colors) == 0 else cKDTree(colors[self.tree_rows])
+        # KD-Trees sobre arreglos de `arrays`, construidos al primer uso (ver tree)
+        self._trees: Dict[str, cKDTree] = {}
+        self._trees_lock = Lock()
+
+    @classmethod
+    def build(cls, image_paths: Sequence[str], colors, meta: Optional[Dict] = None,
+              arrays: Optional[Dict[str, np.ndarray]] = None, store: Optional[RowStore] = None,
+              store_rows: Optional[np.ndarray] = None) -> 'TileIndex':
+        """
+        Crea un índice en memoria a partir de las rutas y sus colores promedio.
+        """
+        paths = np.array(list(image_paths), dtype=str)
+        colors = np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+        return cls(paths, colors, meta=meta, arrays=arrays, store=store, store_rows=store_rows)
+
+    @classmethod
+    def from_csv(cls, csv_file: str) -> 'TileIndex':
+        """
+        Convierte el antiguo average_colors.csv (columnas image_path, B, G, R) a un índice.
+        """
+        image_paths: List[str] = []
+        colors: List[List[float]] = []
+        with open(csv_file, newline='') as f:
+            for row in csv.DictReader(f):
+                image_paths.append(row['image_path'])
+                colors.append([float(row['B']), float(row['G']), float(row['R'])])
+        return cls.build(image_paths, colors, meta={'source': os.path.basename(csv_file)})
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def path(self, index: int) -> str:
+        return str(self.paths[index])
+
+    def tree(self, name: str) -> cKDTree:
+        """
+        KD-Tree sobre el arreglo `name` (por ejemplo, un descriptor de color), con las mismas
+        filas que kdtree. Se construye la primera vez que se pide y se conserva mientras el
+        índice esté cargado.
+        """
+        with self._trees_lock:
+            tree = self._trees.get(name)
+            if tree is None:
+                tree = cKDTree(np.asarray(self.arrays[name][self.tree_rows], dtype=np.float32))
+                self._trees[name] = tree
+            return tree
+
+    def save(self, index_dir: str) -> str:
+        """
+        Escribe el índice como una nueva versión dentro de index_dir y la publica.
+        La versión que estaba publicada se conserva hasta la siguiente publicación, para que
+        quien acaba de leer CURRENT todavía pueda abrirla; las anteriores a ella se eliminan
+        (los procesos que aún las tengan mapeadas conservan sus datos hasta cerrarlas).
+
+        :return: Nombre de la versión creada.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        version_dir = os.path.join(index_dir, version)
+        os.makedirs(version_dir)
+
+        np.save(os.path.join(version_dir, 'colors.npy'), np.ascontiguousarray(self.colors, dtype=np.float32))
+        np.save(os.path.join(version_dir, 'paths.npy'), np.asarray(self.paths, dtype=str))
+        with open(os.path.join(version_dir, 'tree.pkl'), 'wb') as f:
+            pickle.dump(self.kdtree, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Los arreglos del almacén ya están en disco: la versión solo guarda sus filas
+        local_arrays = sorted(name for name in self.arrays if self.store is None or name not in self.store.layout)
+        for name in local_arrays:
+            np.save(os.path.join(version_dir, f'{name}.npy'), np.ascontiguousarray(self.arrays[name]))
+
+        meta = dict(self.meta)
+        meta.update({'format': self.FORMAT_VERSION, 'count': len(self), 'created': time.time(),
+                     'arrays': local_arrays})
+        if self.store is not None:
+            np.save(os.path.join(version_dir, 'store_rows.npy'), np.asarray(self.store_rows, dtype=np.int64))
+            meta['store'] = self.store.to_meta()
+        with open(os.path.join(version_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        # Publicar la versión de forma atómica
+        previous_version = self.current_version(index_dir)
+        tmp_file = os.path.join(index_dir, f'.{self.CURRENT_FILE}.{version}')
+        with open(tmp_file, 'w') as f:
+            f.write(version)
+        os.replace(tmp_file, os.path.join(index_dir, self.CURRENT_FILE))
+
+        self.meta = meta
+        self.version = version
+        self._remove_old_versions(index_dir, {version, previous_version})
+        return version
+
+    @classmethod
+    def current_version(cls, index_dir: str) -> Optional[str]:
+        """
+        Versión publicada en index_dir, o None si no hay índice.
+        """
+        try:
+            with open(os.path.join(index_dir, cls.CURRENT_FILE)) as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        return version if os.path.isdir(os.path.join(index_dir, version)) else None
+
+    @classmethod
+    def exists(cls, index_dir: str) -> bool:
+        return cls.current_version(index_dir) is not None
+
+    @classmethod
+    def load(cls, index_dir: str, version: Optional[str] = None) -> Optional['TileIndex']:
+        """
+        Abre la versión indicada (o la vigente) con los arreglos en memoria mapeada.
+        """
+        version = version or cls.current_version(index_dir)
+        if version is None:
+            return None
+        version_dir = os.path.join(index_dir, version)
+        with open(os.path.join(version_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') not in cls.SUPPORTED_FORMATS:
+            print(f"Formato de índice no compatible en {version_dir}.")
+            return None
+
+        colors = np.load(os.path.join(version_dir, 'colors.npy'), mmap_mode='r')
+        paths = np.load(os.path.join(version_dir, 'paths.npy'), mmap_mode='r')
+        with open(os.path.join(version_dir, 'tree.pkl'), 'rb') as f:
+            kdtree = pickle.load(f)
+        arrays = {
+            name: np.load(os.path.join(version_dir, f'{name}.npy'), mmap_mode='r')
+            for name in meta.get('arrays', [])
+        }
+        store, store_rows = None, None
+        if 'store' in meta:
+            store = RowStore.from_meta(index_dir, meta['store'])
+            store_rows = np.load(os.path.join(version_dir, 'store_rows.npy'), mmap_mode='r')
+        return cls(paths, colors, kdtree, meta, version, arrays, store, store_rows)
+
+    @staticmethod
+    def _store_generation(index_dir: str, version: Optional[str]) -> Optional[str]:
+        """
+        Generación del almacén que usa una versión (None si no usa ninguno).
+        """
+        try:
+            with open(os.path.join(index_dir, version, 'meta.json')) as f:
+                return json.load(f).get('store', {}).get('generation')
+        except (OSError, TypeError, ValueError):
+            return None
+
+    @classmethod
+    def _remove_old_versions(cls, index_dir: str, keep: Set[Optional[str]]) -> None:
+        """
+        Elimina las carpetas de versiones que no están en keep y las generaciones del
+        almacén que ninguna de ellas usa.
+        """
+        for entry in os.scandir(index_dir):
+            if entry.is_dir() and entry.name not in keep and entry.name != RowStore.DIR_NAME:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        RowStore.remove_unused(index_dir, {cls._store_generation(index_dir, version) for version in keep})
+
+
+# Índices cargados en este proceso: index_dir -> TileIndex
+_loaded_indexes: Dict[str, TileIndex] = {}
+_loaded_lock = Lock()
+
+
+def load_tile_index(index_dir: str) -> Optional[TileIndex]:
+    """
+    Devuelve el índice vigente de index_dir, cargándolo una sola vez por proceso.
+    Solo se vuelve a abrir cuando CURRENT apunta a una versión distinta.
+    """
+    version = TileIndex.current_version(index_dir)
+    if version is None:
+        return None
+    with _loaded_lock:
+        index = _loaded_indexes.get(index_dir)
+        if index is None or index.version != version:
+            index = TileIndex.load(index_dir, version)
+            if index is not None:
+                _loaded_indexes[index_dir] = index
+        return index
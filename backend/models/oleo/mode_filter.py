@@ -0,0 +1,96 @@
+import numpy as np
+from utils.jit import njit
+
+
+@njit(cache=True, nogil=True)
+def _best_bin(counts):
+    """
+    Bin with the highest count; ties go to the lowest bin index (like np.unique + argmax).
+    """
+    best = 0
+    for c in range(1, counts.shape[0]):
+        if counts[c] > counts[best]:
+            best = c
+    return best
+
+
+@njit(cache=True, nogil=True)
+def sliding_mode(labels, pixels, block_size, num_bins):
+    """
+    Mode filter with a sliding histogram (Huang): for each output row the histogram of
+    the first window is built once, and then updated by removing the column that leaves
+    the window and adding the one that enters, so each step costs O(block_size)
+    instead of O(block_size²).
+
+    The most frequent bin is kept up to date incrementally; the histogram is only
+    rescanned when the current mode loses pixels.
+
+    :param labels: int32 array of shape (rows + 2 * pad, cols + 2 * pad) with the bin of each
+                   pixel, where pad = block_size // 2.
+    :param pixels: uint8 array of shape (rows + 2 * pad, cols + 2 * pad, 3) with the colors.
+    :param block_size: Side of the window.
+    :param num_bins: Number of bins (labels are in [0, num_bins)).
+    :return: uint8 array of shape (rows, cols, 3) with, for each pixel, the mean color
+             of the pixels of its window that fall in the most frequent bin.
+    """
+    pad = block_size // 2
+    rows = labels.shape[0] - 2 * pad
+    cols = labels.shape[1] - 2 * pad
+    output = np.empty((rows, cols, 3), dtype=np.uint8)
+    counts = np.zeros(num_bins, dtype=np.int32)
+    sums = np.zeros((num_bins, 3), dtype=np.int64)
+
+    for i in range(rows):
+        counts[:] = 0
+        sums[:] = 0
+        for y in range(i, i + block_size):
+            for x in range(block_size):
+                label = labels[y, x]
+                counts[label] += 1
+                for ch in range(3):
+                    sums[label, ch] += pixels[y, x, ch]
+        best = _best_bin(counts)
+
+        for j in range(cols):
+            if j > 0:
+                # Slide the window one column to the right
+                best_count = counts[best]
+                old_x = j - 1
+                new_x = j + block_size - 1
+                for y in range(i, i + block_size):
+                    label = labels[y, old_x]
+                    counts[label] -= 1
+                    for ch in range(3):
+                        sums[label, ch] -= pixels[y, old_x, ch]
+                for y in range(i, i + block_size):
+                    label = labels[y, new_x]
+                    counts[label] += 1
+                    for ch in range(3):
+                        sums[label, ch] += pixels[y, new_x, ch]
+
+                if counts[best] < best_count:
+                    best = _best_bin(counts)
+                else:
+                    # Only the bins that received pixels can overtake the current mode
+                    for y in range(i, i + block_size):
+                        label = labels[y, new_x]
+                        if counts[label] > counts[best] or (counts[label] == counts[best] and label < best):
+                            best = label
+
+            count = counts[best]
+            for ch in range(3):
+                output[i, j, ch] = (2 * sums[best, ch] + count) // (2 * count)
+
+    return output
+
+
+def quantize_labels(pixels, levels):
+    """
+    Bin of each pixel in a uniform quantization of the RGB cube with `levels` levels per channel.
+
+    :param pixels: uint8 array of shape (..., 3).
+    :param levels: Levels per channel (1 to 256).
+    :return: int32 array of shape (...) with values in [0, levels³).
+    """
+    quantized = (pixels.astype(np.int32) * levels) >> 8
+    return (quantized[..., 0] * levels + quantized[..., 1]) * levels + quantized[..., 2]
@@ -1,44 +1,101 @@
 import numpy as np
 from PIL import Image
-from multiprocessing import Pool, cpu_count
+from worker_pool import worker_pool
 from models.base_filter import BaseFilter
 from models.filters.grayscale_filter import GrayscaleFilter
 from models.convolutionFilters.filters.blur_filter import BlurFilter
+from models.oleo.mode_filter import sliding_mode, quantize_labels
+from models.oleo.palette import PaletteQuantizer
 
 class OleoFilter(BaseFilter):
+    # Default quantization levels per channel for the histogram mode (8³ = 512 bins)
+    DEFAULT_LEVELS = 8
+    MAX_LEVELS = 32
+    # Bands per worker for the exact mode
+    EXACT_BANDS_PER_WORKER = 4
+
+    def __init__(self, image, num_processes=None):
+        """
+        :param image: PIL image.
+        :param num_processes: Workers to split the bands across; defaults to the shared pool size.
+        """
+        super().__init__(image)
+        self.num_processes = num_processes
+
+    @staticmethod
+    def process_histogram_band(args):
+        """
+        Processes a band of output rows with the sliding-histogram mode filter over
+        the RGB cube quantized to `levels` levels per channel. `band` holds the padded
+        rows of the band, read straight from shared memory by the worker.
+        """
+        band, block_size, levels = args
+        labels = quantize_labels(band, levels)
+        return sliding_mode(labels, band, block_size, levels ** 3)
+
     @staticmethod
-    def process_pixel_row(args):
-        image_array_padded, i, width, block_size = args
+    def process_palette_band(args):
+        """
+        Processes a band of output rows with the sliding-histogram mode filter over the
+        palette indices. Every pixel is replaced by its palette color first, so the mode
+        color of each window is a palette color.
+        """
+        band, block_size, quantizer = args
+        labels = quantizer.labels(band)
+        return sliding_mode(labels, quantizer.palette[labels], block_size, len(quantizer.palette))
+
+    @staticmethod
+    def process_exact_band(args):
+        """
+        Processes a band of output rows with the exact 24-bit color mode. `band` holds the
+        band's rows plus the block_size // 2 halo rows above and below, read straight from
+        shared memory by the worker; the result is written back at the band's own rows,
+        so the output does not depend on the order in which bands finish.
+        """
+        band, block_size = args
         pad_size = block_size // 2
-        row_result = []
-        for j in range(width):
-            # Extract the block centered at (i, j)
-            block = image_array_padded[i:i+block_size, j:j+block_size, :]
-            block_flat = block.reshape(-1, block.shape[2])
-            # Convert RGB colors to single integers for easy counting
-            colors = (block_flat[:, 0].astype(np.int32) << 16) + \
-                     (block_flat[:, 1].astype(np.int32) << 8) + \
-                      block_flat[:, 2].astype(np.int32)
-            unique, counts = np.unique(colors, return_counts=True)
-            most_common_color = unique[np.argmax(counts)]
-            # Convert back to RGB
-            r = (most_common_color >> 16) & 0xFF
-            g = (most_common_color >> 8) & 0xFF
-            b = most_common_color & 0xFF
-            row_result.append((r, g, b))
-        return row_result
+        rows = band.shape[0] - 2 * pad_size
+        width = band.shape[1] - 2 * pad_size
+        # Convert RGB colors to single integers for easy counting, once per band
+        colors = (band[..., 0].astype(np.int32) << 16) + \
+                 (band[..., 1].astype(np.int32) << 8) + \
+                  band[..., 2].astype(np.int32)
+        band_result = np.empty((rows, width, 3), dtype=np.uint8)
+        for i in range(rows):
+            for j in range(width):
+                # Count the colors of the block centered at (i, j)
+                unique, counts = np.unique(colors[i:i+block_size, j:j+block_size], return_counts=True)
+                most_common_color = unique[np.argmax(counts)]
+                # Convert back to RGB
+                band_result[i, j] = ((most_common_color >> 16) & 0xFF,
+                                     (most_common_color >> 8) & 0xFF,
+                                     most_common_color & 0xFF)
+        return band_result
 
-    def apply_filter(self, color, blur, block_size):
+    def apply_filter(self, color, blur, block_size, exact=False, levels=DEFAULT_LEVELS,
+                     palette_size=None, palette_method='median-cut'):
         """
         Applies the filter by assigning to each pixel the most frequent color in its block of block_size x block_size pixels.
+
+        :param exact: If True, counts exact 24-bit colors (slow). Otherwise colors are grouped
+                      into a quantized RGB cube and each pixel takes the mean color of the most
+                      frequent group in its block.
+        :param levels: Quantization levels per channel when exact is False (2 to MAX_LEVELS).
+        :param palette_size: If given, the image is first reduced to a palette of this many colors
+                             (see PaletteQuantizer) and the mode is searched over palette indices.
+        :param palette_method: 'median-cut' or 'kmeans'.
         """
+        if not exact and not 2 <= levels <= self.MAX_LEVELS:
+            raise ValueError(f"Los niveles de cuantización deben estar entre 2 y {self.MAX_LEVELS}.")
+        if exact and palette_size:
+            raise ValueError("La moda exacta no se puede combinar con una paleta.")
+
         if not color:
             grayscale_filter = GrayscaleFilter(self.image)
             self.image = grayscale_filter.apply_filter()
         
         # Convert the image to a NumPy array
         image_array = np.array(self.image, dtype=np.uint8)
-        height, width = image_array.shape[:2]
         
         # Pad the image to handle borders
         pad_size = block_size // 2
@@ -48,20 +105,28 @@ class OleoFilter(BaseFilter):
             mode='edge'
         )
         
-        # Prepare arguments for multiprocessing
-        args_list = []
-        for i in range(height):
-            args_list.append((image_array_padded, i, width, block_size))
-        
-        # Process rows with multiprocessing
-        num_workers = min(cpu_count(), len(args_list))
-        print(f"Using {num_workers} CPU cores for multiprocessing.")
-        
-        output_array = np.zeros_like(image_array)
-        
-        with Pool(processes=num_workers) as pool:
-            for i, row_result in enumerate(pool.imap_unordered(OleoFilter.process_pixel_row, args_list)):
-                output_array[i, :, :] = row_result
+        # Process bands of rows: the execution planner decides whether they run inline,
+        # on threads or on the shared worker pool, where the padded image is placed in
+        # shared memory once and each band writes its rows into the shared output
+        if exact:
+            # Several bands per worker balance the load, since the cost depends on the content
+            workers = self.num_processes or worker_pool.size
+            output_array = self._map_bands(
+                OleoFilter.process_exact_band, image_array_padded, image_array.shape, np.uint8,
+                pad_size, (block_size,), block_size, 'mode', workers * self.EXACT_BANDS_PER_WORKER
+            )
+        elif palette_size:
+            # The palette is computed once on a sample; each band only applies the lookup table
+            quantizer = PaletteQuantizer(palette_size, palette_method).fit(image_array)
+            output_array = self._map_bands(
+                OleoFilter.process_palette_band, image_array_padded, image_array.shape, np.uint8,
+                pad_size, (block_size, quantizer), block_size, 'histogram'
+            )
+        else:
+            output_array = self._map_bands(
+                OleoFilter.process_histogram_band, image_array_padded, image_array.shape, np.uint8,
+                pad_size, (block_size, levels), block_size, 'histogram'
+            )
         
         # Convert the NumPy array back to a PIL image
         processed_image = Image.fromarray(output_array, mode='RGB')
@@ -0,0 +1,126 @@
+import numpy as np
+
+PALETTE_METHODS = ('median-cut', 'kmeans')
+
+
+class PaletteQuantizer:
+    def __init__(self, num_colors=32, method='median-cut', sample_size=20000, lut_bits=5,
+                 kmeans_iterations=8, seed=0):
+        """
+        Reduces an image to a palette of `num_colors` colors. The palette is computed
+        over a random sample of pixels (median cut, optionally refined with k-means),
+        and each pixel is then mapped to its nearest palette color through a lookup
+        table over the RGB cube reduced to `lut_bits` bits per channel.
+
+        :param num_colors: Number of colors in the palette (2 to 256).
+        :param method: 'median-cut' or 'kmeans' (median cut refined with k-means).
+        :param sample_size: Maximum number of pixels used to compute the palette.
+        :param lut_bits: Bits per channel of the lookup table (2^(3 * lut_bits) entries).
+        :param kmeans_iterations: Lloyd iterations when method is 'kmeans'.
+        :param seed: Seed for the pixel sample.
+        """
+        if not 2 <= num_colors <= 256:
+            raise ValueError("El tamaño de la paleta debe estar entre 2 y 256.")
+        if method not in PALETTE_METHODS:
+            raise ValueError(f"El método de paleta debe ser uno de: {', '.join(PALETTE_METHODS)}.")
+        self.num_colors = num_colors
+        self.method = method
+        self.sample_size = sample_size
+        self.lut_bits = lut_bits
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.palette = None
+        self.lut = None
+
+    def fit(self, pixels):
+        """
+        Computes the palette and the lookup table for the given image.
+
+        :param pixels: uint8 array of shape (..., 3).
+        :return: self
+        """
+        colors = pixels.reshape(-1, 3)
+        if colors.shape[0] > self.sample_size:
+            rng = np.random.default_rng(self.seed)
+            colors = colors[rng.choice(colors.shape[0], self.sample_size, replace=False)]
+
+        palette = self._median_cut(colors.astype(np.float64))
+        if self.method == 'kmeans':
+            palette = self._kmeans(colors.astype(np.float64), palette)
+
+        self.palette = np.clip(np.rint(palette), 0, 255).astype(np.uint8)
+        self.lut = self._build_lut(self.palette)
+        return self
+
+    def labels(self, pixels):
+        """
+        Index of the nearest palette color for each pixel.
+
+        :param pixels: uint8 array of shape (..., 3).
+        :return: int32 array of shape (...).
+        """
+        shift = 8 - self.lut_bits
+        cells = pixels.astype(np.int32) >> shift
+        index = (cells[..., 0] << (2 * self.lut_bits)) | (cells[..., 1] << self.lut_bits) | cells[..., 2]
+        return self.lut[index].astype(np.int32)
+
+    def apply(self, pixels):
+        """
+        Maps each pixel to its nearest palette color.
+        """
+        return self.palette[self.labels(pixels)]
+
+    def _median_cut(self, colors):
+        """
+        Splits the color box with the widest channel at its median until there are
+        num_colors boxes (or no box can be split); the palette is the mean of each box.
+        """
+        boxes = [colors]
+        while len(boxes) < self.num_colors:
+            ranges = [np.ptp(box, axis=0).max() if len(box) > 1 else -1 for box in boxes]
+            widest = int(np.argmax(ranges))
+            if ranges[widest] <= 0:
+                break
+            box = boxes.pop(widest)
+            channel = int(np.argmax(np.ptp(box, axis=0)))
+            box = box[np.argsort(box[:, channel], kind='stable')]
+            middle = len(box) // 2
+            boxes.extend([box[:middle], box[middle:]])
+        return np.array([box.mean(axis=0) for box in boxes])
+
+    def _kmeans(self, colors, palette):
+        """
+        Refines the palette with a few Lloyd iterations over the sample.
+        """
+        for _ in range(self.kmeans_iterations):
+            labels = self._nearest(colors, palette)
+            sums = np.zeros_like(palette)
+            np.add.at(sums, labels, colors)
+            counts = np.bincount(labels, minlength=len(palette))
+            # Empty clusters keep their previous center
+            filled = counts > 0
+            palette[filled] = sums[filled] / counts[filled, np.newaxis]
+        return palette
+
+    def _build_lut(self, palette):
+        """
+        Nearest palette index for the center of each cell of the reduced RGB cube.
+        """
+        size = 1 << self.lut_bits
+        step = 256 // size
+        centers = np.arange(size) * step + (step - 1) / 2
+        cube = np.stack(np.meshgrid(centers, centers, centers, indexing='ij'), axis=-1).reshape(-1, 3)
+        return self._nearest(cube, palette.astype(np.float64)).astype(np.uint8)
+
+    @staticmethod
+    def _nearest(colors, palette, chunk_size=8192):
+        """
+        Index of the nearest palette color (squared Euclidean distance), computed in chunks.
+        """
+        labels = np.empty(len(colors), dtype=np.intp)
+        palette_norms = (palette ** 2).sum(axis=1)
+        for start in range(0, len(colors), chunk_size):
+            chunk = colors[start:start + chunk_size]
+            distances = palette_norms - 2 * chunk @ palette.T
+            labels[start:start + chunk_size] = np.argmin(distances, axis=1)
+        return labels
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def grid_view(image: np.ndarray, grid_rows: int, grid_cols: int) -> np.ndarray:
+    """
+    Vista de una imagen (alto, ancho, canales) como cuadrícula de celdas
+    (grid_rows, grid_cols, alto de celda, ancho de celda, canales), sin copiar.
+    Escribir en la vista escribe directamente en la imagen.
+
+    :param image: Arreglo contiguo cuyo alto y ancho son múltiplos de la cuadrícula.
+    """
+    height, width, channels = image.shape
+    cells = image.reshape(grid_rows, height // grid_rows, grid_cols, width // grid_cols, channels)
+    return cells.transpose(0, 2, 1, 3, 4)
+
+
+def assemble_grid(variants: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """
+    Arma la imagen de la cuadrícula en una sola operación: la celda (fila, columna) es
+    variants[indices[fila, columna]]. Los tiles se copian desde las variantes directamente a
+    su posición en la imagen final, sin crear una imagen por celda.
+
+    :param variants: Arreglo uint8 (n, alto de celda, ancho de celda, canales) con las variantes.
+    :param indices: Arreglo entero (grid_rows, grid_cols) con la variante de cada celda.
+    :return: Arreglo uint8 (grid_rows * alto de celda, grid_cols * ancho de celda, canales).
+    """
+    grid_rows, grid_cols = indices.shape
+    _, cell_height, cell_width, channels = variants.shape
+    result = np.empty((grid_rows * cell_height, grid_cols * cell_width, channels), dtype=variants.dtype)
+    # Los índices ya son válidos; mode='clip' evita la copia intermedia que usa mode='raise'
+    np.take(variants, indices, axis=0, out=grid_view(result, grid_rows, grid_cols), mode='clip')
+    return result
@@ -1,5 +1,6 @@
 from PIL import Image
 from models.base_filter import BaseFilter
+from models.recursiveImage.grid_assembly import grid_view
 import numpy as np
 
 class RecursiveImagesColor(BaseFilter):
@@ -52,9 +53,6 @@ class RecursiveImagesColor(BaseFilter):
 
         :return: Imagen procesada.
         """
-        # Crear una imagen vacía para la cuadrícula
-        recursive_image = Image.new("RGB", (self.width, self.height))
-
         # Imagen escalada al tamaño total
         image_upscaled = self.image.resize((self.width, self.height))
 
@@ -81,37 +79,14 @@ class RecursiveImagesColor(BaseFilter):
         # Convertir la imagen redimensionada a un arreglo NumPy
         img_resize_array = np.array(img_resize, dtype=np.uint8)
 
-        # Aplicar el filtro en cada celda
-        for row in range(self.grid_rows):
-            for col in range(self.grid_cols):
-                x_start = col * self.grid_width
-                y_start = row * self.grid_height
-
-                # Obtener el promedio de color para esta celda
-                r_val, g_val, b_val = average_colors[row, col]
-
-                # Aplicar el AND lógico con los valores de color promedio
-                processed_block = self._apply_and_filter(img_resize_array, r_val, g_val, b_val)
-
-                # Convertir el arreglo procesado a imagen PIL
-                processed_image = Image.fromarray(processed_block, mode='RGB')
-
-                # Pegar la imagen procesada en la posición correspondiente
-                recursive_image.paste(processed_image, (x_start, y_start))
-
-        return recursive_image
-
-    @staticmethod
-    def _apply_and_filter(block, r_val, g_val, b_val):
-        """
-        Aplica el filtro Mica a un bloque de la imagen usando operaciones vectorizadas.
-        """
-        # Crear una copia del bloque para no modificar el original
-        processed_block = block.copy()
-
-        # Aplicar el AND lógico con los valores proporcionados
-        processed_block[:, :, 0] = processed_block[:, :, 0] & r_val
-        processed_block[:, :, 1] = processed_block[:, :, 1] & g_val
-        processed_block[:, :, 2] = processed_block[:, :, 2] & b_val
+        # Aplicar el AND lógico de cada celda con su color promedio en una sola operación:
+        # la miniatura (alto, ancho, 3) se combina por broadcasting con los colores
+        # (grid_rows, grid_cols, 1, 1, 3) y se escribe directamente en su celda
+        recursive_array = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        np.bitwise_and(
+            img_resize_array,
+            average_colors[:, :, np.newaxis, np.newaxis, :],
+            out=grid_view(recursive_array, self.grid_rows, self.grid_cols)
+        )
 
-        return processed_block
+        return Image.fromarray(recursive_array, mode='RGB')
@@ -1,6 +1,7 @@
 from PIL import Image
 from models.base_filter import BaseFilter
 from models.filters.grayscale_filter import GrayscaleFilter
+from models.recursiveImage.grid_assembly import assemble_grid
 import numpy as np
 
 class RecursiveImagesGray(BaseFilter):
@@ -65,10 +66,10 @@ class RecursiveImagesGray(BaseFilter):
         img_resize = self.image.resize((self.grid_width, self.grid_height))
         
         # Aplicar filtro de escala de grises
-        img_rescaled = GrayscaleFilter(img_resize).apply_filter()
+        img_rescaled = GrayscaleFilter(img_resize).apply_filter(output_mode='L')
         
         # Convertir la imagen a un arreglo NumPy para operaciones eficientes
-        img_array = np.array(img_rescaled.convert('L'), dtype=np.float32)
+        img_array = np.array(img_rescaled, dtype=np.float32)
         
         # Calcular el brillo promedio de la imagen original
         brillo_promedio = img_array.mean()
@@ -141,20 +142,8 @@ class RecursiveImagesGray(BaseFilter):
         # Encontrar el índice del valor mínimo
         idx_min = diff.argmin(axis=2)  # Shape: (grid_rows, grid_cols)
 
-        # Obtener los valores de brillo seleccionados
-        selected_gray_values = gray_keys[idx_min]  # Shape: (grid_rows, grid_cols)
-
-        # Crear una imagen vacía para la cuadrícula
-        recursive_image = Image.new("RGB", (self.width, self.height))
-
-        # Pegar las imágenes correspondientes en la posición adecuada
-        for row in range(self.grid_rows):
-            for col in range(self.grid_cols):
-                x_start = col * self.grid_width
-                y_start = row * self.grid_height
-                grayscale_value = selected_gray_values[row, col]
-                gray_image = gray_variations[grayscale_value]
-                recursive_image.paste(gray_image, (x_start, y_start))
-
-        return recursive_image
+        # Variantes apiladas en el mismo orden que gray_keys: (num_variations, alto, ancho, 3)
+        variants = np.stack([np.asarray(gray_variations[key]) for key in gray_keys])
 
+        # Armar la cuadrícula tomando de las variantes la seleccionada para cada celda
+        return Image.fromarray(assemble_grid(variants, idx_min), mode='RGB')
@@ -18,8 +18,10 @@ from models.dithering.random_dithering_filter import RandomDitheringFilter
 from models.dithering.clustered_dithering import ClusteredDitheringFilter
 from models.dithering.dispersed_dithering import DispersedDitheringFilter
 from models.dithering.floyd_steinberg import FloydSteinbergDitheringFilter
+from models.dithering.error_diffusion import ErrorDiffusionDitheringFilter
 from models.oleo.oleo_filter import OleoFilter
 from models.erosion.min_max import MinMaxKernelFilter
+from models.erosion.morphology import MorphologyFilter
 from models.mosaico.mosaic_filter import MosaicFilter
 from models.filters.resize import ResizeFilter
 
@@ -114,22 +116,38 @@ class ImageService:
         dispersed_dithering_filter = DispersedDitheringFilter(self.image)
         return dispersed_dithering_filter.apply_filter()
 
-    def apply_floyd_steinberg_dithering_filter(self):
-        floyd_steinberg_dithering_filter = FloydSteinbergDitheringFilter(self.image)
-        return floyd_steinberg_dithering_filter.apply_filter()
+    def apply_floyd_steinberg_dithering_filter(self, kernel='floyd-steinberg', serpentine=False):
+        if kernel == 'floyd-steinberg' and not serpentine:
+            floyd_steinberg_dithering_filter = FloydSteinbergDitheringFilter(self.image)
+            return floyd_steinberg_dithering_filter.apply_filter()
+        error_diffusion_filter = ErrorDiffusionDitheringFilter(self.image, kernel, serpentine)
+        return error_diffusion_filter.apply_filter()
 
-    def apply_oleo_filter(self, color, blur, block_size):
+    def apply_oleo_filter(self, color, blur, block_size, exact=False, levels=OleoFilter.DEFAULT_LEVELS,
+                          palette_size=None, palette_method='median-cut'):
         oleo_filter = OleoFilter(self.image)
-        return oleo_filter.apply_filter(color, blur, block_size)
+        return oleo_filter.apply_filter(color, blur, block_size, exact, levels, palette_size, palette_method)
     
     def apply_min_max_filter(self, radius, mode):
         min_max_filter = MinMaxKernelFilter(self.image)
         return min_max_filter.apply_filter(radius, mode)
 
+    def apply_morphology_filter(self, operation, radius, iterations, shape, color):
+        morphology_filter = MorphologyFilter(self.image)
+        return morphology_filter.apply_filter(operation, radius, iterations, shape, color)
 
-    def apply_mosaic_filter(self, block_width, block_height, upscale_factor):
+
+    def apply_mosaic_filter(self, block_width, block_height, upscale_factor, match='bgr', candidates=8,
+                            repetition_penalty=0.0):
+        mosaic_filter = MosaicFilter(self.image)
+        return mosaic_filter.apply_filter(block_width, block_height, upscale_factor, match, candidates,
+                                          repetition_penalty)
+
+    def write_mosaic_tiff(self, path, block_width, block_height, upscale_factor, match='bgr', candidates=8,
+                          repetition_penalty=0.0):
         mosaic_filter = MosaicFilter(self.image)
-        return mosaic_filter.apply_filter(block_width, block_height, upscale_factor)
+        return mosaic_filter.write_tiff(path, block_width, block_height, upscale_factor, match, candidates,
+                                        repetition_penalty)
 
     def remove_red_watermark(self, sensitivity=100):
         filter = RemoveRedWatermarkFilter(self.image, sensitivity)
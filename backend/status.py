@@ -1,9 +1,24 @@
+import time
+import uuid
 from threading import Lock
+from typing import Optional, Dict
 
 class PreprocessingStatus:
     def __init__(self):
         self.lock = Lock()
         self.is_preprocessing = False
+        # Datos del último trabajo de indexación de la biblioteca
+        self.job_id: Optional[str] = None
+        self.state: str = 'idle'  # idle, running, completed, failed
+        self.processed = 0
+        self.total = 0
+        self.corrupted = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.stats: Dict[str, int] = {}
+        # Trabajo en espera de que termine el actual (ver queue_job)
+        self.queued_job_id: Optional[str] = None
 
     def set_preprocessing(self, status: bool):
         with self.lock:
@@ -13,5 +28,74 @@ class PreprocessingStatus:
         with self.lock:
             return self.is_preprocessing
 
+    def queue_job(self) -> str:
+        """
+        Registra un trabajo que empezará cuando termine el actual y devuelve su identificador.
+        """
+        with self.lock:
+            self.queued_job_id = uuid.uuid4().hex
+            return self.queued_job_id
+
+    def start_job(self, job_id: Optional[str] = None) -> str:
+        """
+        Registra el inicio de un trabajo de indexación y devuelve su identificador.
+
+        :param job_id: Identificador de un trabajo en espera (ver queue_job); si es None se genera uno.
+        """
+        with self.lock:
+            if job_id is not None and job_id == self.queued_job_id:
+                self.queued_job_id = None
+            self.job_id = job_id or uuid.uuid4().hex
+            self.state = 'running'
+            self.is_preprocessing = True
+            self.processed = 0
+            self.total = 0
+            self.corrupted = 0
+            self.started_at = time.time()
+            self.finished_at = None
+            self.error = None
+            self.stats = {}
+            return self.job_id
+
+    def set_progress(self, processed: int, total: int, corrupted: int):
+        with self.lock:
+            self.processed = processed
+            self.total = total
+            self.corrupted = corrupted
+
+    def finish_job(self, stats: Optional[Dict[str, int]] = None, error: Optional[str] = None):
+        with self.lock:
+            self.state = 'failed' if error else 'completed'
+            self.is_preprocessing = False
+            self.finished_at = time.time()
+            self.error = error
+            self.stats = dict(stats or {})
+
+    def get_job(self) -> Optional[Dict]:
+        """
+        Estado del último trabajo: progreso, imágenes por segundo y tiempo restante estimado (segundos).
+        """
+        with self.lock:
+            if self.job_id is None:
+                return None
+            end = self.finished_at or time.time()
+            elapsed = max(end - self.started_at, 1e-9)
+            throughput = self.processed / elapsed
+            remaining = self.total - self.processed
+            eta = remaining / throughput if self.state == 'running' and throughput > 0 else None
+            return {
+                'job_id': self.job_id,
+                'state': self.state,
+                'processed': self.processed,
+                'total': self.total,
+                'corrupted': self.corrupted,
+                'elapsed': round(elapsed, 3),
+                'throughput': round(throughput, 3),
+                'eta': round(eta, 3) if eta is not None else None,
+                'error': self.error,
+                'stats': dict(self.stats),
+                'queued_job_id': self.queued_job_id,
+            }
+
 # Instancia global para ser utilizada en toda la aplicación
 preprocessing_status = PreprocessingStatus()
@@ -0,0 +1,43 @@
+"""
+Compilación JIT opcional con numba.
+
+Si numba está instalado, `njit` y `prange` son los de numba; si no, `njit` devuelve la
+función sin modificar (se ejecuta en Python puro) y `prange` es `range`. Así los motores
+que lo usan tienen un único código fuente y siempre hay una ruta de respaldo.
+"""
+try:
+    import numba
+    from numba import prange
+
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - depende del entorno
+    numba = None
+    prange = range
+
+    NUMBA_AVAILABLE = False
+
+
+def njit(*args, **kwargs):
+    """
+    Equivalente a numba.njit (acepta las mismas opciones). Sin numba, la función
+    decorada se devuelve tal cual y conserva `py_func` apuntando a sí misma,
+    igual que las funciones compiladas.
+    """
+    if NUMBA_AVAILABLE:
+        return numba.njit(*args, **kwargs)
+
+    def decorator(func):
+        func.py_func = func
+        return func
+
+    # Uso sin paréntesis: @njit
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return decorator(args[0])
+    return decorator
+
+
+def num_threads():
+    """
+    Hilos disponibles para los bucles prange (1 sin numba).
+    """
+    return numba.get_num_threads() if NUMBA_AVAILABLE else 1
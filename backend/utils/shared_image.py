@@ -0,0 +1,160 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class SharedImageBuffer:
+    def __init__(self, shape, dtype, name=None):
+        """
+        Arreglo NumPy respaldado por memoria compartida (multiprocessing.shared_memory).
+        El proceso principal lo crea y los workers se conectan a él por nombre,
+        de modo que las imágenes no se serializan al enviar tareas al pool.
+
+        :param shape: Forma del arreglo.
+        :param dtype: Tipo de dato del arreglo.
+        :param name: Nombre de un segmento existente. Si es None se crea uno nuevo.
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._owner = name is None
+
+        if self._owner:
+            size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            try:
+                # Python >= 3.13: no registrar el segmento en el resource tracker del worker
+                self._shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                self._shm = shared_memory.SharedMemory(name=name)
+
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    @classmethod
+    def from_array(cls, array):
+        """
+        Crea un buffer compartido con una copia del arreglo dado.
+        """
+        buffer = cls(array.shape, array.dtype)
+        buffer.array[...] = array
+        return buffer
+
+    @classmethod
+    def attach(cls, handle):
+        """
+        Se conecta a un buffer existente a partir de su handle (ver `handle`).
+        """
+        name, shape, dtype = handle
+        return cls(shape, dtype, name=name)
+
+    @property
+    def handle(self):
+        """
+        Tupla serializable (nombre, forma, dtype) que identifica al buffer.
+        """
+        return self._shm.name, self.shape, self.dtype.str
+
+    def close(self):
+        """
+        Libera la vista local. El propietario además elimina el segmento.
+        """
+        self.array = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def process_shared_band(args):
+    """
+    Tarea genérica para el pool: procesa una franja de filas leyendo la entrada
+    y escribiendo la salida directamente en memoria compartida.
+
+    :param args: Tupla con:
+                 - process_block: Función que recibe el bloque (o (bloque, *extra)) y devuelve el bloque procesado.
+                 - src_handle: Handle del buffer de entrada (con `halo` filas de padding arriba y abajo).
+                 - dst_handle: Handle del buffer de salida.
+                 - start, end: Filas de salida que corresponden a esta franja.
+                 - halo: Filas extra de la entrada necesarias a cada lado.
+                 - extra: Tupla de argumentos adicionales para process_block, o None.
+    :return: Tupla (start, end).
+    """
+    process_block, src_handle, dst_handle, start, end, halo, extra = args
+    src = SharedImageBuffer.attach(src_handle)
+    dst = SharedImageBuffer.attach(dst_handle)
+    try:
+        _process_band(process_block, src.array, dst.array, start, end, halo, extra)
+    finally:
+        src.close()
+        dst.close()
+    return start, end
+
+
+def _process_band(process_block, src, dst, start, end, halo, extra):
+    # Las vistas sobre la memoria compartida viven solo dentro de esta función,
+    # así el segmento puede cerrarse al volver
+    block = src[start:end + 2 * halo]
+    dst[start:end] = process_block(block) if extra is None else process_block((block,) + extra)
+
+
+def split_rows(height, num_bands):
+    """
+    Divide `height` filas en franjas contiguas; la última incluye las filas restantes.
+
+    :return: Lista de tuplas (start, end).
+    """
+    num_bands = max(1, min(num_bands, height))
+    band_size = height // num_bands
+    bands = []
+    for i in range(num_bands):
+        start = i * band_size
+        end = (i + 1) * band_size if i != num_bands - 1 else height
+        bands.append((start, end))
+    return bands
+
+
+def map_shared_bands(pool, process_block, src_array, output_shape, output_dtype, num_bands, halo=0, extra=None):
+    """
+    Copia la entrada a memoria compartida una sola vez, reparte franjas de filas
+    entre los workers del pool y devuelve la salida ensamblada en su lugar.
+
+    :param pool: Pool (o WorkerPool) con método map.
+    :param process_block: Función del worker (debe ser serializable por referencia).
+    :param src_array: Arreglo de entrada; si halo > 0 debe incluir `halo` filas de padding arriba y abajo.
+    :param output_shape: Forma del arreglo de salida.
+    :param output_dtype: Tipo de dato del arreglo de salida.
+    :param num_bands: Número de franjas en que se divide la salida.
+    :param halo: Filas de padding de la entrada a cada lado.
+    :param extra: Tupla de argumentos adicionales para process_block.
+    :return: Arreglo NumPy con la salida.
+    """
+    bands = split_rows(output_shape[0], num_bands)
+    with SharedImageBuffer.from_array(src_array) as src, \
+            SharedImageBuffer(output_shape, output_dtype) as dst:
+        tasks = [
+            (process_block, src.handle, dst.handle, start, end, halo, extra)
+            for start, end in bands
+        ]
+        pool.map(process_shared_band, tasks)
+        return np.array(dst.array)
+
+
+def map_local_bands(map_func, process_block, src_array, output_shape, output_dtype, num_bands, halo=0, extra=None):
+    """
+    Igual que map_shared_bands pero sin memoria compartida, para ejecutar las franjas
+    en el propio proceso (map secuencial o un pool de hilos).
+
+    :param map_func: Función con la interfaz de map (por ejemplo, map o WorkerPool.thread_map).
+    :return: Arreglo NumPy con la salida.
+    """
+    output = np.empty(output_shape, dtype=output_dtype)
+    bands = split_rows(output_shape[0], num_bands)
+    list(map_func(
+        lambda band: _process_band(process_block, src_array, output, band[0], band[1], halo, extra),
+        bands
+    ))
+    return output
@@ -0,0 +1,171 @@
+import struct
+import zlib
+import numpy as np
+from typing import Optional, Callable, List, Tuple
+
+# Etiquetas TIFF usadas (TIFF 6.0)
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+PHOTOMETRIC = 262
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+ROWS_PER_STRIP = 278
+STRIP_BYTE_COUNTS = 279
+PLANAR_CONFIGURATION = 284
+
+# Tipos de dato de los campos: código -> formato de struct
+SHORT, LONG, LONG8 = 3, 4, 16
+TYPE_FORMATS = {SHORT: 'H', LONG: 'I', LONG8: 'Q'}
+
+COMPRESSION_CODES = {None: 1, 'deflate': 8}
+
+# Tamaño a partir del cual las posiciones ya no caben en 32 bits (con margen para la compresión
+# que no reduce el tamaño y para el directorio): se escribe BigTIFF
+BIGTIFF_THRESHOLD = 2 ** 32 - 2 ** 26
+
+
+class StripTiffWriter:
+    def __init__(self, path: str, width: int, height: int, rows_per_strip: int,
+                 compression: Optional[str] = 'deflate', level: int = 6, bigtiff: Optional[bool] = None,
+                 map_func: Callable = map) -> None:
+        """
+        Escritor mínimo de TIFF RGB (8 bits por canal) por tiras de filas. La imagen se escribe
+        de arriba hacia abajo por bandas, sin tenerla completa en memoria: cada tira se comprime
+        y se escribe al recibirla, y el directorio (IFD) con las posiciones de las tiras se escribe
+        al final del archivo.
+
+        :param path: Ruta del archivo de salida.
+        :param width: Ancho de la imagen.
+        :param height: Alto de la imagen.
+        :param rows_per_strip: Filas de cada tira (la última puede tener menos).
+        :param compression: None (sin compresión) o 'deflate' (zlib).
+        :param level: Nivel de compresión de zlib.
+        :param bigtiff: Forzar (o no) el formato BigTIFF; None lo elige según el tamaño de la imagen.
+        :param map_func: Función map con la que se comprimen las tiras de cada banda (por ejemplo,
+                         el map de un pool de hilos; zlib libera el GIL).
+        """
+        if width <= 0 or height <= 0 or rows_per_strip <= 0:
+            raise ValueError("Las dimensiones de la imagen y de las tiras deben ser enteros positivos.")
+        if compression not in COMPRESSION_CODES:
+            raise ValueError(f"Compresión no soportada: {compression}")
+
+        self.width = width
+        self.height = height
+        self.rows_per_strip = rows_per_strip
+        self.compression = compression
+        self.level = level
+        self.map_func = map_func
+        self.bigtiff = width * height * 3 >= BIGTIFF_THRESHOLD if bigtiff is None else bigtiff
+
+        self.rows_written = 0
+        self.strip_offsets: List[int] = []
+        self.strip_byte_counts: List[int] = []
+
+        self.file = open(path, 'wb')
+        # Encabezado con la posición del IFD en cero; se corrige en close()
+        if self.bigtiff:
+            self.file.write(b'II' + struct.pack('<HHHQ', 43, 8, 0, 0))
+        else:
+            self.file.write(b'II' + struct.pack('<HI', 42, 0))
+
+    def __enter__(self) -> 'StripTiffWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def _encode(self, strip: np.ndarray) -> bytes:
+        data = strip.tobytes()
+        if self.compression == 'deflate':
+            return zlib.compress(data, self.level)
+        return data
+
+    def write(self, rows: np.ndarray) -> None:
+        """
+        Escribe la siguiente banda de filas.
+
+        :param rows: Arreglo uint8 (filas, ancho, 3) en RGB. Salvo en la última banda, el número
+                     de filas debe ser múltiplo de rows_per_strip.
+        """
+        if rows.dtype != np.uint8 or rows.ndim != 3 or rows.shape[1:] != (self.width, 3):
+            raise ValueError(f"La banda debe ser un arreglo uint8 de forma (filas, {self.width}, 3).")
+        num_rows = rows.shape[0]
+        if self.rows_written + num_rows > self.height:
+            raise ValueError("La banda excede el alto de la imagen.")
+        if num_rows % self.rows_per_strip and self.rows_written + num_rows < self.height:
+            raise ValueError("Solo la última banda puede tener un número de filas que no sea múltiplo "
+                             "de rows_per_strip.")
+
+        strips = [rows[y:y + self.rows_per_strip] for y in range(0, num_rows, self.rows_per_strip)]
+        for data in self.map_func(self._encode, strips):
+            self.strip_offsets.append(self.file.tell())
+            self.strip_byte_counts.append(len(data))
+            self.file.write(data)
+        self.rows_written += num_rows
+
+    def _write_value(self, field_type: int, values: List[int]) -> bytes:
+        """
+        Contenido del campo de valor de una entrada del IFD: los valores si caben en él, o la
+        posición en la que se escriben (alineada a palabra) si no.
+        """
+        inline_size = 8 if self.bigtiff else 4
+        data = struct.pack(f'<{len(values)}{TYPE_FORMATS[field_type]}', *values)
+        if len(data) <= inline_size:
+            return data.ljust(inline_size, b'\0')
+
+        if self.file.tell() % 2:
+            self.file.write(b'\0')
+        offset = self.file.tell()
+        self.file.write(data)
+        return struct.pack('<Q' if self.bigtiff else '<I', offset)
+
+    def close(self) -> None:
+        """
+        Escribe el directorio de la imagen y cierra el archivo.
+        """
+        if self.file.closed:
+            return
+        if self.rows_written != self.height:
+            self.file.close()
+            raise ValueError(f"Se escribieron {self.rows_written} de {self.height} filas.")
+
+        offset_type = LONG8 if self.bigtiff else LONG
+        fields: List[Tuple[int, int, List[int]]] = [
+            (IMAGE_WIDTH, LONG, [self.width]),
+            (IMAGE_LENGTH, LONG, [self.height]),
+            (BITS_PER_SAMPLE, SHORT, [8, 8, 8]),
+            (COMPRESSION, SHORT, [COMPRESSION_CODES[self.compression]]),
+            (PHOTOMETRIC, SHORT, [2]),  # RGB
+            (STRIP_OFFSETS, offset_type, self.strip_offsets),
+            (SAMPLES_PER_PIXEL, SHORT, [3]),
+            (ROWS_PER_STRIP, LONG, [self.rows_per_strip]),
+            (STRIP_BYTE_COUNTS, offset_type, self.strip_byte_counts),
+            (PLANAR_CONFIGURATION, SHORT, [1]),  # Canales intercalados
+        ]
+        # Los valores que no caben en la entrada se escriben antes del IFD
+        entries = [(tag, field_type, len(values), self._write_value(field_type, values))
+                   for tag, field_type, values in fields]
+
+        if self.file.tell() % 2:
+            self.file.write(b'\0')
+        ifd_offset = self.file.tell()
+        if self.bigtiff:
+            self.file.write(struct.pack('<Q', len(entries)))
+            for tag, field_type, count, value in entries:
+                self.file.write(struct.pack('<HHQ', tag, field_type, count) + value)
+            self.file.write(struct.pack('<Q', 0))
+            self.file.seek(8)
+            self.file.write(struct.pack('<Q', ifd_offset))
+        else:
+            self.file.write(struct.pack('<H', len(entries)))
+            for tag, field_type, count, value in entries:
+                self.file.write(struct.pack('<HHI', tag, field_type, count) + value)
+            self.file.write(struct.pack('<I', 0))
+            self.file.seek(4)
+            self.file.write(struct.pack('<I', ifd_offset))
+        self.file.close()
@@ -0,0 +1,118 @@
+import os
+from multiprocessing import Pool, cpu_count, resource_tracker
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+
+def _warm_up_task(_):
+    """
+    Tarea vacía que fuerza el arranque de cada worker y la carga de las
+    dependencias pesadas antes de la primera solicitud real.
+    """
+    import numpy  # noqa: F401
+    import cv2  # noqa: F401
+    import scipy.fft  # noqa: F401
+    return os.getpid()
+
+
+class WorkerPool:
+    def __init__(self):
+        """
+        Pool de procesos persistente compartido por todos los filtros.
+        Se crea una sola vez (al arrancar la aplicación o en el primer uso)
+        y se reutiliza en cada solicitud, evitando crear procesos por filtro.
+        """
+        self.lock = Lock()
+        self._pool = None
+        self._size = None
+        self._threads = None
+
+    def start(self, size=None, warm_up=True):
+        """
+        Crea el pool si aún no existe.
+
+        :param size: Número de procesos. Por defecto WORKER_POOL_SIZE o cpu_count().
+        :param warm_up: Si es True, ejecuta una tarea en cada worker para que
+                        el primer request no pague el arranque de los procesos.
+        """
+        with self.lock:
+            if self._pool is not None:
+                return
+            size = size or self.configured_size()
+            # Iniciar el resource tracker antes de crear los workers para que lo hereden
+            # y los segmentos de memoria compartida se registren en un único tracker
+            resource_tracker.ensure_running()
+            self._pool = Pool(processes=size)
+            self._size = size
+            print(f"Pool de workers iniciado con {size} procesos.")
+
+        if warm_up:
+            pids = set(self._pool.map(_warm_up_task, range(size * 4), chunksize=1))
+            print(f"Pool de workers precalentado ({len(pids)} procesos activos).")
+
+    @staticmethod
+    def configured_size():
+        """
+        Número de procesos configurado: WORKER_POOL_SIZE o cpu_count().
+        """
+        return int(os.environ.get('WORKER_POOL_SIZE', 0)) or cpu_count()
+
+    @property
+    def size(self):
+        """
+        Número de procesos del pool. No inicia el pool: si todavía no existe devuelve el
+        tamaño configurado, el que tendrá cuando se le envíe la primera tarea.
+        """
+        return self._size or self.configured_size()
+
+    def get_pool(self):
+        """
+        Devuelve el pool compartido, creándolo sin precalentamiento si es necesario.
+        """
+        if self._pool is None:
+            self.start(warm_up=False)
+        return self._pool
+
+    def map(self, func, iterable, chunksize=None):
+        return self.get_pool().map(func, iterable, chunksize)
+
+    def imap(self, func, iterable, chunksize=1):
+        return self.get_pool().imap(func, iterable, chunksize)
+
+    def imap_unordered(self, func, iterable, chunksize=1):
+        return self.get_pool().imap_unordered(func, iterable, chunksize)
+
+    def thread_map(self, func, iterable):
+        """
+        Ejecuta func sobre iterable en un pool de hilos del mismo tamaño que el de procesos.
+        Útil para operaciones NumPy que liberan el GIL y no justifican enviar datos a otro proceso.
+        """
+        if self._threads is None:
+            with self.lock:
+                if self._threads is None:
+                    self._threads = ThreadPoolExecutor(max_workers=self.size)
+        return list(self._threads.map(func, iterable))
+
+    def shutdown(self, wait=True):
+        """
+        Cierra el pool. Con wait=True espera a que terminen las tareas en curso;
+        con wait=False termina los procesos inmediatamente.
+        """
+        with self.lock:
+            pool, self._pool = self._pool, None
+            threads, self._threads = self._threads, None
+            self._size = None
+        if threads is not None:
+            threads.shutdown(wait=wait)
+        if pool is None:
+            return
+        if wait:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+        print("Pool de workers cerrado.")
+
+
+# Instancia global para ser utilizada en toda la aplicación
+worker_pool = WorkerPool()
@@ -19,6 +19,8 @@ const MosaicFilter: React.FC<MosaicFilterProps> = ({
   const [blockHeight, setBlockHeight] = useState<number>(50);
   const [upscaleFactor, setUpscaleFactor] = useState<number>(6);
   const [isBackendPreprocessing, setIsBackendPreprocessing] = useState<boolean>(false);
+  const [isIndexAvailable, setIsIndexAvailable] = useState<boolean>(false);
+  const [preprocessingProgress, setPreprocessingProgress] = useState<string>('');
 
   useEffect(() => {
     const checkBackendStatus = async () => {
@@ -29,6 +31,13 @@ const MosaicFilter: React.FC<MosaicFilterProps> = ({
         }
         const data = await response.json();
         setIsBackendPreprocessing(data.preprocessing);
+        setIsIndexAvailable(Boolean(data.index_available));
+        if (data.job && data.job.state === 'running') {
+          const eta = data.job.eta !== null ? ` (~${Math.ceil(data.job.eta)} s restantes)` : '';
+          setPreprocessingProgress(`${data.job.processed}/${data.job.total} imágenes${eta}`);
+        } else {
+          setPreprocessingProgress('');
+        }
       } catch (error) {
         console.error('Error al consultar el estado del backend:', error);
       }
@@ -39,8 +48,11 @@ const MosaicFilter: React.FC<MosaicFilterProps> = ({
     return () => clearInterval(interval);
   }, []);
 
+  // Mientras se reindexa, el backend sigue usando el último índice completado
+  const isBlocked = isBackendPreprocessing && !isIndexAvailable;
+
   const applyFilter = async () => {
-    if (isBackendPreprocessing) {
+    if (isBlocked) {
       alert('El backend está preprocesando la biblioteca de imágenes. Por favor, intenta de nuevo más tarde.');
       return;
     }
@@ -103,7 +115,8 @@ const MosaicFilter: React.FC<MosaicFilterProps> = ({
 
       {isBackendPreprocessing && (
         <div style={{ color: 'blue', marginBottom: '10px' }}>
-          La biblioteca de imágenes está siendo preprocesada. Por favor, espera...
+          La biblioteca de imágenes está siendo preprocesada{preprocessingProgress && `: ${preprocessingProgress}`}.
+          {isBlocked ? ' Por favor, espera...' : ' Mientras tanto se usa el índice anterior.'}
         </div>
       )}
 
@@ -115,7 +128,7 @@ const MosaicFilter: React.FC<MosaicFilterProps> = ({
           max="9"
           value={upscaleFactor}
           onChange={(e) => setUpscaleFactor(parseInt(e.target.value) || 1)}
-          disabled={isBackendPreprocessing}
+          disabled={isBlocked}
         />
         <b>Advertencia:</b> Valores altos pueden causar que la imagen <br />
         procesada sea muy grande y si no hay suficiente <br />
@@ -129,7 +142,7 @@ const MosaicFilter: React.FC<MosaicFilterProps> = ({
           min="1"
           value={blockWidth}
           onChange={(e) => setBlockWidth(parseInt(e.target.value) || 1)}
-          disabled={isBackendPreprocessing}
+          disabled={isBlocked}
         />
       </label>
       <br />
@@ -140,11 +153,11 @@ const MosaicFilter: React.FC<MosaicFilterProps> = ({
           min="1"
           value={blockHeight}
           onChange={(e) => setBlockHeight(parseInt(e.target.value) || 1)}
-          disabled={isBackendPreprocessing}
+          disabled={isBlocked}
         />
       </label>
       <br />
-      <button onClick={applyFilter} disabled={isBackendPreprocessing || isProcessing}>
+      <button onClick={applyFilter} disabled={isBlocked || isProcessing}>
         {isProcessing ? 'Procesando' : 'Aplicar Filtro de Mosaico'}
       </button>
       <br />